@@ -1,8 +1,15 @@
-import requests
+import os
+import copy
 import json
+import time
+import queue
+import datetime
+import threading
 import logging
+from concurrent.futures import ThreadPoolExecutor
 import general_config as gconf
 import personal_config as pconf
+import metrics
 
 
 logger = logging.getLogger(gconf.Logs.LOGGER_NAME)
@@ -10,7 +17,8 @@ logger = logging.getLogger(gconf.Logs.LOGGER_NAME)
 
 def enrich_with_apis(data_dict, items=1, app_id_google=None):
     """
-    Enrich a dict of scraped data with data from APIs
+    Enrich a dict of scraped data with data from APIs, only things that were not enriched yet or whose data is
+    stale are queried.
     :param data_dict: A dict containing project save data
     :param items: max number of items to get from the each API that returns lists
     :param app_id_google: google developer key for the API
@@ -21,27 +29,335 @@ def enrich_with_apis(data_dict, items=1, app_id_google=None):
     logger.info('Done enriching with APIs')
 
 
-def enrich_things_with_google_ktree(things_dict, items=1, app_id=None):
+class ResponseCache:
     """
-    Enrich a dict of things with data from google knowledge tree
+    Persistent on-disk cache of API responses by query, entries older than ttl seconds are ignored.
+    The cache file is loaded once and saved back (if changed) when done, it is meant for a single process at a time.
+
+    Usage:
+        with ResponseCache('Cache/ktree_cache.json') as cache:
+            found, response = cache.lookup(query)
+            ...
+            cache.store(query, response)
+    """
+
+    def __init__(self, path=gconf.google_ktree.CACHE_PATH, ttl=gconf.google_ktree.CACHE_TTL):
+        """
+        Construction of a new response cache.
+          :param path: path of the cache file. If None, responses are only cached in memory.
+          :param ttl: number of seconds a cached response is used.
+        """
+        self.path = path
+        self.ttl = ttl
+        self._entries = {}
+        self._changed = False
+
+    def __enter__(self):
+        """
+        Allows to load the cache using 'with' statement
+        """
+        self.load()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """
+        Allows to save the cache using 'with' statement
+        """
+        self.save()
+
+    def load(self):
+        """
+        Load fresh entries of the cache file, a missing or unreadable file is an empty cache.
+        """
+        if self.path is None or not os.path.exists(self.path):
+            return
+
+        try:
+            with open(self.path, 'r') as file:
+                entries = json.load(file)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read response cache `{self.path}`, starting a new one: {e}")
+            return
+
+        now = time.time()
+        self._entries = {query: entry for query, entry in entries.items() if now - entry[0] < self.ttl}
+        self._changed = len(self._entries) < len(entries)
+        logger.debug(f"Loaded {len(self._entries)} cached responses from `{self.path}`")
+
+    def lookup(self, query):
+        """
+        :return: (found, response): True and the cached response of query if it is fresh, otherwise False and None
+        """
+        entry = self._entries.get(query)
+        if entry is None or time.time() - entry[0] >= self.ttl:
+            return False, None
+        return True, entry[1]
+
+    def store(self, query, response):
+        """
+        Cache the response of query.
+        """
+        self._entries[query] = [time.time(), response]
+        self._changed = True
+
+    def save(self):
+        """
+        Write the cache file (if anything changed), replacing it at once so an interrupted save keeps the old file.
+        """
+        if self.path is None or not self._changed:
+            return
+
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as file:
+            json.dump(self._entries, file)
+        os.replace(tmp_path, self.path)
+        self._changed = False
+
+
+def ktree_session(workers=gconf.google_ktree.WORKERS):
+    """
+    Create a requests session for the knowledge tree API, keeping up to `workers` connections alive for reuse.
+    :param workers: number of threads sharing the session
+    :return: requests.Session
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def needs_enrichment(thing, stale_after=gconf.google_ktree.STALE_AFTER):
+    """
+    Check whether a thing should be (re)enriched: it was never enriched, or it was enriched too long ago.
+    Things holding knowledge tree data without an enrichment time (older snapshots) are considered enriched.
+    :param thing: Thing object or dict of thing properties
+    :param stale_after: number of seconds after which an enriched thing is stale
+    :return: True if the thing should be enriched
+    """
+    properties = getattr(thing, 'properties', thing)
+    fetched_at = properties.get(gconf.google_ktree.fetched_id)
+    if fetched_at is None:
+        return properties.get(gconf.google_ktree.final_id) is None
+
+    age = datetime.datetime.now() - datetime.datetime.fromisoformat(fetched_at)
+    return age.total_seconds() >= stale_after
+
+
+def enrich_things_with_google_ktree(things_dict, items=1, app_id=None, workers=gconf.google_ktree.WORKERS,
+                                    cache_path=gconf.google_ktree.CACHE_PATH, refresh=False, cache=None):
+    """
+    Enrich a dict of things with data from google knowledge tree.
+    Only things that were never enriched or whose data is stale are enriched (see needs_enrichment), and every
+    enriched thing is stamped with the time it was enriched.
+    Things with identical model names share a single query, queries are sent concurrently over a pooled session
+    and responses are cached on disk, so only names that were not queried recently reach the API.
     :param things_dict: a dict of things, the keys are ids, and the values are dicts representing the thing.
     :param items: max number of items to get from the knowledge tree
     :param app_id: google developer key for the API
+    :param workers: max number of concurrent queries
+    :param cache_path: path of the responses cache file (see ResponseCache). None to disable the cache.
+    :param refresh: if True, enrich all things, even fresh ones
+    :param cache: an already loaded ResponseCache to use instead of the one at cache_path (it is not saved)
     :return: None
     """
     logger.info("Using google's knowledge tree API")
+
+    # thing ids by model name, of the things to enrich
+    names = {}
     for thing_id in things_dict:
-        thing = things_dict[thing_id]
-        thing_name = thing[gconf.ThingSettings.Elements.MODEL_NAME]
-        ex_data = query_google_ktree(thing_name, items, app_id=app_id)
-        if ex_data is not None:
-            if len(ex_data) > 0:
-                ex_data = parse_data_from_ktree_list(ex_data)
-                thing[gconf.google_ktree.final_id] = ex_data
+        if refresh or needs_enrichment(things_dict[thing_id]):
+            names.setdefault(things_dict[thing_id][gconf.ThingSettings.Properties.MODEL_NAME], []).append(thing_id)
+    logger.info(f"{sum(len(ids) for ids in names.values())} of {len(things_dict)} things to enrich")
+
+    if cache is None:
+        with ResponseCache(cache_path) as cache:
+            responses = _ktree_responses(names, items, app_id, workers, cache)
+    else:
+        responses = _ktree_responses(names, items, app_id, workers, cache)
+
+    fetched_at = datetime.datetime.now().replace(microsecond=0).isoformat()
+    for name, ex_data in responses.items():
+        # things of failed queries are left as they are, so they are enriched again next time
+        if ex_data is None:
+            continue
+        if ex_data:
+            ex_data = parse_data_from_ktree_list(copy.deepcopy(ex_data))
+        for thing_id in names[name]:
+            things_dict[thing_id][gconf.google_ktree.fetched_id] = fetched_at
+            if ex_data:
+                things_dict[thing_id][gconf.google_ktree.final_id] = ex_data
     logger.info("Done using google's knowledge tree API")
 
 
-def query_google_ktree(thing, nitems=1, lan='en', app_id=None):
+def _ktree_responses(names, items, app_id, workers, cache):
+    """
+    Get the knowledge tree response of every model name, from cache or by querying the API concurrently.
+    :return: dict of model name -> response (None if the query failed)
+    """
+    responses = {}
+    missing = []
+    for name in names:
+        found, responses[name] = cache.lookup(f'{items}|{name}')
+        if not found:
+            missing.append(name)
+    logger.info(f"{len(names)} model names to look up, {len(names) - len(missing)} of them cached")
+    metrics.inc('api_cache_hits_total', len(names) - len(missing), 'Number of API responses found in cache',
+                api='google_ktree')
+
+    if missing:
+        with ktree_session(workers) as session, ThreadPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(lambda name: query_google_ktree(name, items, app_id=app_id, session=session),
+                                   missing)
+            for name, ex_data in zip(missing, results):
+                responses[name] = ex_data
+                # failed queries are not cached, so they are sent again next time
+                if ex_data is not None:
+                    cache.store(f'{items}|{name}', ex_data)
+    return responses
+
+
+# Queue item that tells the enricher thread to flush and stop
+_STOP = object()
+
+
+class BackgroundEnricher:
+    """
+    Background API enrichment stage: scraped things are submitted to it while scraping and a worker thread
+    enriches the ones that need it (see needs_enrichment) in batches, so API queries overlap with scraping.
+    The worker only sees copies of the model names, results are added to the submitted things when the enricher
+    is closed, so things are never modified while the scraper uses them.
+
+    Usage:
+        with BackgroundEnricher() as enricher:
+            enricher.submit(thing_id, thing)
+    """
+
+    def __init__(self, items=1, app_id=None, batch_size=gconf.google_ktree.BATCH_SIZE,
+                 flush_interval=gconf.google_ktree.FLUSH_INTERVAL, cache_path=gconf.google_ktree.CACHE_PATH):
+        """
+        Construction of a new background enricher.
+          :param items: max number of items to get from the each API that returns lists
+          :param app_id: google developer key for the API
+          :param batch_size: number of submitted things after which a batch is enriched.
+          :param flush_interval: maximum number of seconds a submitted thing waits before being enriched.
+          :param cache_path: path of the responses cache file (see ResponseCache). None to disable the cache.
+        """
+        self.items = items
+        self.app_id = app_id
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self.submitted = 0
+        self._things = {}
+        self._results = {}
+        self._cache = ResponseCache(cache_path)
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='BackgroundEnricher', daemon=True)
+
+    def __enter__(self):
+        """
+        Allows to start the enricher using 'with' statement
+        """
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """
+        Allows to finish and close the enricher using 'with' statement
+        """
+        self.close()
+
+    def start(self):
+        """
+        Load the responses cache and start the worker thread.
+        """
+        self._cache.load()
+        self._thread.start()
+        logger.info('Background API enrichment started')
+
+    def submit(self, thing_id, thing):
+        """
+        Queue a scraped thing to be enriched, if it needs to be. Never blocks on the APIs.
+          :param thing_id: the thing id as used in scraped data
+          :param thing: Thing object (or dict of thing properties), enriched when the enricher is closed
+        """
+        if not needs_enrichment(thing):
+            return
+        self._things[thing_id] = thing
+        self.submitted += 1
+        name = thing[gconf.ThingSettings.Properties.MODEL_NAME]
+        self._queue.put((thing_id, {gconf.ThingSettings.Properties.MODEL_NAME: name}))
+
+    def close(self):
+        """
+        Enrich all pending things, stop the worker thread, add the results to the submitted things
+        and save the responses cache.
+        """
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+        self._cache.save()
+
+        for thing_id, properties in self._results.items():
+            del properties[gconf.ThingSettings.Properties.MODEL_NAME]
+            getattr(self._things[thing_id], 'properties', self._things[thing_id]).update(properties)
+        logger.info(f'Background API enrichment done: {len(self._results)} of {self.submitted} submitted things '
+                    f'enriched')
+        self._things.clear()
+        self._results.clear()
+
+    def _run(self):
+        """
+        Worker thread loop: collect submitted things and enrich them in batches.
+        """
+        batch = {}
+        last_flush = time.monotonic()
+
+        while True:
+            timeout = max(0.0, self.flush_interval - (time.monotonic() - last_flush))
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                break
+
+            if item is not None:
+                thing_id, properties = item
+                batch[thing_id] = properties
+
+            if len(batch) >= self.batch_size or (batch and time.monotonic() - last_flush >= self.flush_interval):
+                self._flush(batch)
+
+            if not batch:
+                last_flush = time.monotonic()
+
+        if batch:
+            self._flush(batch)
+
+    def _flush(self, batch):
+        """
+        Enrich a single batch and clear it.
+        """
+        try:
+            enrich_things_with_google_ktree(batch, items=self.items, app_id=self.app_id, cache=self._cache)
+        except Exception as e:
+            logger.exception(f'Background enrichment of {len(batch)} things failed: {e}')
+        else:
+            self._results.update({thing_id: properties for thing_id, properties in batch.items()
+                                  if gconf.google_ktree.fetched_id in properties})
+        finally:
+            batch.clear()
+
+
+def query_google_ktree(thing, nitems=1, lan='en', app_id=None, session=None):
     """
     Look for item in google knowledge tree, and pass results in a list with minimal
     processing
@@ -49,17 +365,30 @@ def query_google_ktree(thing, nitems=1, lan='en', app_id=None):
     :param nitems: max amount of results to deliver
     :param lan: language of results
     :param app_id: google developer key for the API. Can also be provided in personal config file (pass as None)
-    :return: A list of results from google knowledge tree
+    :param session: requests session to send the query with (see ktree_session). Default: a new connection.
+    :return: A list of results from google knowledge tree, None if the query failed
     """
+    import requests
+
     if app_id is None:
         app_id = pconf.google_ktree_API_key
-    q = gconf.google_ktree.api_address + f'query={thing}' \
-                                         f'&key={app_id}' \
-                                         f'&limit={nitems}' \
-                                         f'&indent=True' \
-                                         f'&types=Thing' \
-                                         f'&languages={lan}'
-    response = requests.get(q)
+    params = {'query': thing,
+              'key': app_id,
+              'limit': nitems,
+              'indent': True,
+              'types': 'Thing',
+              'languages': lan}
+    try:
+        with metrics.timed('api_request_seconds', 'Duration of API requests', api='google_ktree'):
+            response = (session or requests).get(gconf.google_ktree.api_address, params=params,
+                                                 timeout=gconf.google_ktree.TIMEOUT)
+    except requests.RequestException as e:
+        metrics.inc('api_requests_total', description='Number of API requests', api='google_ktree', status='error')
+        logger.error(f'google knowledge tree request failed: {e}')
+        return None
+    metrics.inc('api_requests_total', description='Number of API requests', api='google_ktree',
+                status=response.status_code)
+
     if response.status_code == 200:
         data = json.loads(response.text)
         data = data.get(gconf.google_ktree.main_list_identifier, None)
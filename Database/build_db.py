@@ -1,347 +1,558 @@
+import datetime
+import hashlib
 import json
 import os
+import re
+import sqlite3
+import sys
 import Database.config as conf
 import Database.db_queries as dbq
-import pymysql
 
 import general_config as gconf
+import metrics
 import logging
+import collections
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
 
+from Database.connection_pool import ConnectionPool
+from snapshots import read_snapshot
 from ThingScraper import Thing, User, Make, to_field_format
 
 # Define file logger
 logger = logging.getLogger(gconf.Logs.LOGGER_NAME)
 
+# Natural key -> surrogate id queries, preloaded once per build
+ID_MAP_QUERIES = {'users': dbq.ALL_USER_IDS,
+                  'titles': dbq.ALL_TITLE_IDS,
+                  'tags': dbq.ALL_TAG_IDS,
+                  'things': dbq.ALL_THING_IDS,
+                  'makes': dbq.ALL_MAKE_IDS,
+                  'print_settings': dbq.ALL_SETTING_IDS}
+
+# Latest stored metrics queries (surrogate id -> metrics tuple), preloaded once per build
+LATEST_METRICS_QUERIES = {'user_metrics': dbq.LATEST_USER_METRICS,
+                          'thing_metrics': dbq.LATEST_THING_METRICS,
+                          'make_metrics': dbq.LATEST_MAKE_METRICS}
+
+# Properties kept in metrics history tables, ordered as in INSERT_*_METRICS queries
+USER_METRICS = (User.PROPERTIES.FOLLOWERS,
+                User.PROPERTIES.FOLLOWING,
+                User.PROPERTIES.DESIGNS,
+                User.PROPERTIES.COLLECTIONS,
+                User.PROPERTIES.MAKES,
+                User.PROPERTIES.LIKES)
+THING_METRICS = (Thing.PROPERTIES.LIKES,
+                 Thing.PROPERTIES.MAKES,
+                 Thing.PROPERTIES.COMMENTS,
+                 Thing.PROPERTIES.REMIXES)
+MAKE_METRICS = (Make.PROPERTIES.LIKES,
+                Make.PROPERTIES.COMMENTS,
+                Make.PROPERTIES.VIEWS)
+
+# id_maps key of the aggregate table groups touched by a load (aggregate table -> set of group values)
+TOUCHED = 'touched'
+
+# MySQL error codes of transient failures worth retrying: deadlock, lock wait timeout, server gone, lost connection
+TRANSIENT_MYSQL_ERRORS = (1213, 1205, 2006, 2013)
+
 # Test constants
 # FULL_JSON_PATH = "/Users/shlomi/Google Drive/ITC/Projects/Data Mining Project/ITC_Data_Mining_Thingiverse/JSON/scraped_data_03042021-1433.json"
 
 
-def _insert_user(cursor, user):
+def _timed_phase(phase):
     """
-    Insert a single user to database at cursor.
-    Return user id from database after insert.
+    Returns a timer (see metrics.timed) of a database build phase: users, things, aggregates...
     """
-    # Create a tuple with user fields
-    user_data = (user[User.PROPERTIES.USERNAME],
-                 user[User.PROPERTIES.FOLLOWERS],
-                 user[User.PROPERTIES.FOLLOWING],
-                 user[User.PROPERTIES.DESIGNS],
-                 user[User.PROPERTIES.COLLECTIONS],
-                 user[User.PROPERTIES.MAKES],
-                 user[User.PROPERTIES.LIKES],
-                 user[User.PROPERTIES.SKILL_LEVEL])
+    return metrics.timed('db_phase_seconds', 'Duration of database build phases', phase=phase)
 
-    cursor.execute(dbq.INSERT_USER, user_data)
-    user_id = cursor.lastrowid
-    logger.debug("User {} inserted to the database under user_id {}".format(user[User.PROPERTIES.USERNAME],
-                                                                            user_id))
 
-    return user_id
+def _chunks(items, size=gconf.DB_builder.BATCH_SIZE):
+    """Yields consecutive lists of at most `size` items from given iterable."""
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
 
 
-def _update_user(cursor, user_id, user):
+def _load_id_map(cursor, query):
     """
-    Update a single user in database at cursor.
+    Run a two columns query (natural key, surrogate id) at cursor and return its result as a dictionary.
+    Natural keys are kept as str so thingiverse ids from JSON data and database ids match.
     """
-    # Create a tuple with user fields
-    user_data = (user[User.PROPERTIES.FOLLOWERS],
-                 user[User.PROPERTIES.FOLLOWING],
-                 user[User.PROPERTIES.DESIGNS],
-                 user[User.PROPERTIES.COLLECTIONS],
-                 user[User.PROPERTIES.MAKES],
-                 user[User.PROPERTIES.LIKES],
-                 user[User.PROPERTIES.SKILL_LEVEL],
-                 user_id)
+    cursor.execute(query)
+    return {str(key): value for key, value in (tuple(row.values()) for row in cursor.fetchall())}
 
-    cursor.execute(dbq.UPDATE_USER, user_data)
-    logger.debug("user_id {} updated".format(user_id))
 
+def _load_latest_metrics(cursor, query):
+    """
+    Run a latest metrics query (surrogate id, metrics...) at cursor and return it as a surrogate id -> metrics dictionary.
+    """
+    cursor.execute(query)
+    return {values[0]: values[1:] for values in (tuple(row.values()) for row in cursor.fetchall())}
 
-def _get_title_id(cursor, title):
-    """Returns title id for given title"""
-    # run query to find title id for given title
-    title_id_query = cursor.execute(dbq.SELECT_TITLE_ID, [title])
 
-    if title_id_query:
-        return _fetch_value(cursor)
-    else:
-        return None
+def _load_id_maps(cursor):
+    """
+    Preload natural key -> surrogate id maps for users, titles, tags, things, makes and print settings (by hash)
+    from database at cursor, along with the latest stored metrics of users, things and makes.
+    Used once per build so every later lookup is resolved in memory.
+    """
+    id_maps = {table: _load_id_map(cursor, query) for table, query in ID_MAP_QUERIES.items()}
+    id_maps.update({table: _load_latest_metrics(cursor, query) for table, query in LATEST_METRICS_QUERIES.items()})
+    id_maps[TOUCHED] = {table: set() for table in dbq.AGGREGATES}
+    logger.debug("Loaded id maps: {}".format({table: len(id_map) for table, id_map in id_maps.items()}))
+
+    return id_maps
+
+
+def _read_back_ids(cursor, query, keys, id_map):
+    """
+    Fetch the surrogate ids of given natural keys (using a `... IN %s` query) and add them to id_map.
+    """
+    for chunk in _chunks(keys):
+        cursor.execute(query, [chunk])
+        for row in cursor.fetchall():
+            key, value = row.values()
+            id_map[str(key)] = value
 
 
-def _insert_title(cursor, title):
-    """Inserts a new title and returns its id"""
-    cursor.execute(dbq.INSERT_TITLE, [title])
-    title_id = cursor.lastrowid
-    logger.debug("Title '{}' inserted at title_id '{}'".format(title, title_id))
+def _insert_missing_keys(cursor, insert_query, select_query, keys, id_map):
+    """
+    Bulk insert natural keys (tags, titles) that are not yet in id_map and read back their new ids.
+    """
+    missing = sorted({key for key in keys if key not in id_map})
+
+    for chunk in _chunks(missing):
+        cursor.executemany(insert_query, [[key] for key in chunk])
 
-    return title_id
+    _read_back_ids(cursor, select_query, missing, id_map)
 
+    if missing:
+        logger.debug("Inserted %d new keys using: %s", len(missing), insert_query)
 
-def _insert_user_title(cursor, user_id, title_id):
+
+def _touch_aggregates(cursor, group_queries, keys, touched):
     """
-    Insert a user_id title_id pair into user_title table
+    Mark the aggregate table groups that entities belong to in the database at cursor as touched.
+    Called before and after entities are written, so both their previous and their new groups are refreshed.
+     :param group_queries: list of (aggregate table, query selecting the groups of entities IN %s)
+     :param keys: natural keys (thingiverse ids) of the entities
+     :param touched: aggregate table -> set of touched groups, updated in place
     """
-    # Add title id and user id to new table
-    cursor.execute(dbq.INSERT_TITLE_USER, [title_id, user_id])
-    logger.debug("Linked title_id '{}' and user_id '{}'".format(title_id, user_id))
+    for chunk in _chunks(keys):
+        for table, query in group_queries:
+            cursor.execute(query, [chunk])
+            touched[table].update(group for row in cursor.fetchall() for group in row.values() if group is not None)
 
 
-def _fetch_value(cursor, index=1):
+@_timed_phase('remix_ids')
+def _backfill_remix_ids(cursor, touched=None):
     """
-    Returns the fetchone value of previously run query at cursor.
+    Set the remix_id of remixes that were upserted before the thing they remix (a remix of a remix in the same batch,
+    or in a chunk loaded in parallel), by matching their thigiverse_remix with the loaded things, at cursor.
+    Run once at the end of a load, as upserts keep a NULL remix_id (see UPSERT_THING).
+     :param touched: aggregate table -> set of touched groups, updated with the remixed things. Default: None.
+     :return: number of remixes back-filled
     """
-    return cursor.fetchone().popitem()[index]
+    if touched is not None:
+        cursor.execute(dbq.UNRESOLVED_REMIX_SOURCES)
+        touched['remix_stats'].update(group for row in cursor.fetchall() for group in row.values())
 
+    backfilled = cursor.execute(dbq.BACKFILL_REMIX_IDS)
+    if backfilled:
+        logger.debug("remix_id of %d remixes back-filled", backfilled)
+    return backfilled
 
-def _insert_users(users, cur):
-    """Inserts a list of user dictionaries into database at courser cur."""
-    for user in users.values():
-        try:
-            # user exists in the database: obtain user_id and update
-            if cur.execute(dbq.SELECT_USER_ID, [user[User.PROPERTIES.USERNAME]]):
-                user_id = _fetch_value(cur)
-                _update_user(cur, user_id, user)
 
-            # user doest not exists: add it and obtain user_id
-            else:
-                user_id = _insert_user(cur, user)
+@_timed_phase('user_ids')
+def _backfill_user_ids(cursor):
+    """
+    Set the user_id of things and makes that were upserted before their user (users scraped later, or in a later run),
+    by matching their username with the loaded users, at cursor. Run once at the end of a load, as upserts keep a
+    NULL user_id (see UPSERT_THING and UPSERT_MAKE).
+     :return: number of things and makes back-filled
+    """
+    backfilled = cursor.execute(dbq.BACKFILL_THING_USER_IDS) + cursor.execute(dbq.BACKFILL_MAKE_USER_IDS)
+    if backfilled:
+        logger.debug("user_id of %d things and makes back-filled", backfilled)
+    return backfilled
 
-        except KeyError as e:
-            logger.error(e)
+
+@_timed_phase('aggregates')
+def _refresh_aggregates(cursor, touched=None):
+    """
+    Recompute the rows of touched groups in the aggregate tables from the loaded tables, at cursor.
+     :param touched: aggregate table -> set of touched groups, cleared once refreshed.
+                     Default: None, recompute the aggregate tables from scratch.
+    """
+    for table, (column, group_column, select) in dbq.AGGREGATES.items():
+        if touched is None:
+            cursor.execute(dbq.DELETE_AGGREGATE.format(table=table, where=''))
+            cursor.execute(dbq.INSERT_AGGREGATE.format(
+                table=table, select=select.format(where='WHERE {} IS NOT NULL'.format(group_column))))
+            logger.debug("Aggregate table `{}` recomputed".format(table))
             continue
 
-        # add new title if doesnt exist, get its id, add it with user id to common table
-        try:
-            user_titles = user[User.PROPERTIES.TITLES]
-
-            # if user has no titles, define an empty set
-            if user_titles:
-                user_titles = set(user_titles)
-            else:
-                user_titles = set()
-
-            # get db updated titles for user id
-            if cur.execute(dbq.USER_TITLES, user_id):
-                db_titles = {db_title['title'] for db_title in cur.fetchall()}
-            else:
-                db_titles = set()
-
-            new_titles = user_titles.difference(db_titles)
-            remove_titles = db_titles.difference(user_titles)
-
-            # add new titles
-            for title in new_titles:
-                # get id for title if exists
-                title_id = _get_title_id(cur, title)
-                # if it doesnt, add it and get its id
-                if title_id is None:
-                    title_id = _insert_title(cur, title)
-                # pair user and title
-                _insert_user_title(cur, user_id, title_id)
-
-            # remove no longer existing titles for user
-            for title in remove_titles:
-                title_id = _get_title_id(cur, title)
-                cur.execute(dbq.REMOVE_USER_TITLE, [title_id, user_id])
+        # sorted, so concurrent refreshes lock groups in the same order
+        groups = sorted(touched[table])
+        for chunk in _chunks(groups):
+            cursor.execute(dbq.DELETE_AGGREGATE.format(table=table, where='WHERE {} IN %s'.format(column)), [chunk])
+            cursor.execute(dbq.INSERT_AGGREGATE.format(
+                table=table, select=select.format(where='WHERE {} IN %s'.format(group_column))), [chunk])
+
+        touched[table].clear()
+        logger.debug("%d groups of aggregate table `%s` refreshed", len(groups), table)
+
+
+def _metrics_row(entity, entity_id, metric_properties):
+    """
+    Create a metrics history row (entity id, scrape time, metrics...) for a single user, thing or make.
+    Returns None for entities without a scrape time, as the time their metrics were scraped is unknown
+    (see _stamp_snapshot).
+    """
+    scraped_at = entity.get(Thing.PROPERTIES.SCRAPED_AT)
+    if not scraped_at:
+        return None
+    return (entity_id, scraped_at) + tuple(entity.get(metric) for metric in metric_properties)
+
+
+def _stamp_snapshot(data, file_path):
+    """
+    Stamp the users, things and makes of a snapshot file that have no scrape time (snapshots older than the metrics
+    history tables) with the time the file was last modified, the latest time they could have been scraped.
+    """
+    scraped_at = datetime.datetime.fromtimestamp(os.path.getmtime(file_path)).replace(microsecond=0).isoformat()
+    for data_type in ('users', 'things', 'makes'):
+        for entity in data.get(data_type, {}).values():
+            if not entity.get(Thing.PROPERTIES.SCRAPED_AT):
+                entity[Thing.PROPERTIES.SCRAPED_AT] = scraped_at
+
+
+def _append_metrics(cursor, insert_query, entities, entity_ids, latest_metrics, key_property, metric_properties):
+    """
+    Bulk append a metrics history row for every entity whose metrics changed since its latest stored row.
+     :param entities: list of entity dictionaries that were loaded into the database
+     :param entity_ids: natural key -> surrogate id map of the entities
+     :param latest_metrics: surrogate id -> latest stored metrics map, updated in place
+     :param key_property: the entity property holding its natural key
+     :param metric_properties: entity properties kept in the history table
+    """
+    rows = []
+
+    for entity in entities:
+        entity_id = entity_ids.get(str(entity[key_property]))
+        if entity_id is None:
+            continue
+
+        row = _metrics_row(entity, entity_id, metric_properties)
+        if row is not None and latest_metrics.get(entity_id) != row[2:]:
+            latest_metrics[entity_id] = row[2:]
+            rows.append(row)
+
+    for chunk in _chunks(rows):
+        cursor.executemany(insert_query, chunk)
+
+    if rows:
+        logger.debug("%d of %d entities had changed metrics", len(rows), len(entities))
+
+
+def _sync_links(cursor, links_query, insert_query, delete_query, links):
+    """
+    Bring the rows of a link table (user_title or thing_tag) in line with the links of a batch of entities, set-wise:
+    current links of the whole batch are read at once, and new links are inserted in bulk.
+    Entities that lost a link have all their links deleted at once and inserted again.
+     :param links_query: query selecting (linked id, entity id) rows of entities IN %s
+     :param insert_query: query inserting a single (linked id, entity id) row
+     :param delete_query: query deleting all rows of entities IN %s
+     :param links: entity id -> set of linked ids (title ids or tag ids)
+    """
+    current = {entity_id: set() for entity_id in links}
+    for chunk in _chunks(links):
+        cursor.execute(links_query, [chunk])
+        for linked_id, entity_id in (tuple(row.values()) for row in cursor.fetchall()):
+            current[entity_id].add(linked_id)
+
+    relinked = {entity_id for entity_id in links if current[entity_id] - links[entity_id]}
+    for chunk in _chunks(sorted(relinked)):
+        cursor.execute(delete_query, [chunk])
+
+    new_links = [(linked_id, entity_id) for entity_id, linked_ids in links.items()
+                 for linked_id in (linked_ids if entity_id in relinked else linked_ids - current[entity_id])]
+    for chunk in _chunks(new_links):
+        cursor.executemany(insert_query, chunk)
+
+    logger.debug("%d links inserted, links of %d entities replaced", len(new_links), len(relinked))
+
+
+def _user_data(user):
+    """
+    Create a tuple with user fields, ordered as in UPSERT_USER query.
+    """
+    return (user[User.PROPERTIES.USERNAME],
+            user[User.PROPERTIES.FOLLOWERS],
+            user[User.PROPERTIES.FOLLOWING],
+            user[User.PROPERTIES.DESIGNS],
+            user[User.PROPERTIES.COLLECTIONS],
+            user[User.PROPERTIES.MAKES],
+            user[User.PROPERTIES.LIKES],
+            user[User.PROPERTIES.SKILL_LEVEL])
+
+
+def _insert_users(users, cur, id_maps):
+    """Upserts a list of user dictionaries into database at courser cur."""
+    user_ids = id_maps['users']
+    users_data = []
+    loaded_users = []
 
+    for user in users.values():
+        try:
+            users_data.append(_user_data(user))
+            loaded_users.append(user)
         except KeyError as e:
             logger.error(e)
             continue
 
+    # insert new users and update existing ones (matched by the unique username)
+    for chunk in _chunks(users_data):
+        cur.executemany(dbq.UPSERT_USER, chunk)
 
-def _get_tag_id(cursor, tag):
-    if cursor.execute(dbq.SELECT_TAG_ID, [tag]):
-        return _fetch_value(cursor)
-    else:
+    # read back ids of users that were not in the database before
+    new_users = [user_data[0] for user_data in users_data if user_data[0] not in user_ids]
+    _read_back_ids(cur, dbq.USER_IDS_IN, new_users, user_ids)
+    logger.debug("%d users upserted, %d of them new", len(users_data), len(new_users))
+
+    _append_metrics(cur, dbq.INSERT_USER_METRICS, loaded_users, user_ids, id_maps['user_metrics'],
+                    User.PROPERTIES.USERNAME, USER_METRICS)
+
+    # add new titles if don't exist, then link them with user ids in common table
+    all_titles = set()
+    for user in users.values():
+        all_titles.update(user.get(User.PROPERTIES.TITLES) or [])
+
+    _insert_missing_keys(cur, dbq.INSERT_TITLE, dbq.TITLE_IDS_IN, all_titles, id_maps['titles'])
+
+    # pair users with their titles in common table, for the whole batch at once
+    user_titles = {}
+    for user in loaded_users:
+        user_id = user_ids[user[User.PROPERTIES.USERNAME]]
+        user_titles[user_id] = {id_maps['titles'][title] for title in user.get(User.PROPERTIES.TITLES) or []}
+
+    _sync_links(cur, dbq.USER_TITLE_LINKS_IN, dbq.INSERT_TITLE_USER, dbq.REMOVE_USER_TITLES_IN, user_titles)
+
+
+def _print_settings_data(entity_print_settings):
+    """
+    Normalize print settings of a thing or a make into a tuple ordered as in INSERT_PRINT_SETTINGS query.
+    The last item of the tuple is the hash of the normalized settings, used to share identical combinations.
+    :return: print settings tuple, None if no print settings were given
+    """
+    if entity_print_settings is None:
         return None
 
+    # create a list for print settings
+    print_settings = []
+
+    # for each possible print setting, append to list, if setting needs encoding, apply it before adding
+    for setting in gconf.ThingSettings.POSSIBLE_PRINT_SETTINGS:
+        setting = to_field_format(setting)
+
+        if setting not in entity_print_settings:
+            print_settings.append(None)
+            continue
+
+        setting_value = entity_print_settings[setting]
+
+        if setting_value is not None and setting in gconf.ThingSettings.ENCODE_PRINT_SETTINGS:
+            setting_value = gconf.ThingSettings.PRINT_SETTINGS_ENCODER[setting_value.lower()]
+        elif isinstance(setting_value, str):
+            setting_value = setting_value.strip()
+
+        print_settings.append(setting_value)
 
-def _insert_tag(cur, tag):
-    cur.execute(dbq.INSERT_TAG, [tag])
-    tag_id = cur.lastrowid
-    logger.debug("Tag '{}' inserted at tag_id '{}'".format(tag, tag_id))
+    settings_hash = hashlib.sha1(json.dumps(print_settings).encode('utf-8')).hexdigest()
 
-    return tag_id
+    return tuple(print_settings) + (settings_hash,)
 
 
-def _insert_tag_thing(cur, tag_id, thing_id):
+def _insert_print_settings(cur, entities_print_settings, setting_ids):
     """
-    Pair tag and thing based on given ids and insert them into tag_thing table.
-    :return: tag_thing_id
+    Inserts print settings combinations that are not yet in the database at cursor cur.
+    Identical combinations share a single row, found by their hash in setting_ids (hash -> setting_id map).
+    :param entities_print_settings: list of print settings dictionaries (or None) of things or makes
+    :return: list of setting_id matching given print settings (None where no print settings were given)
     """
-    cur.execute(dbq.INSERT_TAG_THING, [tag_id, thing_id])
-    logger.debug("Linked tag_id '{}' and thing_id '{}'".format(tag_id, thing_id))
+    settings_data = [_print_settings_data(print_settings) for print_settings in entities_print_settings]
+
+    # insert each missing combination once (sorted by hash, so concurrent loads lock rows in the same order),
+    # then get its id
+    missing = {data[-1]: data for data in settings_data if data is not None and data[-1] not in setting_ids}
+    missing = dict(sorted(missing.items()))
+
+    for chunk in _chunks(missing.values()):
+        cur.executemany(dbq.INSERT_PRINT_SETTINGS, chunk)
+
+    _read_back_ids(cur, dbq.SETTING_IDS_IN, list(missing), setting_ids)
+    logger.debug("%d print settings resolved, %d new combinations inserted", len(settings_data), len(missing))
 
+    return [None if data is None else setting_ids[data[-1]] for data in settings_data]
 
-def _insert_print_settings(cur, thing_print_settings):
+
+def _thing_data(thing, user_id, settings_id, remix_id=None):
     """
-    Inserts new print settings a cursor cur location.
-    :return: setting_id
+    Create a tuple of single thing or remix fields, ordered as in UPSERT_THING query.
     """
-    # add print settings, get print setting id
-    if thing_print_settings is None:
-        return None
-    else:
-        # create a list for print settings
-        print_settings = []
-
-        # for each possible print setting, append to list, if setting needs encoding, apply it before adding
-        for setting in gconf.ThingSettings.POSSIBLE_PRINT_SETTINGS:
-            setting = to_field_format(setting)
-
-            if setting not in thing_print_settings:
-                print_settings.append(None)
-                continue
-
-            setting_value = thing_print_settings[setting]
-
-            if setting_value is not None and setting in gconf.ThingSettings.ENCODE_PRINT_SETTINGS:
-                setting_value = gconf.ThingSettings.PRINT_SETTINGS_ENCODER[setting_value.lower()]
-
-            print_settings.append(setting_value)
-
-        # insert as new print settings
-        cur.execute(dbq.INSERT_PRINT_SETTINGS, print_settings)
-        return cur.lastrowid
-
-
-def _insert_thing(cur, thing, user_id, settings_id, remix_id=None, remix_thingiverse_id=None):
-    """Inserts single thing or remix"""
-    # construct thing data tuple to be used in query
-    thing_data = (thing[Thing.PROPERTIES.THING_ID],
-                  user_id,
-                  thing[Thing.PROPERTIES.MODEL_NAME],
-                  thing[Thing.PROPERTIES.UPLOADED],
-                  thing[Thing.PROPERTIES.FILES],
-                  thing[Thing.PROPERTIES.COMMENTS],
-                  thing[Thing.PROPERTIES.MAKES],
-                  thing[Thing.PROPERTIES.REMIXES],
-                  thing[Thing.PROPERTIES.LIKES],
-                  settings_id,
-                  thing[Thing.PROPERTIES.LICENSE],
-                  remix_id,
-                  remix_thingiverse_id,
-                  thing[Thing.PROPERTIES.CATEGORY])
-
-    # add thing to database, return row id
-    cur.execute(dbq.INSERT_THING, thing_data)
-    return cur.lastrowid
-
-
-def _update_thing(cur, thing, thing_id):
-    thing_data = (thing[Thing.PROPERTIES.MODEL_NAME],
-                  thing[Thing.PROPERTIES.FILES],
-                  thing[Thing.PROPERTIES.COMMENTS],
-                  thing[Thing.PROPERTIES.MAKES],
-                  thing[Thing.PROPERTIES.REMIXES],
-                  thing[Thing.PROPERTIES.LIKES],
-                  thing[Thing.PROPERTIES.LICENSE],
-                  thing[Thing.PROPERTIES.CATEGORY],
-                  thing_id)
-
-    cur.execute(dbq.UPDATE_THING, thing_data)
-
-
-def _insert_things(things, cur):
-    """Inserts a list of thing dictionaries into database at courser cur."""
-    for thing in things:
-        # thing exists
-        if cur.execute(dbq.SELECT_THING_ID, [thing[Thing.PROPERTIES.THING_ID]]):
-            thing_id = _fetch_value(cur)
-            _update_thing(cur, thing, thing_id)
-        #  thing doesn't exist
+    return (thing[Thing.PROPERTIES.THING_ID],
+            user_id,
+            thing[Thing.PROPERTIES.MODEL_NAME],
+            thing[Thing.PROPERTIES.UPLOADED],
+            thing[Thing.PROPERTIES.FILES],
+            thing[Thing.PROPERTIES.COMMENTS],
+            thing[Thing.PROPERTIES.MAKES],
+            thing[Thing.PROPERTIES.REMIXES],
+            thing[Thing.PROPERTIES.LIKES],
+            settings_id,
+            thing[Thing.PROPERTIES.LICENSE],
+            remix_id,
+            thing[Thing.PROPERTIES.REMIX],
+            thing[Thing.PROPERTIES.CATEGORY],
+            thing[Thing.PROPERTIES.USERNAME])
+
+
+def _insert_things(things, cur, id_maps):
+    """Upserts a list of thing dictionaries into database at courser cur."""
+    thing_ids = id_maps['things']
+    things_data = []
+    new_things = []
+    existing_things = []
+
+    # get setting_id of each thing's print settings, inserting new combinations
+    settings_ids = _insert_print_settings(cur,
+                                          [thing[Thing.PROPERTIES.PRINT_SETTINGS] for thing in things],
+                                          id_maps['print_settings'])
+
+    for thing, settings_id in zip(things, settings_ids):
+        thingiverse_id = str(thing[Thing.PROPERTIES.THING_ID])
+
+        if thingiverse_id not in thing_ids:
+            new_things.append(thingiverse_id)
         else:
+            existing_things.append(thingiverse_id)
 
-            # get setting_id from print setting table; insert new print setting and get its id
-            settings_id = _insert_print_settings(cur, thing[Thing.PROPERTIES.PRINT_SETTINGS])
+        # find user id and original thing id (if thing is a remix), enter none if they don't exist
+        user_id = id_maps['users'].get(thing[Thing.PROPERTIES.USERNAME])
+        remix_id = thing_ids.get(str(thing[Thing.PROPERTIES.REMIX]))
 
-            # find user id in database and gets its id, enter none if user doesn't exist
-            user_id = _fetch_value(cur) if cur.execute(dbq.SELECT_USER_ID, [thing[Thing.PROPERTIES.USERNAME]]) else None
+        things_data.append(_thing_data(thing, user_id, settings_id, remix_id))
 
-            # check if thing is remix, get original thing id from database
-            remix_id = _fetch_value(cur) if cur.execute(dbq.SELECT_THING_ID,
-                                                        [thing[Thing.PROPERTIES.REMIX]]) else None
+    # aggregate groups existing things belonged to before the update
+    _touch_aggregates(cur, dbq.THING_AGGREGATE_GROUPS, existing_things, id_maps[TOUCHED])
 
-            # insert new thing
-            thing_id = _insert_thing(cur,
-                                     thing,
-                                     user_id,
-                                     settings_id,
-                                     remix_id,
-                                     remix_thingiverse_id=thing[Thing.PROPERTIES.REMIX])
+    # insert new things and update existing ones (matched by the unique thingiverse id)
+    for chunk in _chunks(things_data):
+        cur.executemany(dbq.UPSERT_THING, chunk)
 
-        # for each tag, add new if doesnt exist, add tag id and thing id into common table
-        thing_tags = thing[Thing.PROPERTIES.TAGS]
+    _read_back_ids(cur, dbq.THING_IDS_IN, new_things, thing_ids)
+    logger.debug("%d things upserted, %d of them new", len(things_data), len(new_things))
 
-        if thing_tags:
-            thing_tags = set(thing_tags)
-        else:
-            thing_tags = set()
+    _append_metrics(cur, dbq.INSERT_THING_METRICS, things, thing_ids, id_maps['thing_metrics'],
+                    Thing.PROPERTIES.THING_ID, THING_METRICS)
 
-        if cur.execute(dbq.THING_TAGS, thing_id):
-            db_tags = {db_title['tag'] for db_title in cur.fetchall()}
-        else:
-            db_tags = set()
+    # for each tag, add new if doesnt exist, add tag id and thing id into common table
+    _insert_tags(things, cur, id_maps)
 
-        new_tags = thing_tags.difference(db_tags)
-        remove_tags = db_tags.difference(thing_tags)
+    thing_tags = {}
+    for thing in things:
+        thing_id = thing_ids[str(thing[Thing.PROPERTIES.THING_ID])]
+        thing_tags[thing_id] = {id_maps['tags'][tag] for tag in thing[Thing.PROPERTIES.TAGS] or []}
+
+    _sync_links(cur, dbq.THING_TAG_LINKS_IN, dbq.INSERT_TAG_THING, dbq.REMOVE_THING_TAGS_IN, thing_tags)
+
+    _touch_aggregates(cur, dbq.THING_AGGREGATE_GROUPS, [thing_data[0] for thing_data in things_data],
+                      id_maps[TOUCHED])
+
+
+def _insert_tags(things, cur, id_maps):
+    """Inserts all tags of a list of thing dictionaries that are not yet in the database at courser cur."""
+    all_tags = set()
+    for thing in things:
+        all_tags.update(thing.get(Thing.PROPERTIES.TAGS) or [])
 
-        for tag in new_tags:
-            tag_id = _get_tag_id(cur, tag)
-            if tag_id is None:
-                tag_id = _insert_tag(cur, tag)
-            _insert_tag_thing(cur, tag_id, thing_id)
+    _insert_missing_keys(cur, dbq.INSERT_TAG, dbq.TAG_IDS_IN, all_tags, id_maps['tags'])
 
-        for tag in remove_tags:
-            tag_id = _get_tag_id(cur, tag)
-            cur.execute(dbq.REMOVE_THING_TAG, [tag_id, thing_id])
 
+def _insert_lookup_keys(data, cur, id_maps):
+    """
+    Insert the lookup rows shared by entities of different chunks (titles, tags and print settings) that are not
+    yet in the database at cur, sorted, so the chunks loaded in parallel afterwards only read their ids.
+    """
+    titles = set()
+    for user in data.get('users', {}).values():
+        titles.update(user.get(User.PROPERTIES.TITLES) or [])
+    _insert_missing_keys(cur, dbq.INSERT_TITLE, dbq.TITLE_IDS_IN, titles, id_maps['titles'])
+
+    things = list(data.get('things', {}).values())
+    _insert_tags(things, cur, id_maps)
 
-def _update_make(cur, make, make_id):
-    make_data = (make[Make.PROPERTIES.COMMENTS],
-                 make[Make.PROPERTIES.LIKES],
-                 make[Make.PROPERTIES.VIEWS],
-                 make[Make.PROPERTIES.CATEGORY],
-                 make_id)
+    print_settings = [thing.get(Thing.PROPERTIES.PRINT_SETTINGS) for thing in things]
+    print_settings += [make.get(Make.PROPERTIES.PRINT_SETTINGS) for make in data.get('makes', {}).values()]
+    _insert_print_settings(cur, print_settings, id_maps['print_settings'])
 
-    cur.execute(dbq.UPDATE_MAKE, make_data)
 
+def _insert_makes(makes, cur, id_maps):
+    """Upserts a list of make dictionaries into database at courser cur."""
+    make_ids = id_maps['makes']
+    known_makes = []
+    makes_data = []
+    new_makes = []
+    existing_makes = []
 
-def _insert_makes(makes, cur):
-    """Inserts a list of make dictionaries into database at courser cur."""
+    # find original thing id in database, makes of unknown things can't be inserted
     for make in makes.values():
-        # Check if make exists in the database based on thingiverse make id
+        thing_id = id_maps['things'].get(str(make[Make.PROPERTIES.THING_ID]))
+        if thing_id is None:
+            logger.warning("Make {} skipped: source thing {} is not in the database".format(
+                make[Make.PROPERTIES.MAKE_ID], make[Make.PROPERTIES.THING_ID]))
+            continue
+        known_makes.append((make, thing_id))
+
+    # get setting_id of each make's print settings, inserting new combinations
+    settings_ids = _insert_print_settings(cur,
+                                          [make[Make.PROPERTIES.PRINT_SETTINGS] for make, _ in known_makes],
+                                          id_maps['print_settings'])
+
+    for (make, thing_id), settings_id in zip(known_makes, settings_ids):
+        thingiverse_id = str(make[Make.PROPERTIES.MAKE_ID])
 
-        if cur.execute(dbq.SELECT_MAKE_ID, [make[Make.PROPERTIES.MAKE_ID]]):
-            make_id = _fetch_value(cur)
-            _update_make(cur, make, make_id)
-        # create new make if doesn't exist
+        if thingiverse_id not in make_ids:
+            new_makes.append(thingiverse_id)
         else:
+            existing_makes.append(thingiverse_id)
 
-            # insert print settings and get id
-            settings_id = _insert_print_settings(cur, make[Make.PROPERTIES.PRINT_SETTINGS])
+        # construct make data tuple to be used in query, enter none as user id if user doesn't exist
+        makes_data.append((make[Make.PROPERTIES.MAKE_ID],
+                           thing_id,
+                           id_maps['users'].get(make[Make.PROPERTIES.USERNAME]),
+                           make[Make.PROPERTIES.UPLOADED],
+                           make[Make.PROPERTIES.COMMENTS],
+                           make[Make.PROPERTIES.LIKES],
+                           make[Make.PROPERTIES.VIEWS],
+                           make[Make.PROPERTIES.CATEGORY],
+                           settings_id,
+                           make[Make.PROPERTIES.USERNAME]))
 
-            # find user id in database and gets its id, enter none if user doesn't exist
-            user_id = _fetch_value(cur) if cur.execute(dbq.SELECT_USER_ID,
-                                                       [make[Make.PROPERTIES.USERNAME]]) else None
+    # aggregate groups existing makes belonged to before the update
+    _touch_aggregates(cur, dbq.MAKE_AGGREGATE_GROUPS, existing_makes, id_maps[TOUCHED])
 
-            # find original thing id in database, enter none if doesn't exist
-            thing_id = _fetch_value(cur) if cur.execute(dbq.SELECT_THING_ID,
-                                                        [make[Make.PROPERTIES.THING_ID]]) else None
+    # insert new makes and update existing ones (matched by the unique thingiverse id)
+    for chunk in _chunks(makes_data):
+        cur.executemany(dbq.UPSERT_MAKE, chunk)
 
-            # construct make data tuple to be used in query
-            make_data = (make[Make.PROPERTIES.MAKE_ID],
-                         thing_id,
-                         user_id,
-                         make[Make.PROPERTIES.UPLOADED],
-                         make[Make.PROPERTIES.COMMENTS],
-                         make[Make.PROPERTIES.LIKES],
-                         make[Make.PROPERTIES.VIEWS],
-                         make[Make.PROPERTIES.CATEGORY],
-                         settings_id)
+    _read_back_ids(cur, dbq.MAKE_IDS_IN, new_makes, make_ids)
+    _touch_aggregates(cur, dbq.MAKE_AGGREGATE_GROUPS, [make_data[0] for make_data in makes_data], id_maps[TOUCHED])
+    logger.debug("%d makes upserted, %d of them new", len(makes_data), len(new_makes))
 
-            # add make to database
-            cur.execute(dbq.INSERT_MAKE, make_data)
+    _append_metrics(cur, dbq.INSERT_MAKE_METRICS, [make for make, _ in known_makes], make_ids, id_maps['make_metrics'],
+                    Make.PROPERTIES.MAKE_ID, MAKE_METRICS)
 
 
 def parse_sql(filename=gconf.DB_builder.SQL_CONSTRUCTION):
@@ -384,44 +595,294 @@ def _build_db_form_script(cur, db_name):
         cur.execute(statement)
 
 
-def _insert_data(cur, data):
-    """Insert data users, things, remixes and makes into the database at cur"""
+def _migrate_schema(cur, db_name):
+    """
+    Bring an existing database at cur up to date with the construction script.
+    Adds missing tables and columns, and the unique keys on natural identifiers the upsert queries rely on.
+    :return: list of the tables that were added
+    """
+    created_tables = []
+    building_script = os.path.abspath(os.path.join(gconf.DB_builder.DB_DIR, gconf.DB_builder.SQL_CONSTRUCTION))
+    for statement in parse_sql(filename=building_script):
+        table = re.match(r"CREATE TABLE (\w+)", statement)
+        if table and not cur.execute(dbq.TABLE_EXISTS, [db_name, table.group(1)]):
+            logger.info("Adding missing table `{}`".format(table.group(1)))
+            cur.execute(statement)
+            created_tables.append(table.group(1))
+
+    for table, column, definition in dbq.SCHEMA_COLUMNS:
+        if not cur.execute(dbq.COLUMN_EXISTS, [db_name, table, column]):
+            logger.info("Adding missing column `{}`.`{}`".format(table, column))
+            cur.execute(dbq.ADD_COLUMN.format(table=table, column=column, definition=definition))
+
+    for table, column in dbq.NATURAL_KEYS:
+        if not cur.execute(dbq.UNIQUE_KEY_EXISTS, [db_name, table, column]):
+            logger.info("Adding missing unique key on `{}`.`{}`".format(table, column))
+            cur.execute(dbq.ADD_UNIQUE_KEY.format(table=table, column=column))
+
+    return created_tables
+
+
+def _connect(host=conf.MYSQL_HOST, user=conf.MYSQL_USER, password=conf.MYSQL_PASSWORD, local_infile=False):
+    """
+    Set up mysql server connection. Default server settings are taken from Database/config.py.
+     :param local_infile: allow LOAD DATA LOCAL INFILE statements over the connection.
+     :return: pymysql connection using dictionary cursors, None if connection failed.
+    """
+    # pymysql is only needed by the mysql backend
+    import pymysql
+
+    try:
+        connection = pymysql.connect(host=host,
+                                     user=user,
+                                     password=password,
+                                     cursorclass=pymysql.cursors.DictCursor,
+                                     auth_plugin_map='mysql_native_password',
+                                     local_infile=local_infile)
+    except pymysql.err.OperationalError as e:
+        logger.error("Connection to mysql server failed : {}".format(e))
+        return None
+
+    logger.debug("Connected to mysql successfully")
+    return connection
+
+
+def _prepare_database(cur, db_name, drop_existing):
+    """
+    Make sure database exists and matches the construction script, and use it at cur.
+     :param drop_existing: if true, drop database first if existing.
+     :return: (empty_database, created_tables): True if the database was built from scratch (empty),
+              False if an existing database is used, and the list of tables added to an existing database.
+    """
+    import pymysql
+
+    empty_database = True
+    created_tables = []
+
+    try:
+        cur.execute('USE {};'.format(db_name))
+        logger.debug("Database `{}` exists".format(db_name))
+
+        if drop_existing:
+            cur.execute('DROP DATABASE {};'.format(db_name))
+            logger.debug("Database `{}` dropped".format(db_name))
+            _build_db_form_script(cur, db_name)
+        else:
+            created_tables = _migrate_schema(cur, db_name)
+            empty_database = False
+
+    except pymysql.err.OperationalError:
+        _build_db_form_script(cur, db_name)
+
+    finally:
+        cur.execute('USE {};'.format(db_name))
+
+    return empty_database, created_tables
+
+
+def _insert_data(cur, data, id_maps):
+    """
+    Insert data users, things, remixes and makes into the database at cur.
+    id_maps are natural key -> surrogate id maps (see _load_id_maps), updated in place with inserted rows.
+    """
     try:
-        _insert_users(data['users'], cur)
+        with _timed_phase('users'):
+            _insert_users(data['users'], cur, id_maps)
         logger.info('Users inserted to database')
     except KeyError as e:
         logger.error(f"Failed to insert users to database: {e}")
     try:
         things = [thing for thing in data['things'].values() if thing['remix'] is None]
-        _insert_things(things, cur)
+        with _timed_phase('things'):
+            _insert_things(things, cur, id_maps)
         logger.info('Things inserted to database')
     except KeyError as e:
         logger.error(f"Failed to insert things to database: {e}")
     try:
         remixes = [thing for thing in data['things'].values() if thing['remix'] is not None]
-        _insert_things(remixes, cur)
+        with _timed_phase('remixes'):
+            _insert_things(remixes, cur, id_maps)
         logger.info('Remixes inserted to database')
     except KeyError as e:
         logger.error(f"Failed to insert remixes to database: {e}")
     try:
-        _insert_makes(data['makes'], cur)
+        with _timed_phase('makes'):
+            _insert_makes(data['makes'], cur, id_maps)
         logger.info('Makes inserted to database')
     except KeyError as e:
         logger.error(f"Failed to insert makes to database: {e}")
 
 
-def build_database(json_data, db_name=gconf.DB_builder.DB_NAME, drop_existing=True):
+def _chunk_maps(id_maps):
+    """
+    Returns the id maps of a single chunk attempt: lookups fall through to the shared id_maps, which chunks loaded
+    in parallel only read, while the ids the chunk adds and the aggregate groups it touches are kept apart,
+    to be merged (see _merge_chunk_maps) once the chunk is committed.
+    """
+    chunk_maps = {table: collections.ChainMap({}, id_map) for table, id_map in id_maps.items() if table != TOUCHED}
+    chunk_maps[TOUCHED] = {table: set() for table in id_maps[TOUCHED]}
+    return chunk_maps
+
+
+def _merge_chunk_maps(id_maps, chunk_maps):
+    """
+    Add the ids and touched groups of a committed chunk (see _chunk_maps) to the shared id_maps.
+    """
+    for table, id_map in chunk_maps.items():
+        if table == TOUCHED:
+            for aggregate, groups in id_map.items():
+                id_maps[TOUCHED][aggregate].update(groups)
+        else:
+            id_maps[table].update(id_map.maps[0])
+
+
+def _is_transient(error):
+    """
+    Returns True if error is a transient database failure (see TRANSIENT_MYSQL_ERRORS, or a locked SQLite database),
+    after which the rolled back transaction may succeed if retried.
+    """
+    if isinstance(error, sqlite3.OperationalError):
+        return 'locked' in str(error)
+
+    # pymysql errors can only be raised if the mysql backend imported it
+    pymysql = sys.modules.get('pymysql')
+    return (pymysql is not None and isinstance(error, pymysql.err.OperationalError)
+            and bool(error.args) and error.args[0] in TRANSIENT_MYSQL_ERRORS)
+
+
+def _load_chunk(pool, loader, chunk, id_maps):
+    """
+    Load a single chunk of items using loader over a pooled connection, in its own transaction.
+    Chunks failing on transient errors (see _is_transient) are rolled back and retried, up to CHUNK_RETRIES attempts,
+    any other error is raised at once. Every attempt writes its own chunk maps (see _chunk_maps), so ids of rolled
+    back rows are never shared.
+    :return: the chunk maps of the committed chunk, None if every attempt failed
+    """
+    with pool.connection() as connection:
+        cur = connection.cursor()
+        try:
+            for attempt in range(1, gconf.DB_builder.CHUNK_RETRIES + 1):
+                chunk_maps = _chunk_maps(id_maps)
+                try:
+                    loader(chunk, cur, chunk_maps)
+                    connection.commit()
+                    return chunk_maps
+                except Exception as e:
+                    connection.rollback()
+                    if not _is_transient(e):
+                        raise
+                    logger.warning("Failed to load a chunk of %d items with %s (attempt %d/%d): %s", len(chunk),
+                                   loader.__name__, attempt, gconf.DB_builder.CHUNK_RETRIES, e)
+        finally:
+            cur.close()
+    return None
+
+
+def _insert_data_parallel(pool, data, id_maps, chunk_size=gconf.DB_builder.COMMIT_CHUNK_SIZE):
+    """
+    Insert data users, things, remixes and makes into the database using pool connections.
+    Lookup rows shared by several chunks (titles, tags, print settings) are inserted first, in a single transaction.
+    Items are then committed in chunks of chunk_size, and chunks are loaded in parallel in foreign key safe stages:
+    users, then things, then remixes, then makes. id_maps are updated with the ids of every stage once it is loaded.
+    Raises RuntimeError if a chunk could not be loaded (see _load_chunk), as later stages depend on it.
+    """
+    try:
+        things = [thing for thing in data['things'].values() if thing['remix'] is None]
+        remixes = [thing for thing in data['things'].values() if thing['remix'] is not None]
+    except KeyError as e:
+        logger.error(f"Failed to split things and remixes: {e}")
+        things, remixes = [], []
+
+    # users and makes loaders expect dictionaries, things loaders expect lists
+    users_tasks = [(_insert_users, dict(chunk)) for chunk in _chunks(data.get('users', {}).items(), chunk_size)]
+    things_tasks = [(_insert_things, chunk) for chunk in _chunks(things, chunk_size)]
+    remixes_tasks = [(_insert_things, chunk) for chunk in _chunks(remixes, chunk_size)]
+    makes_tasks = [(_insert_makes, dict(chunk)) for chunk in _chunks(data.get('makes', {}).items(), chunk_size)]
+
+    stages = [('Lookup keys', [(_insert_lookup_keys, data)]),
+              ('Users', users_tasks),
+              ('Things', things_tasks),
+              ('Remixes', remixes_tasks),
+              ('Makes', makes_tasks)]
+
+    with ThreadPoolExecutor(max_workers=pool.size) as executor:
+        for stage, tasks in stages:
+            with _timed_phase(stage.lower()):
+                results = list(executor.map(_load_chunk,
+                                            repeat(pool), [loader for loader, _ in tasks],
+                                            [chunk for _, chunk in tasks], repeat(id_maps)))
+
+            # ids of committed chunks are shared with the next stages
+            for chunk_maps in results:
+                if chunk_maps is not None:
+                    _merge_chunk_maps(id_maps, chunk_maps)
+
+            failed = results.count(None)
+            if failed:
+                raise RuntimeError("{}: {} of {} chunks could not be loaded".format(stage, failed, len(results)))
+            logger.info('{} inserted to database'.format(stage))
+
+
+def _open_database(db_name, drop_existing, backend='mysql', local_infile=False, **mysql_settings):
+    """
+    Connect to the database of given backend, creating it (or bringing it up to date) if needed.
+     :param backend: mysql or sqlite. SQLite databases are files named after db_name (see gconf.DB_builder).
+     :param local_infile: if true, allow LOAD DATA LOCAL INFILE on the returned (mysql) connection.
+     :return: (connection, connect, empty_database): an open connection to the database (None if connection failed),
+              a function with no arguments that opens another connection to it,
+              and True if the database was built from scratch (empty).
+    """
+    if backend == 'sqlite':
+        from Database import sqlite_backend
+        db_path = sqlite_backend.database_path(db_name)
+        if drop_existing:
+            sqlite_backend.drop_database(db_path)
+
+        connection = sqlite_backend.connect(db_path)
+        connect = lambda: sqlite_backend.connect(db_path)
+        cur = connection.cursor()
+        empty_database, created_tables = sqlite_backend.prepare_database(cur)
+    else:
+        connection = _connect(local_infile=local_infile, **mysql_settings)
+        if connection is None:
+            return None, None, False
+
+        connect = lambda: _connect(**mysql_settings)
+        cur = connection.cursor()
+        empty_database, created_tables = _prepare_database(cur, db_name, drop_existing)
+        connection.select_db(db_name)
+
+    # aggregate tables added to an existing database are computed once from all of its rows
+    if not empty_database and set(created_tables).intersection(dbq.AGGREGATES):
+        _refresh_aggregates(cur)
+        connection.commit()
+
+    cur.close()
+    return connection, connect, empty_database
+
+
+def build_database(json_data, db_name=gconf.DB_builder.DB_NAME, drop_existing=True, bulk=False,
+                   connections=gconf.DB_builder.CONNECTIONS, chunk_size=gconf.DB_builder.COMMIT_CHUNK_SIZE,
+                   backend='mysql', **mysql_settings):
     """
     Builds a database of given things, makes and users from a JSON file.
-     :param json_data: either JSON data or an  absolute path to a JSON file
+     :param json_data: either JSON data or an  absolute path to a JSON file (full or delta snapshot)
      :param db_name: the path to save the database. Default:  gconf.DB_builder.DB_NAME
      :param drop_existing: if true, drop database first if existing. Default: True.
+     :param bulk: if true and the database is built from scratch, stage every table as a file and load it
+                  using LOAD DATA LOCAL INFILE (see Database/bulk_load.py). mysql only. Default: False.
+     :param connections: number of connections used to load independent chunks in parallel.
+     :param chunk_size: number of items committed together in a single transaction.
+     :param backend: mysql or sqlite (a local database file, see Database/sqlite_backend.py). Default: mysql.
+     :param mysql_settings: host, user and password of the mysql server. Default: Database/config.py
     """
-    logger.info("Building database {}".format(db_name))
+    logger.info("Building {} database {}".format(backend, db_name))
 
     if isinstance(json_data, str):
         if os.path.exists(json_data):
-            data = json.load(open(json_data, 'r'))
+            with _timed_phase('read_snapshot'):
+                data = read_snapshot(json_data)
+            _stamp_snapshot(data, json_data)
         else:
             logger.error("Could not find JSON file at given path: {}".format(json_data))
             logger.error("Building database aborted.")
@@ -430,40 +891,44 @@ def build_database(json_data, db_name=gconf.DB_builder.DB_NAME, drop_existing=Tr
     else:
         data = json_data
 
-    # Set up mysql server connection
-    try:
-        connection = pymysql.connect(host=conf.MYSQL_HOST,
-                                     user=conf.MYSQL_USER,
-                                     password=conf.MYSQL_PASSWORD,
-                                     cursorclass=pymysql.cursors.DictCursor,
-                                     auth_plugin_map='mysql_native_password')
-    except pymysql.err.OperationalError as e:
-        logger.error("Connection to mysql server failed : {}".format(e))
+    if backend == 'sqlite':
+        if bulk:
+            logger.warning("Bulk load is only available for mysql. Using regular loader.")
+            bulk = False
+        # SQLite allows a single writer at a time, large chunks are written over one connection
+        connections = 1
+
+    connection, connect, empty_database = _open_database(db_name, drop_existing, backend, local_infile=bulk,
+                                                         **mysql_settings)
+    if connection is None:
         return
 
-    logger.debug("Connected to mysql successfully")
     cur = connection.cursor()
 
-    try:
-        cur.execute('USE {};'.format(db_name))
-        logger.debug("Database `{}` exists".format(db_name))
-
-        if drop_existing:
-            cur.execute('DROP DATABASE {};'.format(db_name))
-            logger.debug("Database dropped".format(db_name))
-
-    except pymysql.err.OperationalError:
-        _build_db_form_script(cur, db_name)
-
-    finally:
-        cur.execute('USE {};'.format(db_name))
+    if bulk and empty_database:
+        from Database.bulk_load import bulk_load
+        with _timed_phase('bulk_load'):
+            bulk_load(cur, data)
+        _backfill_remix_ids(cur)
+        _refresh_aggregates(cur)
+        connection.commit()
+    else:
+        if bulk:
+            logger.warning("Bulk load requires an empty database (see --reset-database). Using regular loader.")
 
-    connection.select_db(db_name)
+        with _timed_phase('id_maps'):
+            id_maps = _load_id_maps(cur)
+        with ConnectionPool(connect, size=connections, db_name=db_name) as pool:
+            _insert_data_parallel(pool, data, id_maps, chunk_size)
 
-    _insert_data(cur, data)
+        # end the snapshot read by the id maps before reading the loaded rows
+        connection.commit()
+        _backfill_remix_ids(cur, id_maps[TOUCHED])
+        _backfill_user_ids(cur)
+        _refresh_aggregates(cur, id_maps[TOUCHED])
+        connection.commit()
 
     cur.close()
-    connection.commit()
     connection.close()
 
 
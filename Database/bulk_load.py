@@ -0,0 +1,222 @@
+import os
+import tempfile
+import logging
+
+import Database.db_queries as dbq
+import general_config as gconf
+
+from Database.build_db import _user_data, _thing_data, _print_settings_data, _metrics_row, \
+    USER_METRICS, THING_METRICS, MAKE_METRICS
+from ThingScraper import Thing, User, Make
+
+# Define file logger
+logger = logging.getLogger(gconf.Logs.LOGGER_NAME)
+
+# Staged tables and their columns, in foreign key safe loading order
+TABLE_COLUMNS = [('users', ('user_id', 'username', 'followers', 'following', 'designs', 'collections', 'makes',
+                            'likes', 'skill_level')),
+                 ('titles', ('title_id', 'title')),
+                 ('user_title', ('title_id', 'user_id')),
+                 ('tags', ('tag_id', 'tag')),
+                 ('print_settings', ('setting_id', 'printer_brand', 'printer_model', 'rafts', 'supports',
+                                     'resolution', 'infill', 'filament_brand', 'filament_color',
+                                     'filament_material', 'settings_hash')),
+                 ('things', ('thing_id', 'thigiverse_id', 'user_id', 'model_name', 'uploaded', 'files', 'comments',
+                             'makes', 'remixes', 'likes', 'setting_id', 'license', 'remix_id', 'thigiverse_remix',
+                             'category', 'username')),
+                 ('thing_tag', ('tag_id', 'thing_id')),
+                 ('makes', ('make_id', 'thigiverse_id', 'thing_id', 'user_id', 'uploaded', 'comments', 'likes',
+                            'views', 'category', 'setting_id', 'username')),
+                 ('user_metrics', ('user_id', 'scraped_at', 'followers', 'following', 'designs', 'collections',
+                                   'makes', 'likes')),
+                 ('thing_metrics', ('thing_id', 'scraped_at', 'likes', 'makes', 'comments', 'remixes')),
+                 ('make_metrics', ('make_id', 'scraped_at', 'likes', 'comments', 'views'))]
+
+# Characters escaped in staged files, matching LOAD DATA default escape character
+TSV_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r', '\0': '\\0'})
+
+
+def _assign_ids(keys):
+    """Returns a natural key -> surrogate id map for given keys, numbered from 1 in the given order."""
+    return {key: surrogate_id for surrogate_id, key in enumerate(keys, start=1)}
+
+
+def _stage_metrics(rows, row):
+    """Append a metrics history row to rows, unless its entity has no scrape time (see _metrics_row)."""
+    if row is not None:
+        rows.append(row)
+
+
+def _tsv_value(value):
+    """Convert a single python value into its LOAD DATA representation."""
+    if value is None:
+        return '\\N'
+    return str(value).translate(TSV_ESCAPES)
+
+
+def _stage_print_settings(rows, setting_ids, print_settings):
+    """
+    Stage print settings of a thing or a make, identical combinations are staged once.
+    :param rows: staged rows, print_settings rows are appended to it
+    :param setting_ids: settings hash -> setting_id map of already staged combinations
+    :return: setting_id of given print settings, None if no print settings were given
+    """
+    settings_data = _print_settings_data(print_settings)
+    if settings_data is None:
+        return None
+
+    if settings_data[-1] not in setting_ids:
+        setting_ids[settings_data[-1]] = len(setting_ids) + 1
+        rows['print_settings'].append((setting_ids[settings_data[-1]],) + settings_data)
+
+    return setting_ids[settings_data[-1]]
+
+
+def _stage_rows(data):
+    """
+    Resolve all surrogate ids of given data in python and build the rows of every table.
+    Ids are numbered from 1, so data must be loaded into an empty database.
+    :return: dictionary of table name -> list of row tuples (ordered as in TABLE_COLUMNS)
+    """
+    rows = {table: [] for table, _ in TABLE_COLUMNS}
+
+    # users and their titles
+    users = []
+    for user in data['users'].values():
+        try:
+            users.append((_user_data(user), user.get(User.PROPERTIES.TITLES) or []))
+        except KeyError as e:
+            logger.error(e)
+            continue
+
+        # user ids are assigned in staging order below
+        _stage_metrics(rows['user_metrics'], _metrics_row(user, len(users), USER_METRICS))
+
+    user_ids = _assign_ids(user_data[0] for user_data, _ in users)
+    title_ids = _assign_ids(sorted({title for _, titles in users for title in titles}))
+
+    rows['users'] = [(user_ids[user_data[0]],) + user_data for user_data, _ in users]
+    rows['titles'] = [(title_id, title) for title, title_id in title_ids.items()]
+    rows['user_title'] = [(title_ids[title], user_ids[user_data[0]]) for user_data, titles in users
+                          for title in set(titles)]
+
+    # print settings of things and makes, identical combinations are staged once
+    setting_ids = {}
+
+    # things and remixes, ids are assigned to all of them first so remixes resolve their source thing
+    things = []
+    for thing in data['things'].values():
+        try:
+            things.append((str(thing[Thing.PROPERTIES.THING_ID]), thing))
+        except KeyError as e:
+            logger.error(e)
+
+    thing_ids = _assign_ids(key for key, _ in things)
+    tag_ids = _assign_ids(sorted({tag for _, thing in things for tag in thing.get(Thing.PROPERTIES.TAGS) or []}))
+
+    rows['tags'] = [(tag_id, tag) for tag, tag_id in tag_ids.items()]
+
+    for key, thing in things:
+        thing_id = thing_ids[key]
+        try:
+            settings_id = _stage_print_settings(rows, setting_ids, thing[Thing.PROPERTIES.PRINT_SETTINGS])
+            thing_data = _thing_data(thing,
+                                     user_ids.get(thing[Thing.PROPERTIES.USERNAME]),
+                                     settings_id,
+                                     thing_ids.get(str(thing[Thing.PROPERTIES.REMIX])))
+            tags = set(thing[Thing.PROPERTIES.TAGS] or [])
+        except KeyError as e:
+            logger.error(e)
+            continue
+
+        rows['things'].append((thing_id,) + thing_data)
+        _stage_metrics(rows['thing_metrics'], _metrics_row(thing, thing_id, THING_METRICS))
+        rows['thing_tag'].extend((tag_ids[tag], thing_id) for tag in tags)
+
+    # makes, makes of unknown things can't be loaded
+    for make_id, make in enumerate(data['makes'].values(), start=1):
+        try:
+            thing_id = thing_ids.get(str(make[Make.PROPERTIES.THING_ID]))
+            if thing_id is None:
+                logger.warning("Make {} skipped: source thing {} is not in the data".format(
+                    make[Make.PROPERTIES.MAKE_ID], make[Make.PROPERTIES.THING_ID]))
+                continue
+
+            rows['makes'].append((make_id,
+                                      make[Make.PROPERTIES.MAKE_ID],
+                                      thing_id,
+                                      user_ids.get(make[Make.PROPERTIES.USERNAME]),
+                                      make[Make.PROPERTIES.UPLOADED],
+                                      make[Make.PROPERTIES.COMMENTS],
+                                      make[Make.PROPERTIES.LIKES],
+                                      make[Make.PROPERTIES.VIEWS],
+                                      make[Make.PROPERTIES.CATEGORY],
+                                      _stage_print_settings(rows, setting_ids,
+                                                            make[Make.PROPERTIES.PRINT_SETTINGS]),
+                                      make[Make.PROPERTIES.USERNAME]))
+        except KeyError as e:
+            logger.error(e)
+            continue
+
+        _stage_metrics(rows['make_metrics'], _metrics_row(make, make_id, MAKE_METRICS))
+
+    # things referencing a thing that failed to be staged must not point to it
+    staged_things = {row[0] for row in rows['things']}
+    rows['things'] = [row[:12] + ((row[12] if row[12] in staged_things else None),) + row[13:]
+                      for row in rows['things']]
+    rows['thing_tag'] = [row for row in rows['thing_tag'] if row[1] in staged_things]
+    rows['makes'] = [row for row in rows['makes'] if row[2] in staged_things]
+    rows['thing_metrics'] = [row for row in rows['thing_metrics'] if row[0] in staged_things]
+    staged_makes = {row[0] for row in rows['makes']}
+    rows['make_metrics'] = [row for row in rows['make_metrics'] if row[0] in staged_makes]
+
+    return rows
+
+
+def _write_tsv(path, rows):
+    """Write rows into a tab separated file at path, in the format expected by LOAD DATA."""
+    with open(path, 'w', encoding='utf-8', newline='\n') as file:
+        for row in rows:
+            file.write('\t'.join(_tsv_value(value) for value in row))
+            file.write('\n')
+
+
+def _check_load(cur, table, loaded, staged):
+    """
+    Raise RuntimeError if the LOAD DATA statement just run at cur loaded fewer rows than were staged,
+    or raised warnings (skipped or truncated rows).
+    """
+    cur.execute(dbq.SHOW_WARNINGS)
+    warnings = cur.fetchall()
+    if loaded != staged or warnings:
+        messages = '; '.join(str(warning.get('Message')) for warning in warnings[:5])
+        raise RuntimeError("Bulk load of `{}` loaded {} of {} staged rows with {} warnings: {}".format(
+            table, loaded, staged, len(warnings), messages))
+
+
+def bulk_load(cur, data, staging_dir=None):
+    """
+    Load data (users, things, remixes and makes) into an empty database at cur using LOAD DATA LOCAL INFILE.
+    Each table is staged as a tab separated file and loaded in foreign key safe order,
+    with foreign key and unique checks deferred during the load.
+    With LOCAL, rows that fail to convert or clash with a key are skipped with a warning only, so every load is
+    checked: RuntimeError is raised if a table did not load all of its staged rows or raised warnings.
+    The connection of cur must be opened with local_infile enabled.
+     :param cur: cursor of an empty database
+     :param data: users, things and makes dictionaries (JSON data)
+     :param staging_dir: directory in which staged files are temporarily created. Default: system temp dir.
+    """
+    rows = _stage_rows(data)
+
+    with tempfile.TemporaryDirectory(prefix='thingscraper_', dir=staging_dir) as tmp_dir:
+        cur.execute(dbq.DISABLE_LOAD_CHECKS)
+        try:
+            for table, columns in TABLE_COLUMNS:
+                path = os.path.join(tmp_dir, table + '.tsv')
+                _write_tsv(path, rows[table])
+
+                loaded = cur.execute(dbq.LOAD_DATA.format(table=table, columns=', '.join(columns)), [path])
+                _check_load(cur, table, loaded, len(rows[table]))
+                logger.info("{} rows bulk loaded into `{}`".format(loaded, table))
+        finally:
+            cur.execute(dbq.ENABLE_LOAD_CHECKS)
@@ -0,0 +1,85 @@
+import queue
+import threading
+import logging
+from contextlib import contextmanager
+
+import general_config as gconf
+
+# Define file logger
+logger = logging.getLogger(gconf.Logs.LOGGER_NAME)
+
+
+class ConnectionPool:
+    """
+    A small pool of database connections, shared by loader threads.
+    Connections are opened lazily (up to size) using given connect function and reused afterwards.
+
+    Usage:
+        pool = ConnectionPool(connect, size=4, db_name='thingiverse')
+        with pool.connection() as connection:
+            ...
+        pool.close()
+    """
+
+    def __init__(self, connect, size=gconf.DB_builder.CONNECTIONS, db_name=gconf.DB_builder.DB_NAME):
+        """
+        Construction of a new connection pool.
+          :param connect: function with no arguments that returns a new connection (or None if connection failed)
+          :param size: maximum number of open connections
+          :param db_name: database selected on every new connection
+        """
+        self.size = size
+        self.db_name = db_name
+
+        self._connect = connect
+        self._idle = queue.Queue()
+        self._opened = []
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _acquire(self):
+        """
+        Returns an idle connection, opens a new one if the pool is not full, otherwise waits for one to be released.
+        """
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if len(self._opened) < self.size:
+                connection = self._connect()
+                if connection is None:
+                    raise ConnectionError("Could not open a new database connection")
+                connection.select_db(self.db_name)
+                self._opened.append(connection)
+                logger.debug("Opened database connection {}/{}".format(len(self._opened), self.size))
+                return connection
+
+        return self._idle.get()
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrow a connection from the pool for the duration of a 'with' block.
+        """
+        connection = self._acquire()
+        try:
+            yield connection
+        finally:
+            self._idle.put(connection)
+
+    def close(self):
+        """
+        Close all connections opened by the pool.
+        """
+        with self._lock:
+            for connection in self._opened:
+                connection.close()
+            self._opened.clear()
+            self._idle = queue.Queue()
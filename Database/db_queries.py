@@ -1,6 +1,7 @@
 # users table queries
-SELECT_USER_ID = f"SELECT user_id FROM users WHERE username = (%s);"
-INSERT_USER = """INSERT INTO users (username,
+ALL_USER_IDS = "SELECT username, user_id FROM users;"
+USER_IDS_IN = "SELECT username, user_id FROM users WHERE username IN %s;"
+UPSERT_USER = """INSERT INTO users (username,
                                   followers,
                                   following,
                                   designs,
@@ -8,30 +9,28 @@ INSERT_USER = """INSERT INTO users (username,
                                   makes,
                                   likes,
                                   skill_level)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s);"""
-UPDATE_USER = """UPDATE users 
-                 SET followers = %s, 
-                     following = %s, 
-                     designs = %s, 
-                     collections = %s, 
-                     makes = %s, 
-                     likes = %s, 
-                     skill_level = %s
-                 WHERE user_id = %s"""
-USER_TITLES = """SELECT t.title
-                 FROM user_title AS ut
-                 JOIN titles AS t ON t.title_id = ut.title_id
-                 WHERE user_id = %s;"""
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE followers = VALUES(followers),
+                                        following = VALUES(following),
+                                        designs = VALUES(designs),
+                                        collections = VALUES(collections),
+                                        makes = VALUES(makes),
+                                        likes = VALUES(likes),
+                                        skill_level = VALUES(skill_level);"""
 
 # titles table queries
-SELECT_TITLE_ID = "SELECT title_id FROM titles WHERE title = (%s);"
-INSERT_TITLE = "INSERT INTO titles (title) VALUES (%s);"
+ALL_TITLE_IDS = "SELECT title, title_id FROM titles;"
+TITLE_IDS_IN = "SELECT title, title_id FROM titles WHERE title IN %s;"
+INSERT_TITLE = "INSERT INTO titles (title) VALUES (%s) ON DUPLICATE KEY UPDATE title = title;"
 
 # user_title table queries
+USER_TITLE_LINKS_IN = "SELECT title_id, user_id FROM user_title WHERE user_id IN %s;"
 INSERT_TITLE_USER = "INSERT INTO user_title (title_id,user_id) VALUES (%s,%s);"
-REMOVE_USER_TITLE = "DELETE FROM user_title WHERE title_id = %s AND user_id = %s;"
+REMOVE_USER_TITLES_IN = "DELETE FROM user_title WHERE user_id IN %s;"
 
 # print settings table queries
+ALL_SETTING_IDS = "SELECT settings_hash, setting_id FROM print_settings WHERE settings_hash IS NOT NULL;"
+SETTING_IDS_IN = "SELECT settings_hash, setting_id FROM print_settings WHERE settings_hash IN %s;"
 INSERT_PRINT_SETTINGS = """INSERT INTO print_settings (printer_brand,
                                                        printer_model,
                                                        rafts,
@@ -40,12 +39,15 @@ INSERT_PRINT_SETTINGS = """INSERT INTO print_settings (printer_brand,
                                                        infill,
                                                        filament_brand,
                                                        filament_color,
-                                                       filament_material) 
-                                  VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s);"""
+                                                       filament_material,
+                                                       settings_hash) 
+                                  VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                                  ON DUPLICATE KEY UPDATE settings_hash = settings_hash;"""
 
 # things table queries
-SELECT_THING_ID = "SELECT thing_id FROM things WHERE thigiverse_id = %s;"
-INSERT_THING = """INSERT INTO things (thigiverse_id,
+ALL_THING_IDS = "SELECT thigiverse_id, thing_id FROM things;"
+THING_IDS_IN = "SELECT thigiverse_id, thing_id FROM things WHERE thigiverse_id IN %s;"
+UPSERT_THING = """INSERT INTO things (thigiverse_id,
                                       user_id,
                                       model_name,
                                       uploaded,
@@ -58,37 +60,46 @@ INSERT_THING = """INSERT INTO things (thigiverse_id,
                                       license,
                                       remix_id,
                                       thigiverse_remix,
-                                      category) 
-                          VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,%s);"""
-
-UPDATE_THING = """UPDATE things 
-                 SET model_name = %s, 
-                     files = %s, 
-                     comments = %s, 
-                     makes = %s, 
-                     remixes = %s, 
-                     likes = %s, 
-                     license = %s,
-                     category = %s
-                 WHERE thing_id = %s"""
-
-
-THING_TAGS = """SELECT t.tag
-                FROM thing_tag AS tt
-                JOIN tags AS t ON t.tag_id = tt.tag_id
-                WHERE thing_id = %s;"""
+                                      category,
+                                      username) 
+                          VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                          ON DUPLICATE KEY UPDATE user_id = COALESCE(VALUES(user_id), user_id),
+                                                  model_name = VALUES(model_name),
+                                                  files = VALUES(files),
+                                                  comments = VALUES(comments),
+                                                  makes = VALUES(makes),
+                                                  remixes = VALUES(remixes),
+                                                  likes = VALUES(likes),
+                                                  setting_id = VALUES(setting_id),
+                                                  license = VALUES(license),
+                                                  remix_id = COALESCE(VALUES(remix_id), remix_id),
+                                                  category = VALUES(category),
+                                                  username = VALUES(username);"""
+# remixes upserted before the thing they remix (e.g. remix chains within a batch) get their remix_id at the end of a load
+UNRESOLVED_REMIX_SOURCES = """SELECT DISTINCT s.thing_id
+                              FROM things AS t
+                              JOIN things AS s ON s.thigiverse_id = t.thigiverse_remix
+                              WHERE t.remix_id IS NULL AND t.thigiverse_remix IS NOT NULL;"""
+BACKFILL_REMIX_IDS = """UPDATE things AS t
+                        JOIN things AS s ON s.thigiverse_id = t.thigiverse_remix
+                        SET t.remix_id = s.thing_id
+                        WHERE t.remix_id IS NULL AND t.thigiverse_remix IS NOT NULL;"""
+
 
 # tags table queries
-SELECT_TAG_ID = "SELECT tag_id FROM tags WHERE tag = (%s)"
-INSERT_TAG = "INSERT INTO tags (tag) VALUES (%s);"
+ALL_TAG_IDS = "SELECT tag, tag_id FROM tags;"
+TAG_IDS_IN = "SELECT tag, tag_id FROM tags WHERE tag IN %s;"
+INSERT_TAG = "INSERT INTO tags (tag) VALUES (%s) ON DUPLICATE KEY UPDATE tag = tag;"
 
 # thing tag table queries
+THING_TAG_LINKS_IN = "SELECT tag_id, thing_id FROM thing_tag WHERE thing_id IN %s;"
 INSERT_TAG_THING = "INSERT INTO thing_tag (tag_id, thing_id) VALUES (%s, %s)"
-REMOVE_THING_TAG = "DELETE FROM thing_tag WHERE tag_id = %s AND thing_id = %s;"
+REMOVE_THING_TAGS_IN = "DELETE FROM thing_tag WHERE thing_id IN %s;"
 
 # makes table queries
-SELECT_MAKE_ID = "SELECT make_id FROM makes WHERE thigiverse_id= (%s)"
-INSERT_MAKE = """INSERT INTO makes (thigiverse_id,
+ALL_MAKE_IDS = "SELECT thigiverse_id, make_id FROM makes;"
+MAKE_IDS_IN = "SELECT thigiverse_id, make_id FROM makes WHERE thigiverse_id IN %s;"
+UPSERT_MAKE = """INSERT INTO makes (thigiverse_id,
                                       thing_id,
                                       user_id,
                                       uploaded,
@@ -96,11 +107,175 @@ INSERT_MAKE = """INSERT INTO makes (thigiverse_id,
                                       likes,
                                       views,
                                       category,
-                                      setting_id) 
-                          VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s);"""
-UPDATE_MAKE = """UPDATE makes 
-                 SET comments = %s, 
-                     likes = %s, 
-                     views = %s, 
-                     category = %s
-                 WHERE make_id = %s"""
\ No newline at end of file
+                                      setting_id,
+                                      username) 
+                          VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                          ON DUPLICATE KEY UPDATE user_id = COALESCE(VALUES(user_id), user_id),
+                                                  comments = VALUES(comments),
+                                                  likes = VALUES(likes),
+                                                  views = VALUES(views),
+                                                  category = VALUES(category),
+                                                  setting_id = VALUES(setting_id),
+                                                  username = VALUES(username);"""
+# things and makes upserted before their user (e.g. users are scraped last) get their user_id at the end of a load
+BACKFILL_THING_USER_IDS = """UPDATE things AS t
+                             JOIN users AS u ON u.username = t.username
+                             SET t.user_id = u.user_id
+                             WHERE t.user_id IS NULL AND t.username IS NOT NULL;"""
+BACKFILL_MAKE_USER_IDS = """UPDATE makes AS m
+                            JOIN users AS u ON u.username = m.username
+                            SET m.user_id = u.user_id
+                            WHERE m.user_id IS NULL AND m.username IS NOT NULL;"""
+
+# metrics history tables queries
+# latest stored metrics of every entity, as (entity id, metrics...)
+LATEST_USER_METRICS = """SELECT m.user_id, m.followers, m.following, m.designs, m.collections, m.makes, m.likes
+                         FROM user_metrics AS m
+                         JOIN (SELECT user_id, MAX(scraped_at) AS scraped_at
+                               FROM user_metrics
+                               GROUP BY user_id) AS latest USING (user_id, scraped_at);"""
+LATEST_THING_METRICS = """SELECT m.thing_id, m.likes, m.makes, m.comments, m.remixes
+                          FROM thing_metrics AS m
+                          JOIN (SELECT thing_id, MAX(scraped_at) AS scraped_at
+                                FROM thing_metrics
+                                GROUP BY thing_id) AS latest USING (thing_id, scraped_at);"""
+LATEST_MAKE_METRICS = """SELECT m.make_id, m.likes, m.comments, m.views
+                         FROM make_metrics AS m
+                         JOIN (SELECT make_id, MAX(scraped_at) AS scraped_at
+                               FROM make_metrics
+                               GROUP BY make_id) AS latest USING (make_id, scraped_at);"""
+INSERT_USER_METRICS = """INSERT INTO user_metrics (user_id, scraped_at, followers, following, designs, collections,
+                                                   makes, likes)
+                         VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                         ON DUPLICATE KEY UPDATE followers = VALUES(followers),
+                                                 following = VALUES(following),
+                                                 designs = VALUES(designs),
+                                                 collections = VALUES(collections),
+                                                 makes = VALUES(makes),
+                                                 likes = VALUES(likes);"""
+INSERT_THING_METRICS = """INSERT INTO thing_metrics (thing_id, scraped_at, likes, makes, comments, remixes)
+                          VALUES (%s, %s, %s, %s, %s, %s)
+                          ON DUPLICATE KEY UPDATE likes = VALUES(likes),
+                                                  makes = VALUES(makes),
+                                                  comments = VALUES(comments),
+                                                  remixes = VALUES(remixes);"""
+INSERT_MAKE_METRICS = """INSERT INTO make_metrics (make_id, scraped_at, likes, comments, views)
+                         VALUES (%s, %s, %s, %s, %s)
+                         ON DUPLICATE KEY UPDATE likes = VALUES(likes),
+                                                 comments = VALUES(comments),
+                                                 views = VALUES(views);"""
+
+# likes gained per day by things over the last %s days (first parameter), top %s things (second parameter):
+# likes of the last row of the window minus likes of its first row
+LIKES_VELOCITY = """SELECT t.thigiverse_id,
+                           t.model_name,
+                           (last_m.likes - first_m.likes) /
+                           GREATEST(TIMESTAMPDIFF(HOUR, w.first_at, w.last_at) / 24, 1) AS likes_per_day
+                    FROM (SELECT thing_id, MIN(scraped_at) AS first_at, MAX(scraped_at) AS last_at
+                          FROM thing_metrics
+                          WHERE scraped_at >= NOW() - INTERVAL %s DAY
+                          GROUP BY thing_id) AS w
+                    JOIN thing_metrics AS first_m ON first_m.thing_id = w.thing_id AND first_m.scraped_at = w.first_at
+                    JOIN thing_metrics AS last_m ON last_m.thing_id = w.thing_id AND last_m.scraped_at = w.last_at
+                    JOIN things AS t ON t.thing_id = w.thing_id
+                    ORDER BY likes_per_day DESC
+                    LIMIT %s;"""
+
+# aggregate tables queries
+# aggregate table -> (group column, group column in select, select computing the rows of the groups in {where})
+# every select returns the columns of its table, in order
+AGGREGATES = {'tag_stats': ('tag_id', 'tt.tag_id',
+                            """SELECT tt.tag_id, COUNT(*), COALESCE(SUM(t.likes), 0)
+                               FROM thing_tag AS tt
+                               JOIN things AS t ON t.thing_id = tt.thing_id
+                               {where}
+                               GROUP BY tt.tag_id"""),
+              'category_stats': ('category', 'category',
+                                 """SELECT category, COUNT(*), COALESCE(SUM(likes), 0), COALESCE(SUM(makes), 0)
+                                    FROM things
+                                    {where}
+                                    GROUP BY category"""),
+              'printer_brand_stats': ('printer_brand', 'ps.printer_brand',
+                                      """SELECT ps.printer_brand, COUNT(*)
+                                         FROM makes AS m
+                                         JOIN print_settings AS ps ON ps.setting_id = m.setting_id
+                                         {where}
+                                         GROUP BY ps.printer_brand"""),
+              'remix_stats': ('thing_id', 'remix_id',
+                              """SELECT remix_id, COUNT(*)
+                                 FROM things
+                                 {where}
+                                 GROUP BY remix_id""")}
+DELETE_AGGREGATE = "DELETE FROM {table} {where};"
+INSERT_AGGREGATE = "INSERT INTO {table} {select};"
+
+# groups of aggregate tables that things and makes (with thingiverse ids IN %s) belong to, as (table, query)
+THING_AGGREGATE_GROUPS = [('category_stats', "SELECT DISTINCT category FROM things WHERE thigiverse_id IN %s;"),
+                          ('remix_stats', "SELECT DISTINCT remix_id FROM things WHERE thigiverse_id IN %s;"),
+                          ('tag_stats', """SELECT DISTINCT tt.tag_id
+                                           FROM thing_tag AS tt
+                                           JOIN things AS t ON t.thing_id = tt.thing_id
+                                           WHERE t.thigiverse_id IN %s;""")]
+MAKE_AGGREGATE_GROUPS = [('printer_brand_stats', """SELECT DISTINCT ps.printer_brand
+                                                    FROM makes AS m
+                                                    JOIN print_settings AS ps ON ps.setting_id = m.setting_id
+                                                    WHERE m.thigiverse_id IN %s;""")]
+
+# dashboard queries over the aggregate tables, top %s rows
+TOP_TAGS = """SELECT t.tag, s.things, s.likes
+              FROM tag_stats AS s
+              JOIN tags AS t ON t.tag_id = s.tag_id
+              ORDER BY s.things DESC
+              LIMIT %s;"""
+LIKES_PER_CATEGORY = """SELECT category, likes, things, makes
+                        FROM category_stats
+                        ORDER BY likes DESC
+                        LIMIT %s;"""
+MAKES_PER_PRINTER_BRAND = """SELECT printer_brand, makes
+                             FROM printer_brand_stats
+                             ORDER BY makes DESC
+                             LIMIT %s;"""
+MOST_REMIXED = """SELECT t.thigiverse_id, t.model_name, s.remixes
+                  FROM remix_stats AS s
+                  JOIN things AS t ON t.thing_id = s.thing_id
+                  ORDER BY s.remixes DESC
+                  LIMIT %s;"""
+
+# bulk load queries
+DISABLE_LOAD_CHECKS = "SET foreign_key_checks = 0, unique_checks = 0;"
+ENABLE_LOAD_CHECKS = "SET foreign_key_checks = 1, unique_checks = 1;"
+LOAD_DATA = """LOAD DATA LOCAL INFILE %s
+               INTO TABLE {table}
+               CHARACTER SET utf8mb4
+               FIELDS TERMINATED BY '\\t'
+               LINES TERMINATED BY '\\n'
+               ({columns});"""
+SHOW_WARNINGS = "SHOW WARNINGS;"
+
+# schema migration queries
+TABLE_EXISTS = """SELECT table_name
+                  FROM information_schema.tables
+                  WHERE table_schema = %s AND table_name = %s;"""
+
+# columns added after the first version of the schema, as (table, column, definition)
+SCHEMA_COLUMNS = [('print_settings', 'settings_hash', 'CHAR(40)'),
+                  ('things', 'username', 'VARCHAR(50)'),
+                  ('makes', 'username', 'VARCHAR(50)')]
+COLUMN_EXISTS = """SELECT column_name
+                   FROM information_schema.columns
+                   WHERE table_schema = %s AND table_name = %s AND column_name = %s;"""
+ADD_COLUMN = "ALTER TABLE {table} ADD COLUMN {column} {definition};"
+
+# natural identifiers that must hold a unique key, as (table, column)
+NATURAL_KEYS = [('users', 'username'),
+                ('titles', 'title'),
+                ('tags', 'tag'),
+                ('things', 'thigiverse_id'),
+                ('makes', 'thigiverse_id'),
+                ('print_settings', 'settings_hash')]
+UNIQUE_KEY_EXISTS = """SELECT index_name
+                       FROM information_schema.statistics
+                       WHERE table_schema = %s AND table_name = %s AND non_unique = 0
+                       GROUP BY index_name
+                       HAVING COUNT(*) = 1 AND MAX(column_name) = %s;"""
+ADD_UNIQUE_KEY = "ALTER TABLE {table} ADD UNIQUE KEY uq_{table}_{column} ({column});"
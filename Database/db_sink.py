@@ -0,0 +1,235 @@
+import queue
+import threading
+import time
+import logging
+
+import general_config as gconf
+
+from Database.build_db import _open_database, _load_id_maps, _insert_data, _refresh_aggregates, _backfill_remix_ids, \
+    _backfill_user_ids, TOUCHED
+from ThingScraper import Thing, Make
+
+# Define file logger
+logger = logging.getLogger(gconf.Logs.LOGGER_NAME)
+
+# Queue item that tells the writer thread to flush and stop
+_STOP = object()
+
+
+class DatabaseSink:
+    """
+    Write-through database sink: scraped entities are pushed into it while scraping and a background writer thread
+    (with its own database connection) upserts them in batches.
+    A batch is written and committed once it holds batch_size entities or every flush_interval seconds,
+    so scraping never waits for the database and a crash loses at most one batch.
+    Entities may arrive in any order (e.g. users are scraped last): makes wait for their thing to be written
+    (at most max_orphans of them), and things, makes and remixes written before their user or the thing they remix
+    get their user_id and remix_id when the sink is closed.
+    If anything could not be written (see ok), pushed entities are dropped and the scraped data should be loaded
+    with build_database instead.
+
+    Usage:
+        with DatabaseSink() as sink:
+            sink.push('things', thing_id, thing.properties)
+    """
+
+    def __init__(self, db_name=gconf.DB_builder.DB_NAME, drop_existing=False,
+                 batch_size=gconf.DB_builder.SINK_BATCH_SIZE, flush_interval=gconf.DB_builder.SINK_FLUSH_INTERVAL,
+                 max_orphans=gconf.DB_builder.SINK_MAX_ORPHANS, backend='mysql', **mysql_settings):
+        """
+        Construction of a new database sink.
+          :param db_name: name of the database to write to. Default: gconf.DB_builder.DB_NAME
+          :param drop_existing: if true, drop database first if existing. Default: False.
+          :param batch_size: number of pushed entities after which a batch is written.
+          :param flush_interval: maximum number of seconds a pushed entity waits before being written.
+          :param max_orphans: maximum number of makes waiting for their thing, the oldest ones are dropped beyond it.
+          :param backend: mysql or sqlite. Default: mysql.
+          :param mysql_settings: host, user and password of the mysql server. Default: Database/config.py
+        """
+        self.db_name = db_name
+        self.drop_existing = drop_existing
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_orphans = max_orphans
+        self.backend = backend
+        self.mysql_settings = mysql_settings
+
+        self.written = 0
+        self.failed = 0
+        # false once an entity could not be written: failed batch, dropped make or no database connection
+        self.ok = True
+
+        # makes waiting for their thing (key -> properties), oldest first
+        self._orphans = dict()
+
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='DatabaseSink', daemon=True)
+
+    def __enter__(self):
+        """
+        Allows to start the sink using 'with' statement
+        """
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """
+        Allows to flush and close the sink using 'with' statement
+        """
+        self.close()
+
+    def start(self):
+        """
+        Start the background writer thread.
+        """
+        self._thread.start()
+        logger.info("Database sink started, writing to `{}`".format(self.db_name))
+
+    def push(self, data_type, key, properties):
+        """
+        Queue a single entity to be written. Never blocks on the database.
+        Nothing is queued once the sink failed (see ok), as the scraped data has to be loaded again anyway.
+          :param data_type: one of: users, things, makes
+          :param key: the entity key as used in scraped data (username, thing id or make id)
+          :param properties: the entity properties dictionary. A shallow copy is queued.
+        """
+        if self.ok:
+            self._queue.put((data_type, key, dict(properties)))
+
+    def close(self):
+        """
+        Write all pending entities, commit and stop the background writer thread.
+        """
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+        if self._orphans:
+            logger.warning("Database sink skipped {} makes whose thing was not written".format(len(self._orphans)))
+        logger.info("Database sink closed: {} entities written, {} failed".format(self.written, self.failed))
+
+    def _run(self):
+        """
+        Writer thread: write pushed entities until stopped. If it fails, pushing stops and queued entities are dropped.
+        """
+        try:
+            self._write()
+        except Exception as e:
+            self.ok = False
+            logger.exception("Database sink stopped: {}".format(e))
+
+        if not self.ok:
+            while not self._queue.empty():
+                self._queue.get_nowait()
+
+    def _write(self):
+        """
+        Writer thread loop: collect pushed entities and write them in batches.
+        """
+        connection, _, _ = _open_database(self.db_name, self.drop_existing, self.backend, **self.mysql_settings)
+        if connection is None:
+            self.ok = False
+            logger.error("Database sink could not connect, scraped data will not be written through")
+            return
+
+        cur = connection.cursor()
+        id_maps = _load_id_maps(cur)
+
+        batch = {'users': dict(), 'things': dict(), 'makes': dict()}
+        pending = 0
+        last_flush = time.monotonic()
+
+        try:
+            while True:
+                timeout = max(0.0, self.flush_interval - (time.monotonic() - last_flush))
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    item = None
+
+                if item is _STOP:
+                    break
+
+                if item is not None:
+                    data_type, key, properties = item
+                    batch[data_type][key] = properties
+                    pending += 1
+
+                if pending >= self.batch_size or (pending and time.monotonic() - last_flush >= self.flush_interval):
+                    self._flush(connection, cur, batch, id_maps)
+                    pending = 0
+
+                if not pending:
+                    last_flush = time.monotonic()
+
+            if pending:
+                self._flush(connection, cur, batch, id_maps)
+            self._backfill(connection, cur, id_maps)
+        finally:
+            cur.close()
+            connection.close()
+
+    def _resolve(self, batch, id_maps):
+        """
+        Add the waiting makes whose thing is now written (or in batch) to batch, and hold back the others.
+        Beyond max_orphans waiting makes, the oldest ones are dropped.
+        """
+        batch_things = {str(thing[Thing.PROPERTIES.THING_ID]) for thing in batch['things'].values()}
+
+        # newly pushed makes replace waiting versions of the same makes
+        makes = {**self._orphans, **batch['makes']}
+        batch['makes'].clear()
+        self._orphans.clear()
+        for key, make in makes.items():
+            thing_id = str(make.get(Make.PROPERTIES.THING_ID))
+            if thing_id in id_maps['things'] or thing_id in batch_things:
+                batch['makes'][key] = make
+            else:
+                self._orphans[key] = make
+
+        dropped = list(self._orphans)[:len(self._orphans) - self.max_orphans]
+        if dropped:
+            for key in dropped:
+                del self._orphans[key]
+            self.failed += len(dropped)
+            self.ok = False
+            logger.warning("Database sink dropped {} makes waiting for their thing".format(len(dropped)))
+
+    def _flush(self, connection, cur, batch, id_maps):
+        """
+        Write a single batch, along with the aggregate table groups it touched, in its own transaction and clear it.
+        Waiting makes that can now be written are added to the batch (see _resolve).
+        """
+        self._resolve(batch, id_maps)
+        size = sum(len(entities) for entities in batch.values())
+        try:
+            _insert_data(cur, batch, id_maps)
+            _refresh_aggregates(cur, id_maps[TOUCHED])
+            connection.commit()
+            self.written += size
+            logger.debug("Database sink committed %d entities", size)
+        except Exception as e:
+            connection.rollback()
+            self.failed += size
+            self.ok = False
+            logger.exception("Database sink failed to write a batch of {} entities: {}".format(size, e))
+
+            # ids of rows inserted by the rolled back transaction are no longer valid
+            id_maps.update(_load_id_maps(cur))
+        finally:
+            for data_type in batch:
+                batch[data_type].clear()
+
+    def _backfill(self, connection, cur, id_maps):
+        """
+        Set the remix_id and user_id of entities written before the thing they remix or their user, once every entity
+        was written.
+        """
+        try:
+            _backfill_remix_ids(cur, id_maps[TOUCHED])
+            _backfill_user_ids(cur)
+            _refresh_aggregates(cur, id_maps[TOUCHED])
+            connection.commit()
+        except Exception as e:
+            connection.rollback()
+            self.ok = False
+            logger.exception("Database sink failed to back-fill remix and user ids: {}".format(e))
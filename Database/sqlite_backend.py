@@ -0,0 +1,194 @@
+import os
+import sqlite3
+import logging
+
+import Database.db_queries as dbq
+import Database.sqlite_queries as sqlq
+import general_config as gconf
+
+# Define file logger
+logger = logging.getLogger(gconf.Logs.LOGGER_NAME)
+
+# mysql query -> SQLite version of the same query, for every query redefined in Database/sqlite_queries.py
+SQLITE_QUERIES = {getattr(dbq, name): getattr(sqlq, name)
+                  for name in dir(sqlq) if name.isupper() and hasattr(dbq, name)}
+
+# Applied to every new connection: write ahead log lets readers work alongside the (single) writer
+PRAGMAS = ["PRAGMA journal_mode = WAL;",
+           "PRAGMA synchronous = NORMAL;",
+           "PRAGMA foreign_keys = ON;",
+           "PRAGMA temp_store = MEMORY;"]
+
+
+class SQLiteCursor:
+    """
+    A cursor over a SQLite connection that behaves like the pymysql DictCursor used by the loader:
+    queries use %s placeholders (a list given for a single placeholder is expanded, as in `IN %s`),
+    rows are fetched as dictionaries and execute returns the number of affected or selected rows.
+    mysql specific queries are replaced by their SQLite versions (see Database/sqlite_queries.py).
+    """
+
+    def __init__(self, connection):
+        self._cursor = connection.cursor()
+        self._rows = []
+
+    @staticmethod
+    def _translate(query, args=None):
+        """
+        Convert a query with %s placeholders and its arguments to SQLite style (? placeholders).
+        """
+        query = SQLITE_QUERIES.get(query, query)
+        if args is None:
+            return query, []
+        if not isinstance(args, (list, tuple)):
+            args = [args]
+
+        parts = query.split('%s')
+        if len(parts) - 1 != len(args):
+            raise ValueError("Query expects {} arguments, {} were given".format(len(parts) - 1, len(args)))
+
+        statement = [parts[0]]
+        params = []
+        for arg, part in zip(args, parts[1:]):
+            if isinstance(arg, (list, tuple, set)):
+                statement.append('(' + ', '.join('?' * len(arg)) + ')')
+                params.extend(arg)
+            else:
+                statement.append('?')
+                params.append(arg)
+            statement.append(part)
+
+        return ''.join(statement), params
+
+    def execute(self, query, args=None):
+        """
+        Execute a single query.
+        :return: number of selected rows for queries returning rows, otherwise the number of affected rows
+        """
+        statement, params = self._translate(query, args)
+        self._cursor.execute(statement, params)
+
+        if self._cursor.description is None:
+            self._rows = []
+            return self._cursor.rowcount
+
+        columns = [column[0] for column in self._cursor.description]
+        self._rows = [dict(zip(columns, row)) for row in self._cursor.fetchall()]
+        return len(self._rows)
+
+    def executemany(self, query, args_list):
+        """
+        Execute a single (non selecting) query for every arguments sequence of args_list.
+        :return: number of affected rows
+        """
+        self._rows = []
+        self._cursor.executemany(SQLITE_QUERIES.get(query, query).replace('%s', '?'), args_list)
+        return self._cursor.rowcount
+
+    def executescript(self, script):
+        """
+        Execute a script of several statements, as is.
+        """
+        self._cursor.executescript(script)
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """
+    A SQLite connection with the pymysql connection methods used by the loader and the connection pool.
+    """
+
+    def __init__(self, connection):
+        self._connection = connection
+
+    def cursor(self):
+        return SQLiteCursor(self._connection)
+
+    def select_db(self, db_name):
+        """A SQLite connection is opened on its database file, there is nothing to select."""
+        pass
+
+    def commit(self):
+        self._connection.commit()
+
+    def rollback(self):
+        self._connection.rollback()
+
+    def close(self):
+        self._connection.close()
+
+
+def database_path(db_name):
+    """
+    Returns the SQLite database file path of given database name (or path).
+    """
+    if os.path.splitext(db_name)[1]:
+        return db_name
+    return db_name + gconf.DB_builder.SQLITE_EXTENSION
+
+
+def connect(db_path):
+    """
+    Open a connection to the SQLite database file at db_path (created if missing).
+    Connections may be shared between threads (one at a time), as done by the connection pool.
+     :return: SQLiteConnection
+    """
+    connection = sqlite3.connect(db_path, timeout=gconf.DB_builder.SQLITE_TIMEOUT, check_same_thread=False)
+    for pragma in PRAGMAS:
+        connection.execute(pragma)
+
+    logger.debug("Connected to SQLite database `{}`".format(db_path))
+    return SQLiteConnection(connection)
+
+
+def drop_database(db_path):
+    """
+    Delete the SQLite database file at db_path, along with its write ahead log files.
+    """
+    for path in (db_path, db_path + '-wal', db_path + '-shm'):
+        if os.path.exists(path):
+            os.remove(path)
+    logger.debug("Database `{}` dropped".format(db_path))
+
+
+def prepare_database(cur):
+    """
+    Create the tables, columns and indexes of the construction script that are missing in the database at cur.
+     :return: (empty_database, created_tables): True if the database is empty (no users, things or makes),
+              and the list of tables that were added
+    """
+    cur.execute(sqlq.ALL_TABLES)
+    existing_tables = {row['name'] for row in cur.fetchall()}
+
+    building_script = os.path.abspath(os.path.join(gconf.DB_builder.DB_DIR, gconf.DB_builder.SQLITE_CONSTRUCTION))
+    with open(building_script, 'r') as file:
+        cur.executescript(file.read())
+
+    cur.execute(sqlq.ALL_TABLES)
+    created_tables = [row['name'] for row in cur.fetchall() if row['name'] not in existing_tables]
+
+    for table, column, definition in dbq.SCHEMA_COLUMNS:
+        cur.execute(sqlq.TABLE_COLUMNS.format(table=table))
+        if column not in {row['name'] for row in cur.fetchall()}:
+            logger.info("Adding missing column `{}`.`{}`".format(table, column))
+            cur.execute(dbq.ADD_COLUMN.format(table=table, column=column, definition=definition))
+
+    cur.execute(sqlq.COUNT_ENTITIES)
+    return cur.fetchone()['entities'] == 0, created_tables
@@ -0,0 +1,144 @@
+# SQLite versions of the mysql specific queries in Database/db_queries.py, under the same names.
+# Queries that are not redefined here are shared by both backends.
+
+# users table queries
+UPSERT_USER = """INSERT INTO users (username,
+                                  followers,
+                                  following,
+                                  designs,
+                                  collections,
+                                  makes,
+                                  likes,
+                                  skill_level)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                ON CONFLICT (username) DO UPDATE SET followers = excluded.followers,
+                                                     following = excluded.following,
+                                                     designs = excluded.designs,
+                                                     collections = excluded.collections,
+                                                     makes = excluded.makes,
+                                                     likes = excluded.likes,
+                                                     skill_level = excluded.skill_level;"""
+
+# titles table queries
+INSERT_TITLE = "INSERT INTO titles (title) VALUES (%s) ON CONFLICT (title) DO NOTHING;"
+
+# print settings table queries
+INSERT_PRINT_SETTINGS = """INSERT INTO print_settings (printer_brand,
+                                                       printer_model,
+                                                       rafts,
+                                                       supports,
+                                                       resolution,
+                                                       infill,
+                                                       filament_brand,
+                                                       filament_color,
+                                                       filament_material,
+                                                       settings_hash)
+                                  VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                                  ON CONFLICT (settings_hash) DO NOTHING;"""
+
+# things table queries
+UPSERT_THING = """INSERT INTO things (thigiverse_id,
+                                      user_id,
+                                      model_name,
+                                      uploaded,
+                                      files,
+                                      comments,
+                                      makes,
+                                      remixes,
+                                      likes,
+                                      setting_id,
+                                      license,
+                                      remix_id,
+                                      thigiverse_remix,
+                                      category,
+                                      username)
+                          VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                          ON CONFLICT (thigiverse_id) DO UPDATE SET user_id = COALESCE(excluded.user_id, user_id),
+                                                                    model_name = excluded.model_name,
+                                                                    files = excluded.files,
+                                                                    comments = excluded.comments,
+                                                                    makes = excluded.makes,
+                                                                    remixes = excluded.remixes,
+                                                                    likes = excluded.likes,
+                                                                    setting_id = excluded.setting_id,
+                                                                    license = excluded.license,
+                                                                    remix_id = COALESCE(excluded.remix_id, remix_id),
+                                                                    category = excluded.category,
+                                                                    username = excluded.username;"""
+
+BACKFILL_REMIX_IDS = """UPDATE things
+                        SET remix_id = (SELECT s.thing_id FROM things AS s WHERE s.thigiverse_id = things.thigiverse_remix)
+                        WHERE remix_id IS NULL AND thigiverse_remix IN (SELECT thigiverse_id FROM things);"""
+
+# tags table queries
+INSERT_TAG = "INSERT INTO tags (tag) VALUES (%s) ON CONFLICT (tag) DO NOTHING;"
+
+# makes table queries
+UPSERT_MAKE = """INSERT INTO makes (thigiverse_id,
+                                      thing_id,
+                                      user_id,
+                                      uploaded,
+                                      comments,
+                                      likes,
+                                      views,
+                                      category,
+                                      setting_id,
+                                      username)
+                          VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                          ON CONFLICT (thigiverse_id) DO UPDATE SET user_id = COALESCE(excluded.user_id, user_id),
+                                                                    comments = excluded.comments,
+                                                                    likes = excluded.likes,
+                                                                    views = excluded.views,
+                                                                    category = excluded.category,
+                                                                    setting_id = excluded.setting_id,
+                                                                    username = excluded.username;"""
+BACKFILL_THING_USER_IDS = """UPDATE things
+                             SET user_id = (SELECT u.user_id FROM users AS u WHERE u.username = things.username)
+                             WHERE user_id IS NULL AND username IN (SELECT username FROM users);"""
+BACKFILL_MAKE_USER_IDS = """UPDATE makes
+                            SET user_id = (SELECT u.user_id FROM users AS u WHERE u.username = makes.username)
+                            WHERE user_id IS NULL AND username IN (SELECT username FROM users);"""
+
+# metrics history tables queries
+INSERT_USER_METRICS = """INSERT INTO user_metrics (user_id, scraped_at, followers, following, designs, collections,
+                                                   makes, likes)
+                         VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                         ON CONFLICT (user_id, scraped_at) DO UPDATE SET followers = excluded.followers,
+                                                                         following = excluded.following,
+                                                                         designs = excluded.designs,
+                                                                         collections = excluded.collections,
+                                                                         makes = excluded.makes,
+                                                                         likes = excluded.likes;"""
+INSERT_THING_METRICS = """INSERT INTO thing_metrics (thing_id, scraped_at, likes, makes, comments, remixes)
+                          VALUES (%s, %s, %s, %s, %s, %s)
+                          ON CONFLICT (thing_id, scraped_at) DO UPDATE SET likes = excluded.likes,
+                                                                           makes = excluded.makes,
+                                                                           comments = excluded.comments,
+                                                                           remixes = excluded.remixes;"""
+INSERT_MAKE_METRICS = """INSERT INTO make_metrics (make_id, scraped_at, likes, comments, views)
+                         VALUES (%s, %s, %s, %s, %s)
+                         ON CONFLICT (make_id, scraped_at) DO UPDATE SET likes = excluded.likes,
+                                                                         comments = excluded.comments,
+                                                                         views = excluded.views;"""
+
+# likes gained per day by things over the last %s days (first parameter), top %s things (second parameter)
+LIKES_VELOCITY = """SELECT t.thigiverse_id,
+                           t.model_name,
+                           (last_m.likes - first_m.likes) /
+                           MAX(julianday(w.last_at) - julianday(w.first_at), 1.0) AS likes_per_day
+                    FROM (SELECT thing_id, MIN(scraped_at) AS first_at, MAX(scraped_at) AS last_at
+                          FROM thing_metrics
+                          WHERE scraped_at >= strftime('%Y-%m-%dT%H:%M:%S', 'now', '-' || %s || ' days')
+                          GROUP BY thing_id) AS w
+                    JOIN thing_metrics AS first_m ON first_m.thing_id = w.thing_id AND first_m.scraped_at = w.first_at
+                    JOIN thing_metrics AS last_m ON last_m.thing_id = w.thing_id AND last_m.scraped_at = w.last_at
+                    JOIN things AS t ON t.thing_id = w.thing_id
+                    ORDER BY likes_per_day DESC
+                    LIMIT %s;"""
+
+# database state queries
+ALL_TABLES = "SELECT name FROM sqlite_master WHERE type = 'table';"
+TABLE_COLUMNS = "PRAGMA table_info({table});"
+COUNT_ENTITIES = """SELECT (SELECT COUNT(*) FROM users) +
+                         (SELECT COUNT(*) FROM things) +
+                         (SELECT COUNT(*) FROM makes) AS entities;"""
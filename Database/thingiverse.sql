@@ -40,7 +40,8 @@ CREATE TABLE print_settings(
     infill              VARCHAR(50),
     filament_brand      VARCHAR(200),
     filament_color      VARCHAR(50),
-    filament_material   VARCHAR(50)
+    filament_material   VARCHAR(50),
+    settings_hash       CHAR(40)        UNIQUE
 );
 
 CREATE TABLE things(
@@ -59,6 +60,7 @@ CREATE TABLE things(
     remix_id           INT,
     thigiverse_remix           INT,
     category        VARCHAR(50),
+    username        VARCHAR(50),
     FOREIGN KEY (user_id)  REFERENCES users (user_id)    ON DELETE CASCADE,
     FOREIGN KEY (setting_id)  REFERENCES print_settings (setting_id)    ON DELETE CASCADE,
     FOREIGN KEY (remix_id)  REFERENCES things (thing_id)    ON DELETE CASCADE
@@ -83,7 +85,74 @@ CREATE TABLE makes(
     views           INT,
     category        VARCHAR(50),
     setting_id      INT,
+    username        VARCHAR(50),
     FOREIGN KEY (thing_id)  REFERENCES things (thing_id)    ON DELETE CASCADE,
     FOREIGN KEY (user_id)  REFERENCES users (user_id)    ON DELETE CASCADE,
     FOREIGN KEY (setting_id)  REFERENCES print_settings (setting_id)    ON DELETE CASCADE
+);
+
+CREATE TABLE user_metrics(
+    user_id         INT         NOT NULL,
+    scraped_at      DATETIME    NOT NULL,
+    followers       INT,
+    following       INT,
+    designs         INT,
+    collections     INT,
+    makes           INT,
+    likes           INT,
+    PRIMARY KEY (user_id, scraped_at),
+    INDEX idx_user_metrics_scraped_at (scraped_at),
+    FOREIGN KEY (user_id)  REFERENCES users (user_id)    ON DELETE CASCADE
+);
+
+CREATE TABLE thing_metrics(
+    thing_id        INT         NOT NULL,
+    scraped_at      DATETIME    NOT NULL,
+    likes           INT,
+    makes           INT,
+    comments        INT,
+    remixes         INT,
+    PRIMARY KEY (thing_id, scraped_at),
+    INDEX idx_thing_metrics_scraped_at (scraped_at),
+    FOREIGN KEY (thing_id)  REFERENCES things (thing_id)    ON DELETE CASCADE
+);
+
+CREATE TABLE make_metrics(
+    make_id         INT         NOT NULL,
+    scraped_at      DATETIME    NOT NULL,
+    likes           INT,
+    comments        INT,
+    views           INT,
+    PRIMARY KEY (make_id, scraped_at),
+    INDEX idx_make_metrics_scraped_at (scraped_at),
+    FOREIGN KEY (make_id)  REFERENCES makes (make_id)    ON DELETE CASCADE
+);
+
+CREATE TABLE tag_stats(
+    tag_id          INT         PRIMARY KEY,
+    things          INT         NOT NULL,
+    likes           INT         NOT NULL,
+    INDEX idx_tag_stats_things (things),
+    FOREIGN KEY (tag_id)  REFERENCES tags (tag_id)    ON DELETE CASCADE
+);
+
+CREATE TABLE category_stats(
+    category        VARCHAR(50) PRIMARY KEY,
+    things          INT         NOT NULL,
+    likes           INT         NOT NULL,
+    makes           INT         NOT NULL,
+    INDEX idx_category_stats_likes (likes)
+);
+
+CREATE TABLE printer_brand_stats(
+    printer_brand   VARCHAR(50) PRIMARY KEY,
+    makes           INT         NOT NULL,
+    INDEX idx_printer_brand_stats_makes (makes)
+);
+
+CREATE TABLE remix_stats(
+    thing_id        INT         PRIMARY KEY,
+    remixes         INT         NOT NULL,
+    INDEX idx_remix_stats_remixes (remixes),
+    FOREIGN KEY (thing_id)  REFERENCES things (thing_id)    ON DELETE CASCADE
 );
\ No newline at end of file
@@ -0,0 +1,162 @@
+CREATE TABLE IF NOT EXISTS users(
+    user_id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    username        VARCHAR(50)     NOT NULL    UNIQUE,
+    followers       INT             NOT NULL,
+    following       INT             NOT NULL,
+    designs         INT             NOT NULL,
+    collections     INT             NOT NULL,
+    makes           INT             NOT NULL,
+    likes           INT             NOT NULL,
+    skill_level     VARCHAR(15)
+);
+
+CREATE TABLE IF NOT EXISTS titles(
+    title_id    INTEGER PRIMARY KEY AUTOINCREMENT,
+    title       VARCHAR(50)    NOT NULL  UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS user_title(
+    title_id    INT             NOT NULL,
+    user_id     INT             NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES users (user_id)     ON DELETE CASCADE,
+    FOREIGN KEY (title_id) REFERENCES titles (title_id)     ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_user_title_user_id ON user_title (user_id);
+
+CREATE TABLE IF NOT EXISTS tags(
+    tag_id      INTEGER PRIMARY KEY AUTOINCREMENT,
+    tag         VARCHAR(200)     NOT NULL        UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS print_settings(
+    setting_id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    printer_brand       VARCHAR(50),
+    printer_model       VARCHAR(50),
+    rafts               INT(1),
+    supports            INT(1),
+    resolution          VARCHAR(50),
+    infill              VARCHAR(50),
+    filament_brand      VARCHAR(200),
+    filament_color      VARCHAR(50),
+    filament_material   VARCHAR(50),
+    settings_hash       CHAR(40)        UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS things(
+    thing_id        INTEGER PRIMARY KEY AUTOINCREMENT,
+    thigiverse_id   INT             NOT NULL    UNIQUE,
+    user_id         INT             ,
+    model_name      VARCHAR(200)    NOT NULL,
+    uploaded        TEXT            NOT NULL,
+    files           INT             NOT NULL,
+    comments        INT             NOT NULL,
+    makes           INT             NOT NULL,
+    remixes         INT             NOT NULL,
+    likes           INT,
+    setting_id      INT,
+    license         VARCHAR(100)    NOT NULL,
+    remix_id           INT,
+    thigiverse_remix           INT,
+    category        VARCHAR(50),
+    username        VARCHAR(50),
+    FOREIGN KEY (user_id)  REFERENCES users (user_id)    ON DELETE CASCADE,
+    FOREIGN KEY (setting_id)  REFERENCES print_settings (setting_id)    ON DELETE CASCADE,
+    FOREIGN KEY (remix_id)  REFERENCES things (thing_id)    ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_things_user_id ON things (user_id);
+CREATE INDEX IF NOT EXISTS idx_things_setting_id ON things (setting_id);
+CREATE INDEX IF NOT EXISTS idx_things_remix_id ON things (remix_id);
+
+CREATE TABLE IF NOT EXISTS thing_tag(
+    tag_id          INT             NOT NULL,
+    thing_id        INT             NOT NULL,
+    FOREIGN KEY (thing_id) REFERENCES things (thing_id)     ON DELETE CASCADE,
+    FOREIGN KEY (tag_id) REFERENCES tags (tag_id)           ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_thing_tag_thing_id ON thing_tag (thing_id);
+CREATE INDEX IF NOT EXISTS idx_thing_tag_tag_id ON thing_tag (tag_id);
+
+CREATE TABLE IF NOT EXISTS makes(
+    make_id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    thigiverse_id   INT         NOT NULL       UNIQUE,
+    thing_id        INT         NOT NULL,
+    user_id         INT,
+    uploaded        TEXT         NOT NULL,
+    comments        INT,
+    likes           INT,
+    views           INT,
+    category        VARCHAR(50),
+    setting_id      INT,
+    username        VARCHAR(50),
+    FOREIGN KEY (thing_id)  REFERENCES things (thing_id)    ON DELETE CASCADE,
+    FOREIGN KEY (user_id)  REFERENCES users (user_id)    ON DELETE CASCADE,
+    FOREIGN KEY (setting_id)  REFERENCES print_settings (setting_id)    ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_makes_thing_id ON makes (thing_id);
+CREATE INDEX IF NOT EXISTS idx_makes_user_id ON makes (user_id);
+
+CREATE TABLE IF NOT EXISTS user_metrics(
+    user_id         INT         NOT NULL,
+    scraped_at      DATETIME    NOT NULL,
+    followers       INT,
+    following       INT,
+    designs         INT,
+    collections     INT,
+    makes           INT,
+    likes           INT,
+    PRIMARY KEY (user_id, scraped_at),
+    FOREIGN KEY (user_id)  REFERENCES users (user_id)    ON DELETE CASCADE
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_user_metrics_scraped_at ON user_metrics (scraped_at);
+
+CREATE TABLE IF NOT EXISTS thing_metrics(
+    thing_id        INT         NOT NULL,
+    scraped_at      DATETIME    NOT NULL,
+    likes           INT,
+    makes           INT,
+    comments        INT,
+    remixes         INT,
+    PRIMARY KEY (thing_id, scraped_at),
+    FOREIGN KEY (thing_id)  REFERENCES things (thing_id)    ON DELETE CASCADE
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_thing_metrics_scraped_at ON thing_metrics (scraped_at);
+
+CREATE TABLE IF NOT EXISTS make_metrics(
+    make_id         INT         NOT NULL,
+    scraped_at      DATETIME    NOT NULL,
+    likes           INT,
+    comments        INT,
+    views           INT,
+    PRIMARY KEY (make_id, scraped_at),
+    FOREIGN KEY (make_id)  REFERENCES makes (make_id)    ON DELETE CASCADE
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_make_metrics_scraped_at ON make_metrics (scraped_at);
+
+CREATE TABLE IF NOT EXISTS tag_stats(
+    tag_id          INT         PRIMARY KEY,
+    things          INT         NOT NULL,
+    likes           INT         NOT NULL,
+    FOREIGN KEY (tag_id)  REFERENCES tags (tag_id)    ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_tag_stats_things ON tag_stats (things);
+
+CREATE TABLE IF NOT EXISTS category_stats(
+    category        VARCHAR(50) PRIMARY KEY,
+    things          INT         NOT NULL,
+    likes           INT         NOT NULL,
+    makes           INT         NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_category_stats_likes ON category_stats (likes);
+
+CREATE TABLE IF NOT EXISTS printer_brand_stats(
+    printer_brand   VARCHAR(50) PRIMARY KEY,
+    makes           INT         NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_printer_brand_stats_makes ON printer_brand_stats (makes);
+
+CREATE TABLE IF NOT EXISTS remix_stats(
+    thing_id        INT         PRIMARY KEY,
+    remixes         INT         NOT NULL,
+    FOREIGN KEY (thing_id)  REFERENCES things (thing_id)    ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_remix_stats_remixes ON remix_stats (remixes);
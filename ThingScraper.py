@@ -1,22 +1,37 @@
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as ec
 from selenium.common.exceptions import NoSuchElementException, TimeoutException
 
 import general_config as gconf
 import personal_config as pconf
+import metrics
+from recording import PageRecorder
 import os
 import re
 import datetime
 import math
 import time
+import collections
 import logging
 
 # Define new logger
 logger = logging.getLogger(gconf.Logs.LOGGER_NAME)
 
 
+class By:
+    """
+    Locator strategies of the WebDriver protocol, the same values as selenium.webdriver.common.by.By.
+    Importing selenium.webdriver loads every driver, so it is only imported when a Browser is opened:
+    loading, database and API runs never import it.
+    """
+    ID = 'id'
+    XPATH = 'xpath'
+    LINK_TEXT = 'link text'
+    PARTIAL_LINK_TEXT = 'partial link text'
+    NAME = 'name'
+    TAG_NAME = 'tag name'
+    CLASS_NAME = 'class name'
+    CSS_SELECTOR = 'css selector'
+
+
 # region General manipulation functions
 
 def to_field_format(name):
@@ -26,6 +41,13 @@ def to_field_format(name):
     return name.lower().replace(' ', '_')
 
 
+def scrape_time():
+    """
+    Returns current time as ISO8601 str (seconds precision), used to stamp scraped objects.
+    """
+    return datetime.datetime.now().replace(microsecond=0).isoformat()
+
+
 def get_parent(element):
     """
     Returns the parent selenium element of given element.
@@ -101,14 +123,20 @@ class ScrapedData:
         """
         return str(type(self).__name__) + ":" + self.url
 
-    def print_info(self):
+    def info(self):
         """
-        Prints full information about the object instance.
+        Returns full information about the object instance: its url, then a line per property.
         """
         output = [self.url]
         for key in self.properties:
             output.append(f"\t{key} = {self.properties[key]}")
-        print("\n".join(output))
+        return "\n".join(output)
+
+    def print_info(self):
+        """
+        Prints full information about the object instance.
+        """
+        print(self.info())
 
     def keys(self):
         """
@@ -164,6 +192,7 @@ class User(ScrapedData):
         LIKES       - number of things the user liked
         SKILL_LEVEL - string, one of 3: Novice, Intermediate or Expert
         TITLES      - list, professional titles a user chose to add to his profile.
+        SCRAPED_AT  - datetime, the date and time the user was parsed in ISO8601
     """
     ELEMENTS = gconf.UserSettings.Elements
     PROPERTIES = gconf.UserSettings.Properties
@@ -314,6 +343,7 @@ class User(ScrapedData):
 
     # endregion
 
+    @metrics.timed('fetch_seconds', 'Duration of fetching the elements of an entity', entity='user')
     def fetch_all(self):
         """
         Breaks down the user's url into elements (tags and classes) holding properties.
@@ -335,6 +365,7 @@ class User(ScrapedData):
         # skill level
         self._fetch_skill()
 
+    @metrics.timed('parse_seconds', 'Duration of parsing the fetched elements of an entity', entity='user')
     def parse_all(self, clear_cache=True):
         """Obtain information from elements previously fetched for the user.
 
@@ -359,6 +390,8 @@ class User(ScrapedData):
         # skill level
         self._parse_skill()
 
+        self[User.PROPERTIES.SCRAPED_AT] = scrape_time()
+
         if clear_cache:
             self.clear_elements()
 
@@ -445,6 +478,7 @@ class Make(ScrapedData):
         VIEWS           - int, number of views for the make
         CATEGORY        - int, string, the category the make was uploaded to
         PRINT_SETTINGS  - dictionary, holds all print settings (if any) for the make
+        SCRAPED_AT      - datetime, the date and time the make was parsed in ISO8601
     """
 
     ELEMENTS = gconf.MakeSettings.Elements
@@ -543,6 +577,7 @@ class Make(ScrapedData):
 
     # endregion
 
+    @metrics.timed('fetch_seconds', 'Duration of fetching the elements of an entity', entity='make')
     def fetch_all(self):
         """
         Open the make's url (if not already opened) and fetch elements.
@@ -645,6 +680,7 @@ class Make(ScrapedData):
 
     # endregion
 
+    @metrics.timed('parse_seconds', 'Duration of parsing the fetched elements of an entity', entity='make')
     def parse_all(self, clear_cache=True):
         """
         Parse all properties for make instance.
@@ -659,6 +695,7 @@ class Make(ScrapedData):
         self._parse_views()
         self._parse_category()
         self._parse_print_settings()
+        self[Make.PROPERTIES.SCRAPED_AT] = scrape_time()
 
         if clear_cache:
             self.clear_elements()
@@ -686,6 +723,7 @@ class Thing(ScrapedData):
         LICENSE             - string, usage licenses provided by the user
         REMIX               - string, if the thing is a remix, includes the source thing id as provided from thingiverse
         CATEGORY            - string, the category the thing was uploaded to
+        SCRAPED_AT          - datetime, the date and time the thing was parsed in ISO8601
     """
     ELEMENTS = gconf.ThingSettings.Elements
     PROPERTIES = gconf.ThingSettings.Properties
@@ -748,15 +786,16 @@ class Thing(ScrapedData):
             print_settings = self.browser.find_parent(settings_header)
             self._elements[Thing.ELEMENTS.PRINT_SETTINGS] = print_settings.find_elements_by_class_name(
                 gconf.ThingSettings.PRINT_SETTING)
-        except NoSuchElementException:
+        except (NoSuchElementException, TimeoutException):
             self._elements[Thing.ELEMENTS.PRINT_SETTINGS] = None
 
     def _fetch_tags(self):
         # obtain all tag elements into a list
         try:
             all_tags = self.browser.wait_and_find(By.CLASS_NAME, gconf.ThingSettings.TAG_LIST)
-            self._elements[Thing.ELEMENTS.TAGS] = [tag for tag in
-                                                   all_tags.find_elements_by_class_name(gconf.ThingSettings.TAG_SINGLE)]
+            # things without tags have no tag list
+            self._elements[Thing.ELEMENTS.TAGS] = None if all_tags is None else \
+                all_tags.find_elements_by_class_name(gconf.ThingSettings.TAG_SINGLE)
         except (NoSuchElementException, TimeoutException):
             self._elements[Thing.ELEMENTS.TAGS] = None
 
@@ -852,6 +891,7 @@ class Thing(ScrapedData):
 
     # endregion
 
+    @metrics.timed('fetch_seconds', 'Duration of fetching the elements of an entity', entity='thing')
     def fetch_all(self, browser=None):
         """
         Breaks down the thing's url into elements (tags and classes) holding properties.
@@ -881,6 +921,7 @@ class Thing(ScrapedData):
 
         self._fetch_category()
 
+    @metrics.timed('parse_seconds', 'Duration of parsing the fetched elements of an entity', entity='thing')
     def parse_all(self, clear_cache=True):
         """Obtain information from elements previously fetched for the thing.
 
@@ -918,6 +959,9 @@ class Thing(ScrapedData):
         # Category
         self._parse_category()
 
+        # Scrape time
+        self[Thing.PROPERTIES.SCRAPED_AT] = scrape_time()
+
         # Clearing cache
         if clear_cache:
             self.clear_elements()
@@ -944,12 +988,15 @@ class Thing(ScrapedData):
         n_makes = min(self[Thing.PROPERTIES.MAKES], max_makes)
 
         thing_cards = []
-        # while not all n_makes are found
-        while len(thing_cards) < n_makes:
-            # scroll down to the bottom of the page
-            self.browser.driver.execute_script("window.scrollTo(0,document.body.scrollHeight)")
-            # get all found elements
-            thing_cards = self.browser.wait_and_find(By.CLASS_NAME, gconf.ExploreList.THING_CARD, find_all=True)
+        with metrics.timed('scroll_harvest_seconds', 'Duration of scrolling to load cards', kind='makes'):
+            # while not all n_makes are found
+            while len(thing_cards) < n_makes:
+                # scroll down to the bottom of the page
+                self.browser.driver.execute_script("window.scrollTo(0,document.body.scrollHeight)")
+                metrics.inc('scroll_rounds_total', description='Number of scrolls', kind='makes')
+                # get all found elements
+                thing_cards = self.browser.wait_and_find(By.CLASS_NAME, gconf.ExploreList.THING_CARD, find_all=True)
+        metrics.inc('harvested_cards_total', len(thing_cards), 'Number of cards found by scrolling', kind='makes')
 
         # Construct make id list from thing card list
         makes_list = []
@@ -993,12 +1040,15 @@ class Thing(ScrapedData):
         time.sleep(pconf.IMPLICITLY_WAIT)
 
         thing_cards = []
-        # while not all n_remixes are found
-        while len(thing_cards) < n_remixes:
-            # scroll down to the bottom of the page
-            self.browser.driver.execute_script("window.scrollTo(0,document.body.scrollHeight)")
-            # get all found elements
-            thing_cards = self.browser.wait_and_find(By.CLASS_NAME, gconf.ExploreList.THING_CARD, find_all=True)
+        with metrics.timed('scroll_harvest_seconds', 'Duration of scrolling to load cards', kind='remixes'):
+            # while not all n_remixes are found
+            while len(thing_cards) < n_remixes:
+                # scroll down to the bottom of the page
+                self.browser.driver.execute_script("window.scrollTo(0,document.body.scrollHeight)")
+                metrics.inc('scroll_rounds_total', description='Number of scrolls', kind='remixes')
+                # get all found elements
+                thing_cards = self.browser.wait_and_find(By.CLASS_NAME, gconf.ExploreList.THING_CARD, find_all=True)
+        metrics.inc('harvested_cards_total', len(thing_cards), 'Number of cards found by scrolling', kind='remixes')
 
         # Construct thing list that holds thing_id and number of likes per remix
         thing_list = []
@@ -1017,37 +1067,92 @@ class Thing(ScrapedData):
 # endregion
 # endregion
 
+def process_tree_memory(pid):
+    """
+    Returns the resident memory (MB) of process pid and all of its descendants, None if unknown.
+    Process memory is read from /proc, so it is only known on Linux.
+    """
+    children = collections.defaultdict(list)
+    try:
+        entries = os.listdir('/proc')
+    except OSError:
+        return None
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open('/proc/{}/stat'.format(entry)) as file:
+                stat = file.read()
+        except OSError:
+            continue
+        # the process name (2nd field) may hold spaces and parentheses: state and parent id follow the last ')'
+        children[int(stat.rsplit(')', 1)[1].split()[1])].append(int(entry))
+
+    pages = 0
+    pending = [pid]
+    while pending:
+        process = pending.pop()
+        pending.extend(children[process])
+        try:
+            with open('/proc/{}/statm'.format(process)) as file:
+                pages += int(file.read().split()[1])
+        except OSError:
+            # the process ended
+            continue
+    return pages * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+
+
 # Browser managing class
 class Browser:
     """
     Browser class manages the browser to be opened and it's driver.
     Once an instance is created, WebDriver methods and attributes can be passed to the 'Browser.driver' attribute.
     Additional methods like get(url) and close can be directly applied to the Browser instance.
+    The driver is restarted (recycled) after a number of page navigations or when the browser holds too much memory,
+    and can be restarted after a crash (see recover), so Browser.driver may change while scraping.
     """
-    # Dictionary that defines browsers and their relevant web driver class
-    available_browsers = {'chrome': webdriver.Chrome, 'firefox': webdriver.Firefox, 'iexplorer': webdriver.Ie,
-                          'safari': webdriver.Safari}
+    # Dictionary that defines browsers and the name of their relevant web driver class (in selenium.webdriver)
+    available_browsers = {'chrome': 'Chrome', 'firefox': 'Firefox', 'iexplorer': 'Ie', 'safari': 'Safari'}
 
-    def __init__(self, name, path, headless=False):
+    def __init__(self, name, path, headless=False, count_roundtrips=False, record_dir=None,
+                 recycle_after=gconf.Browser.RECYCLE_AFTER, max_memory=gconf.Browser.MAX_MEMORY_MB):
         """Construction of a new browser instance
 
                Parameters:
                 name (string): browser's name. can only be one of the available browsers.
                                More info: Browsers.available_browsers.keys()
                 path (string): the path (either relative or absolute) to the browser of choice web driver.
+                count_roundtrips (bool): if true, WebDriver round trips are counted in Browser.roundtrips
+                                         (see roundtrips.RoundTripStats). Default: False
+                record_dir (str): if given, every opened page is recorded into this directory, to be replayed
+                                  later (see recording.PageRecorder). Default: None
+                recycle_after (int): number of page navigations after which the driver is restarted, 0 to never
+                                     restart it. Default: gconf.Browser.RECYCLE_AFTER
+                max_memory (int): memory (MB) of the driver and browser processes above which the driver is
+                                  restarted, 0 for no limit. Default: gconf.Browser.MAX_MEMORY_MB
         """
         self.name = name
         self.driver_path = os.path.abspath(path)
+        self.headless = headless
 
-        if self.name in Browser.available_browsers:
-            options = eval('webdriver.{}'.format(name)).options.Options()
-            options.headless = headless
-            self.driver = Browser.available_browsers[name](self.driver_path, options=options)
-        else:
+        if self.name not in Browser.available_browsers:
             raise ValueError(
                 f"Requested browser '{name}' not available. "
                 f"Usable browsers:\n {list(Browser.available_browsers.keys())}")
 
+        self.roundtrips = None
+        if count_roundtrips:
+            from roundtrips import RoundTripStats
+            self.roundtrips = RoundTripStats()
+
+        self.recorder = None if record_dir is None else PageRecorder(record_dir)
+
+        self.recycle_after = recycle_after
+        self.max_memory = max_memory
+        self.restarts = 0
+        self.driver = None
+        self.start()
+
         # minimise the opened browser
         # self.driver.minimize_window()
 
@@ -1063,19 +1168,111 @@ class Browser:
         """
         self.close()
 
-    def get(self, url):
+    def _new_driver(self):
         """
-        Equivalent to Browser.driver.get method
+        Returns a new WebDriver of the browser.
         """
+        from selenium import webdriver
+        options = eval('webdriver.{}'.format(self.name)).options.Options()
+        options.headless = self.headless
+        driver_class = getattr(webdriver, Browser.available_browsers[self.name])
+        return driver_class(self.driver_path, options=options)
 
-        self.driver.get(url)
+    def start(self):
+        """
+        Start a new driver session, counting its round trips if enabled.
+        """
+        driver = self._new_driver()
+        if self.roundtrips is not None:
+            from roundtrips import CountingDriver
+            driver = CountingDriver(driver, self.roundtrips)
+        self.driver = driver
+        self.navigations = 0
+
+    def restart(self, reason):
+        """
+        Quit the driver session (if it still responds) and start a new one. The opened page is lost.
+            Parameters:
+                reason (str): why the driver is restarted (navigations, memory or crash), for logs and metrics
+        """
+        logger.info("Restarting the browser (%s) after %d page navigations", reason, self.navigations)
+        try:
+            self.driver.quit()
+        except Exception as e:
+            logger.debug("Failed to quit the browser: %s", e)
+        self.start()
+        self.restarts += 1
+        metrics.inc('browser_restarts_total', description='Number of browser restarts', reason=reason)
+
+    def memory(self):
+        """
+        Returns the memory (MB) of the driver and browser processes, None if unknown.
+        """
+        process = getattr(getattr(self.driver, 'service', None), 'process', None)
+        if process is None:
+            return None
+        return process_tree_memory(process.pid)
+
+    def _recycle_reason(self):
+        """
+        Returns the reason to restart the driver before the next navigation, None if it should be kept.
+        """
+        if self.recycle_after and self.navigations >= self.recycle_after:
+            return 'navigations'
+        if self.max_memory and self.navigations and self.navigations % gconf.Browser.MEMORY_CHECK_INTERVAL == 0:
+            memory = self.memory()
+            if memory is not None and memory > self.max_memory:
+                return 'memory'
+        return None
+
+    def is_alive(self):
+        """
+        Returns true if the driver session responds.
+        """
+        try:
+            self.driver.current_url
+        except Exception:
+            return False
+        return True
+
+    def recover(self):
+        """
+        After a failure, restart the driver if its session died (crashed browser or driver).
+        Returns true if the driver was restarted, the failed step can then be run again.
+        """
+        if self.is_alive():
+            return False
+        self.restart('crash')
+        return True
+
+    def get(self, url):
+        """
+        Equivalent to Browser.driver.get method.
+        The driver is restarted first if it is due to be recycled (see recycle_after and max_memory).
+        """
+        self.record_page()
+        reason = self._recycle_reason()
+        if reason is not None:
+            self.restart(reason)
+        with metrics.timed('browser_get_seconds', 'Duration of page navigations'):
+            self.driver.get(url)
+        self.navigations += 1
 
     def close(self):
         """
         Equivalent to Browser.driver.close method
         """
+        self.record_page()
         self.driver.close()
 
+    def record_page(self):
+        """
+        When recording, save the opened page as it is now (after scripts, scrolls and clicks).
+        Called before leaving a page.
+        """
+        if self.recorder is not None:
+            self.recorder.save(self.driver.current_url, self.driver.page_source)
+
     def opened_url(self):
         """
         Returns the currently opened url.
@@ -1097,6 +1294,9 @@ class Browser:
         if regex:
             name = re.compile(name)
 
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as ec
+
         # wait for given element to be available. raise error if timeout has been reached.
         WebDriverWait(self.driver, timeout).until(
             ec.presence_of_all_elements_located((by, name)) if find_all else ec.presence_of_element_located((by, name))
@@ -0,0 +1,89 @@
+"""
+Benchmark of Thing, Make and User fetching and parsing, in-process: pages of the fake Thingiverse (see fake_site.py)
+are rendered beforehand and served by the lxml fake driver (see fake_browser.py), so results measure the scraper's
+fetch and parse logic alone, without a browser or the network.
+Reports pages/sec and per-page latency percentiles (fetch_all start to parse_all end) by entity.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_parse --pages 2000
+"""
+import argparse
+import time
+
+import general_config as gconf
+from ThingScraper import Thing, User, Make
+from fake_browser import FakeBrowser
+from benchmarks.fake_site import render_thing, render_make, render_user, FIRST_THING_ID
+from benchmarks.common import latency_summary, print_table, write_results
+
+
+def entity_pages(count):
+    """
+    Returns {entity name: (constructor, {url: html})} of count synthetic pages per entity.
+    """
+    thing_ids = range(FIRST_THING_ID, FIRST_THING_ID + count)
+    # make ids are derived from their source thing id (see fake_site.render_thing_makes)
+    make_ids = [thing_id * 10 for thing_id in thing_ids]
+    usernames = ['maker{}'.format(i) for i in range(1, count + 1)]
+    return {'thing': (lambda url: Thing(url=url), {gconf.ThingSettings.BASE_URL.format(thing_id):
+                                                   render_thing(thing_id) for thing_id in thing_ids}),
+            'make': (lambda url: Make(url=url), {gconf.MakeSettings.BASE_URL.format(make_id): render_make(make_id)
+                                                 for make_id in make_ids}),
+            'user': (lambda url: User(url=url), {gconf.UserSettings.BASE_URL.format(username): render_user(username)
+                                                 for username in usernames})}
+
+
+def run_benchmark(count, count_roundtrips=False):
+    """
+    Fetch and parse count pages of every entity.
+    :return: list of result rows, one per entity
+    """
+    results = []
+    for entity, (constructor, pages) in entity_pages(count).items():
+        browser = FakeBrowser(pages, count_roundtrips=count_roundtrips)
+        latencies = []
+        failed = 0
+        start = time.perf_counter()
+        for url in pages:
+            scraped = constructor(url)
+            scraped.set_browser(browser)
+            page_start = time.perf_counter()
+            try:
+                scraped.fetch_all()
+                scraped.parse_all()
+            except Exception:
+                failed += 1
+                continue
+            latencies.append(time.perf_counter() - page_start)
+        elapsed = time.perf_counter() - start
+
+        row = {'entity': entity, 'pages': len(latencies), 'failed': failed, 'seconds': round(elapsed, 2),
+               'pages_per_sec': round(len(latencies) / elapsed, 1) if elapsed else None}
+        if browser.roundtrips is not None:
+            row['calls_per_page'] = round(sum(calls for calls, _, _ in browser.roundtrips.totals().values())
+                                          / len(pages), 1)
+        row.update(latency_summary(latencies))
+        results.append(row)
+    return results
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description="Benchmark Thing, Make and User parsing over the lxml fake driver")
+    parser.add_argument('--pages', type=int, default=1000, help='number of pages fetched and parsed per entity')
+    parser.add_argument('--count-roundtrips', action='store_true',
+                        help='also report the number of WebDriver calls per page')
+    parser.add_argument('--output', type=str, default=None, help='write results to this JSON file')
+    args = parser.parse_args()
+
+    results = run_benchmark(args.pages, args.count_roundtrips)
+
+    columns = ['entity', 'pages', 'failed', 'seconds', 'pages_per_sec', 'p50_ms', 'p90_ms', 'p99_ms', 'max_ms']
+    if args.count_roundtrips:
+        columns.insert(5, 'calls_per_page')
+    print_table(results, columns)
+    if args.output:
+        write_results(args.output, results)
+
+
+if __name__ == '__main__':
+    main_benchmark()
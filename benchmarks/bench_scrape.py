@@ -0,0 +1,124 @@
+"""
+Benchmark of the scrape_* functions of main.py, driving the real Browser (headless Chrome by default)
+against a local fake Thingiverse (see fake_site.py), so results do not depend on the live site.
+Reports entities/sec and per-entity latency percentiles (fetch_all start to parse_all end) for every function.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_scrape --pages 2 --items 20
+"""
+import argparse
+import functools
+import time
+
+import personal_config as pconf
+import main
+from ThingScraper import Browser, Thing, User, Make
+from benchmarks.fake_site import FakeThingiverse, use_site
+from benchmarks.common import latency_summary, print_table, write_results
+
+
+class EntityTimer:
+    """
+    Measures every scraped entity, from the start of its fetch_all to the end of its parse_all,
+    by wrapping these methods of Thing, User and Make while installed.
+    """
+
+    def __init__(self):
+        self.latencies = []
+        self._started = {}
+        self._originals = []
+
+    def install(self):
+        for cls in (Thing, User, Make):
+            self._originals.append((cls, cls.fetch_all, cls.parse_all))
+            cls.fetch_all = self._wrap_fetch(cls.fetch_all)
+            cls.parse_all = self._wrap_parse(cls.parse_all)
+
+    def uninstall(self):
+        for cls, fetch_all, parse_all in self._originals:
+            cls.fetch_all, cls.parse_all = fetch_all, parse_all
+        self._originals.clear()
+
+    def take(self):
+        """
+        Returns the latencies measured since the last call.
+        """
+        latencies, self.latencies = self.latencies, []
+        self._started.clear()
+        return latencies
+
+    def _wrap_fetch(self, fetch_all):
+        @functools.wraps(fetch_all)
+        def wrapper(entity, *args, **kwargs):
+            self._started[id(entity)] = time.perf_counter()
+            return fetch_all(entity, *args, **kwargs)
+        return wrapper
+
+    def _wrap_parse(self, parse_all):
+        @functools.wraps(parse_all)
+        def wrapper(entity, *args, **kwargs):
+            result = parse_all(entity, *args, **kwargs)
+            started = self._started.pop(id(entity), None)
+            if started is not None:
+                self.latencies.append(time.perf_counter() - started)
+            return result
+        return wrapper
+
+
+def run_benchmark(browser, pages, items):
+    """
+    Run every scrape_* function once, in the order of the 'All' action, over browser.
+    :return: list of result rows, one per function
+    """
+    settings = {'browser_obj': browser, 'sort': 'p30', 'volume': 0, 'not_all_users': True}
+    data = {'things': dict(), 'users': dict(), 'makes': dict()}
+    timer = EntityTimer()
+    timer.install()
+    results = []
+    try:
+        for function, num_items in ((main.scrape_main_page, pages), (main.scrape_remixes_in_db, items),
+                                    (main.scrape_make_in_db, items), (main.scrape_users_in_db, items)):
+            settings['num_items'] = num_items
+            start = time.perf_counter()
+            data, failed = function(settings, data)
+            elapsed = time.perf_counter() - start
+            latencies = timer.take()
+
+            row = {'function': function.__name__, 'entities': len(latencies), 'failed': len(failed),
+                   'seconds': round(elapsed, 2),
+                   'entities_per_sec': round(len(latencies) / elapsed, 2) if elapsed else None}
+            row.update(latency_summary(latencies))
+            results.append(row)
+    finally:
+        timer.uninstall()
+    return results
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description="Benchmark the scraper against a local fake Thingiverse")
+    parser.add_argument('--pages', type=int, default=1, help='number of explore pages scraped for things')
+    parser.add_argument('--items', type=int, default=20, help='maximum number of remixes, makes and users scraped')
+    parser.add_argument('-B', '--Browser', type=str, default=pconf.browser, help='Browser name')
+    parser.add_argument('-D', '--Driver', type=str, default=pconf.driver_path, help='Driver path')
+    parser.add_argument('--show', action='store_true', help='show the browser (headless by default)')
+    parser.add_argument('--implicit-wait', type=float, default=0,
+                        help='seconds to wait for javascript in makes and remixes pages (the fake site has none)')
+    parser.add_argument('--pages-dir', type=str, default=None,
+                        help='directory of recorded pages served instead of synthetic ones')
+    parser.add_argument('--output', type=str, default=None, help='write results to this JSON file')
+    args = parser.parse_args()
+
+    pconf.IMPLICITLY_WAIT = args.implicit_wait
+    with FakeThingiverse(pages_dir=args.pages_dir) as site:
+        use_site(site.url)
+        with Browser(args.Browser, args.Driver, headless=not args.show) as browser:
+            results = run_benchmark(browser, args.pages, args.items)
+
+    print_table(results, ['function', 'entities', 'failed', 'seconds', 'entities_per_sec',
+                          'p50_ms', 'p90_ms', 'p99_ms', 'max_ms'])
+    if args.output:
+        write_results(args.output, results)
+
+
+if __name__ == '__main__':
+    main_benchmark()
@@ -0,0 +1,108 @@
+"""
+Benchmark of snapshot storage and loading at scale, over synthetic corpora (see corpus.py): serialization of scraped
+objects (parse_json_from_data), saving (save_json), loading (load_json) and database import (build_database,
+into a local SQLite database) are timed at every scale, and their peak memory is measured with tracemalloc
+(in a second run of every phase, so tracing does not slow down the timed one).
+
+Usage (from the repository root):
+    python -m benchmarks.bench_storage --scales 1000 10000 100000
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+import tracemalloc
+
+import general_config as gconf
+import main
+from ThingScraper import Thing, User, Make
+from Database.build_db import build_database
+from benchmarks.corpus import generate_corpus
+from benchmarks.common import print_table, write_results
+
+
+def measure(function, trace_memory=True):
+    """
+    Run function and measure it.
+    :return: (seconds, peak memory in MB or None, the function's result)
+    """
+    start = time.perf_counter()
+    result = function()
+    seconds = time.perf_counter() - start
+
+    peak = None
+    if trace_memory:
+        tracemalloc.start()
+        try:
+            function()
+            peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        finally:
+            tracemalloc.stop()
+    return seconds, peak, result
+
+
+def as_scraped(data):
+    """
+    Returns JSON data as scraped data, holding Thing, User and Make objects (as load_json does).
+    """
+    return {'things': {key: Thing(thing_id=key, properties=properties)
+                       for key, properties in data['things'].items()},
+            'users': {key: User(username=key, properties=properties) for key, properties in data['users'].items()},
+            'makes': {key: Make(make_id=key, properties=properties) for key, properties in data['makes'].items()}}
+
+
+def run_benchmark(things, directory, seed=0, trace_memory=True):
+    """
+    Measure every phase over a synthetic corpus of given number of things.
+    :return: list of result rows, one per phase
+    """
+    scraped = as_scraped(generate_corpus(things, seed))
+    records = sum(len(entities) for entities in scraped.values())
+    json_path = os.path.join(directory, 'corpus_{}.json'.format(things))
+    db_name = os.path.join(directory, 'corpus_{}'.format(things))
+
+    phases = [('parse_json_from_data', lambda: main.parse_json_from_data(scraped)),
+              ('save_json', lambda: main.save_json(json_path, scraped)),
+              ('load_json', lambda: main.load_json(json_path)),
+              ('build_database', lambda: build_database(json_path, db_name, backend='sqlite'))]
+    results = []
+    for phase, function in phases:
+        seconds, peak, _ = measure(function, trace_memory)
+        row = {'things': things, 'records': records, 'phase': phase, 'seconds': round(seconds, 3),
+               'records_per_sec': round(records / seconds) if seconds else None,
+               'peak_mb': None if peak is None else round(peak, 1)}
+        if phase == 'save_json':
+            row['file_mb'] = round(os.path.getsize(json_path) / 2 ** 20, 1)
+        results.append(row)
+    return results
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description="Benchmark snapshot storage, loading and database import at scale")
+    parser.add_argument('--scales', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help='numbers of things of the synthetic corpora (users and makes scale along)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the synthetic corpora')
+    parser.add_argument('--no-memory', action='store_true', help='do not measure peak memory (runs every phase once)')
+    parser.add_argument('--dir', type=str, default=None,
+                        help='directory of the JSON and database files. Default: a temporary directory')
+    parser.add_argument('--output', type=str, default=None, help='write results to this JSON file')
+    args = parser.parse_args()
+
+    # the loaders log every chunk, keep the output to the results
+    logging.getLogger(gconf.Logs.LOGGER_NAME).setLevel(logging.WARNING)
+
+    results = []
+    with tempfile.TemporaryDirectory() as temporary:
+        directory = args.dir or temporary
+        os.makedirs(directory, exist_ok=True)
+        for things in args.scales:
+            results.extend(run_benchmark(things, directory, args.seed, not args.no_memory))
+
+    print_table(results, ['things', 'records', 'phase', 'seconds', 'records_per_sec', 'peak_mb', 'file_mb'])
+    if args.output:
+        write_results(args.output, results)
+
+
+if __name__ == '__main__':
+    main_benchmark()
@@ -0,0 +1,45 @@
+"""
+Helpers shared by the benchmark scripts.
+"""
+import json
+import math
+
+
+def percentile(values, fraction):
+    """
+    Returns the nearest-rank percentile of values (fraction between 0 and 1), None if there are no values.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def latency_summary(latencies):
+    """
+    Returns a dict of p50, p90, p99 and max of latencies (seconds), in milliseconds.
+    """
+    summary = {}
+    for name, fraction in (('p50_ms', 0.5), ('p90_ms', 0.9), ('p99_ms', 0.99), ('max_ms', 1)):
+        value = percentile(latencies, fraction)
+        summary[name] = None if value is None else round(1000 * value, 2)
+    return summary
+
+
+def print_table(rows, columns):
+    """
+    Print rows (dicts) as a text table of given columns.
+    """
+    cells = [[str(column) for column in columns]] + [['' if row.get(column) is None else str(row[column])
+                                                      for column in columns] for row in rows]
+    widths = [max(len(line[i]) for line in cells) for i in range(len(columns))]
+    for line in cells:
+        print('  '.join(cell.rjust(width) for cell, width in zip(line, widths)))
+
+
+def write_results(file_path, results):
+    """
+    Write benchmark results as JSON, to compare runs.
+    """
+    with open(file_path, 'w') as file:
+        json.dump(results, file, indent=2)
@@ -0,0 +1,195 @@
+"""
+Synthetic snapshots at any scale (1k to 10M things), with matching users and makes, for scale-testing storage,
+loading and database import. Records have the properties of scraped ones (see main.parse_json_from_data), with
+skewed distributions: a few users create most things, tags are Zipf-like over a large vocabulary, likes and makes
+are heavy tailed, a share of things have no print settings, and remixes point to earlier things, forming chains.
+The corpus is generated deterministically from the number of things and the seed.
+
+Usage (from the repository root):
+    python -m benchmarks.corpus --things 1000000 --output corpus.jsonl
+"""
+import argparse
+import datetime
+import random
+from array import array
+
+import personal_config as pconf
+from snapshots import SnapshotWriter
+from benchmarks.fake_site import MODEL_WORDS, TAGS, CATEGORIES, LICENSES, PRINTERS, TITLES, SKILLS, FIRST_THING_ID
+
+USERS_PER_THING = 0.3  # Number of users in the corpus per thing
+TAG_VOCABULARY = 5000  # Number of distinct tags
+CREATOR_SKEW = 3  # The larger, the more things are created by the first (most active) users
+TAG_SKEW = 4  # The larger, the more popular the first tags of the vocabulary
+NO_TAGS_RATE = 0.25  # Share of things without tags
+NO_PRINT_SETTINGS_RATE = 0.3  # Share of things and makes without print settings
+REMIX_RATE = 0.2  # Share of things that are remixes of an earlier thing
+MAKES_PER_THING = pconf.MAX_MAKES_TO_SCAN  # Maximum number of makes scraped per thing
+FIRST_MAKE_ID = 1000000
+FIRST_UPLOAD = datetime.datetime(2009, 1, 1)
+UPLOAD_DAYS = 4500  # Things are uploaded over this number of days, in id order
+SCRAPED_AT = '2021-04-01T12:00:00'
+
+COLORS = [None, None, None, 'black', 'white', 'gray', 'red', 'blue', 'silver']
+MATERIALS = ['pla', 'pla', 'pla', 'petg', 'abs', 'tpu', 'resin']
+FILAMENT_BRANDS = [None, None, 'Generic', 'Hatchbox', 'Prusament', 'eSun', 'Sunlu']
+TAG_NAMES = TAGS + ['tag{}'.format(i) for i in range(TAG_VOCABULARY - len(TAGS))]
+
+
+def _skewed(rng, count, skew):
+    """
+    Returns an index in range(count), low indices being much more likely (power law) the larger skew is.
+    """
+    return int(count * rng.random() ** skew)
+
+
+def _uploaded(rng, position, things):
+    """
+    Returns the upload time of the thing at given position (in id order) as a parsed ISO8601 str.
+    """
+    day = int(UPLOAD_DAYS * position / things) + rng.randint(0, 30)
+    return (FIRST_UPLOAD + datetime.timedelta(days=day, seconds=rng.randint(0, 86399))).isoformat()
+
+
+def _print_settings(rng, make=False):
+    """
+    Returns print settings of a thing (lowercase, as parsed from thing pages) or a make (as shown on make pages).
+    """
+    if rng.random() < NO_PRINT_SETTINGS_RATE:
+        return None
+    brand, model = rng.choice(PRINTERS)
+    if make:
+        return {'printer_brand': brand, 'printer_model': model, 'rafts': rng.choice(['Yes', 'No', 'No']),
+                'supports': rng.choice(['Yes', 'No']), 'resolution': rng.choice(['0.1 mm', '0.2 mm', '0.3 mm']),
+                'infill': rng.choice(['10%', '15%', '20%', '100%']), 'filament_brand': rng.choice(FILAMENT_BRANDS)}
+    return {'printer_brand': brand.lower(), 'printer_model': model.lower(), 'rafts': rng.choice(['yes', 'no', 'no']),
+            'supports': rng.choice(['yes', 'no', "doesn't matter"]), 'resolution': rng.choice(['0.1', '0.2', '0.3']),
+            'infill': rng.choice(['10%', '15%', '20%', '100%']), 'filament_brand': rng.choice(FILAMENT_BRANDS),
+            'filament_color': rng.choice(COLORS), 'filament_material': rng.choice(MATERIALS)}
+
+
+def _thing(rng, position, things, users):
+    """
+    Returns (properties, number of scraped makes) of the thing at given position.
+    """
+    thing_id = FIRST_THING_ID + position
+    makes = int(rng.paretovariate(1.3)) - 1
+    remix = None
+    if position and rng.random() < REMIX_RATE:
+        # an earlier thing, often a recent one: remixes of remixes form chains
+        remix = str(thing_id - 1 - _skewed(rng, position, 2))
+    tags = None
+    if rng.random() >= NO_TAGS_RATE:
+        # without duplicates, in a deterministic order
+        tags = list(dict.fromkeys(TAG_NAMES[_skewed(rng, TAG_VOCABULARY, TAG_SKEW)]
+                                  for _ in range(1 + min(int(rng.expovariate(0.25)), 19))))
+
+    properties = {'thing_id': str(thing_id),
+                  'model_name': ' '.join(rng.choice(MODEL_WORDS) for _ in range(rng.randint(1, 4))).title(),
+                  'username': 'user{}'.format(_skewed(rng, users, CREATOR_SKEW)),
+                  'uploaded': _uploaded(rng, position, things),
+                  'thing_files': rng.randint(1, 12),
+                  'comments': int(rng.expovariate(0.2)),
+                  'makes': makes,
+                  'remixes': int(rng.paretovariate(2)) - 1,
+                  'likes': int(rng.paretovariate(1.1) * 5) - 5,
+                  'tags': tags,
+                  'print_settings': _print_settings(rng),
+                  'license': LICENSES[_skewed(rng, len(LICENSES), 2)],
+                  'remix': remix,
+                  'category': CATEGORIES[_skewed(rng, len(CATEGORIES), 2)],
+                  'scraped_at': SCRAPED_AT}
+    return properties, min(makes, MAKES_PER_THING)
+
+
+def _user(rng, index):
+    return {'username': 'user{}'.format(index),
+            'followers': int(rng.paretovariate(1.1)) - 1,
+            'following': int(rng.expovariate(0.05)),
+            'designs': int(rng.paretovariate(1.5)),
+            'favorites': int(rng.expovariate(0.02)),
+            'collections': int(rng.expovariate(0.5)),
+            'makes': int(rng.paretovariate(1.5)) - 1,
+            'likes': int(rng.expovariate(0.01)),
+            'titles': sorted({TITLES[_skewed(rng, len(TITLES), 2)].lower() for _ in range(rng.randint(1, 3))}),
+            'skill_level': None if rng.random() < 0.4 else rng.choice(SKILLS).lower(),
+            'scraped_at': SCRAPED_AT}
+
+
+def _make(rng, make_id, thing_id, users, things):
+    return {'make_id': make_id,
+            'thingiverse_id': str(thing_id),
+            'username': 'user{}'.format(rng.randrange(users)),
+            'uploaded': _uploaded(rng, thing_id - FIRST_THING_ID + rng.randint(0, things // 10), things),
+            'like': int(rng.expovariate(0.3)),
+            'comments': int(rng.expovariate(1)),
+            'share': int(rng.expovariate(2)),
+            'views': int(rng.paretovariate(1.2) * 20),
+            'category': CATEGORIES[_skewed(rng, len(CATEGORIES), 2)].lower(),
+            'print_settings': _print_settings(rng, make=True),
+            'scraped_at': SCRAPED_AT}
+
+
+def iter_corpus(things, seed=0):
+    """
+    Generate a synthetic corpus as a stream of (data type, key, properties) records: all things, then all users,
+    then all makes (as written by snapshots.SnapshotWriter). Memory use stays low at any scale.
+    :param things: number of things
+    :param seed: seed of the generated corpus
+    """
+    rng = random.Random(seed)
+    users = max(1, int(things * USERS_PER_THING))
+
+    # number of scraped makes of every thing, to generate makes after users
+    makes = array('B')
+    for position in range(things):
+        properties, thing_makes = _thing(rng, position, things, users)
+        makes.append(thing_makes)
+        yield 'things', properties['thing_id'], properties
+
+    for index in range(users):
+        properties = _user(rng, index)
+        yield 'users', properties['username'], properties
+
+    make_id = FIRST_MAKE_ID
+    for position, thing_makes in enumerate(makes):
+        for _ in range(thing_makes):
+            yield 'makes', str(make_id), _make(rng, make_id, FIRST_THING_ID + position, users, things)
+            make_id += 1
+
+
+def generate_corpus(things, seed=0):
+    """
+    Returns a synthetic corpus as JSON data: {'things': {...}, 'users': {...}, 'makes': {...}} (see iter_corpus).
+    """
+    data = {'things': dict(), 'users': dict(), 'makes': dict()}
+    for data_type, key, properties in iter_corpus(things, seed):
+        data[data_type][key] = properties
+    return data
+
+
+def write_corpus(file_path, things, seed=0, file_format=None):
+    """
+    Stream a synthetic corpus into a snapshot file (json, jsonl or binary, see snapshots.SnapshotWriter).
+    :return: number of written records
+    """
+    with SnapshotWriter(file_path, file_format) as writer:
+        for data_type, key, properties in iter_corpus(things, seed):
+            writer.write(data_type, key, properties)
+    return writer.written
+
+
+def main_corpus():
+    parser = argparse.ArgumentParser(description="Generate a synthetic Thingiverse snapshot")
+    parser.add_argument('--things', type=int, default=1000, help='number of things (users and makes scale along)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the generated corpus')
+    parser.add_argument('-o', '--output', type=str, required=True,
+                        help='snapshot file to write, its format is chosen by extension (.json, .jsonl, .snap)')
+    args = parser.parse_args()
+
+    written = write_corpus(args.output, args.things, args.seed)
+    print("{} records written to {}".format(written, args.output))
+
+
+if __name__ == '__main__':
+    main_corpus()
@@ -0,0 +1,271 @@
+"""
+A local fake Thingiverse: explore, thing, makes, remixes, make and user pages served over HTTP, built with the
+class names of general_config so the real scraper can run against it.
+Pages are either synthetic (generated deterministically from the requested id) or recorded pages read from a
+directory (see recording.PageRecorder and the --record option of main.py).
+
+Usage:
+    with FakeThingiverse() as site:
+        use_site(site.url)
+        ...
+"""
+import os
+import random
+import threading
+import datetime
+from html import escape
+from urllib.parse import urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import general_config as gconf
+from recording import page_file_name
+
+MODEL_WORDS = ['box', 'holder', 'mount', 'bracket', 'case', 'stand', 'clip', 'hook', 'gear', 'lamp', 'vase',
+               'dragon', 'benchy', 'organizer', 'adapter', 'knob', 'planter', 'whistle', 'cable', 'spool']
+TAGS = ['3d_printing', 'pla', 'tool', 'toy', 'gift', 'home', 'kitchen', 'garden', 'cosplay', 'miniature',
+        'articulated', 'customizable', 'storage', 'desk', 'game', 'replacement_part', 'phone', 'ender3', 'prusa']
+CATEGORIES = ['Games', 'Toys', 'Household', 'Tools', 'Art', 'Fashion', 'Gadgets', 'Learning', 'Hobby', '3D Printing']
+LICENSES = ['Creative Commons - Attribution', 'Creative Commons - Attribution - Non-Commercial',
+            'Creative Commons - Attribution - Share Alike', 'GNU - GPL', 'Public Domain']
+PRINTERS = [('Creality', 'Ender 3'), ('Prusa', 'i3 MK3S'), ('Anycubic', 'i3 Mega'), ('Artillery', 'Sidewinder X1')]
+TITLES = ['Designer', 'Maker', 'Engineer', 'Artist', 'Educator', 'Hobbyist']
+SKILLS = ['Novice', 'Intermediate', 'Expert']
+
+# First thing id of the explore pages, things of page p are FIRST_THING_ID + (p - 1) * THINGS_PER_PAGE + i
+FIRST_THING_ID = 4700000
+
+
+def _rng(kind, key):
+    """
+    Returns a random generator seeded by an entity, so every page is the same on every request and run.
+    """
+    return random.Random('{}:{}'.format(kind, key))
+
+
+def _date(rng):
+    return datetime.datetime(2019, 1, 1) + datetime.timedelta(days=rng.randint(0, 900), seconds=rng.randint(0, 86399))
+
+
+def _card(href, likes, class_name=gconf.ExploreList.THING_CARD):
+    """
+    A thing card as in explore, makes and remixes lists.
+    """
+    return ('<div class="{}"><a class="{}" href="{}">card</a>'
+            '<span class="{like}">&#9829;</span><span class="{like}">{}</span></div>'
+            .format(class_name, gconf.ExploreList.CARD_BODY, href, likes, like=gconf.ExploreList.THING_LIKES))
+
+
+def _page(title, body):
+    return '<!DOCTYPE html><html><head><meta charset="utf-8"><title>{}</title></head><body>{}</body></html>' \
+        .format(escape(title), body)
+
+
+def thing_model(thing_id):
+    """
+    Returns the properties of the synthetic thing of given id (the ones its page shows).
+    """
+    rng = _rng('thing', thing_id)
+    printer = rng.choice(PRINTERS)
+    return {'thing_id': str(thing_id),
+            'model_name': ' '.join(rng.choice(MODEL_WORDS) for _ in range(rng.randint(1, 4))).title(),
+            'username': 'maker{}'.format(rng.randint(1, 400)),
+            'uploaded': _date(rng),
+            'thing_files': rng.randint(1, 12),
+            'comments': rng.randint(0, 30),
+            'makes': min(rng.randint(0, 8), 6),
+            'remixes': rng.choice([0, 0, 0, 1, 2, 3]),
+            'likes': int(rng.paretovariate(1.2) * 10),
+            'tags': rng.sample(TAGS, rng.randint(0, 6)),
+            'print_settings': None if rng.random() < 0.3 else {
+                'Printer Brand': printer[0], 'Printer Model': printer[1], 'Rafts': rng.choice(['Yes', 'No']),
+                'Supports': rng.choice(['Yes', 'No', "Doesn't Matter"]), 'Resolution': rng.choice(['0.1', '0.2']),
+                'Infill': rng.choice(['15%', '20%', '100%']), 'Filament Material': 'PLA'},
+            'license': rng.choice(LICENSES),
+            'remix': str(int(thing_id) - rng.randint(1, 5000)) if rng.random() < 0.2 else None,
+            'category': rng.choice(CATEGORIES)}
+
+
+def render_explore(page):
+    rng = _rng('explore', page)
+    first = FIRST_THING_ID + (page - 1) * gconf.THINGS_PER_PAGE
+    cards = ''.join(_card('{}thing:{}'.format(gconf.MAIN_URL, thing_id), rng.randint(0, 5000))
+                    for thing_id in range(first, first + gconf.THINGS_PER_PAGE))
+    return _page('Explore', '<div class="SearchResult">{}</div>'.format(cards))
+
+
+def render_thing(thing_id):
+    thing = thing_model(thing_id)
+    tabs = [('Thing Details', ''), ('Thing Files', thing['thing_files']), ('Comments', thing['comments']),
+            ('Makes', thing['makes']), ('Remixes', thing['remixes']), ('Apps', '')]
+    body = ['<h1 class="{}">{}</h1>'.format(gconf.ThingSettings.MODEL_NAME, escape(thing['model_name'])),
+            '<div class="{}">by <a href="{}">{user}</a> {}</div>'.format(
+                gconf.ThingSettings.CREATED_BY, gconf.UserSettings.BASE_URL.format(thing['username']),
+                thing['uploaded'].strftime('%B %d, %Y').replace(' 0', ' '), user=thing['username']),
+            '<div class="MetricButton__tabs">{}</div>'.format(''.join(
+                '<div class="{}"><div class="{}">{}</div><div class="{}">{}</div></div>'.format(
+                    gconf.ThingSettings.TAB_BUTTON, gconf.ThingSettings.TAB_TITLE, title,
+                    gconf.ThingSettings.METRIC, value) for title, value in tabs))]
+    if thing['tags']:
+        body.append('<div class="{}">{}</div>'.format(gconf.ThingSettings.TAG_LIST, ''.join(
+            '<a class="{}">{}</a>'.format(gconf.ThingSettings.TAG_SINGLE, tag) for tag in thing['tags'])))
+    if thing['print_settings']:
+        body.append('<div><div class="{}">Print Settings</div>{}</div>'.format(
+            gconf.ThingSettings.BLOCK_TITLE, ''.join(
+                '<div class="{}"><div>{}:</div><div>{}</div></div>'.format(
+                    gconf.ThingSettings.PRINT_SETTING, name, value)
+                for name, value in thing['print_settings'].items())))
+    body.append('<a class="License__link--NFT8l" href="#license">{}</a>'.format(thing['license']))
+    if thing['remix']:
+        body.append('<div><div class="{}">Remixed from</div><a class="{}" href="{}">source</a></div>'.format(
+            gconf.ThingSettings.REMIX_SECTION, gconf.ThingSettings.REMIX_CARD,
+            gconf.ThingSettings.BASE_URL.format(thing['remix'])))
+    body.append('<div><div class="{}">More from</div><a class="{}">{}</a></div>'.format(
+        gconf.ThingSettings.CATEGORY_SECTION, gconf.ThingSettings.CATEGORY_NAME, thing['category']))
+
+    # remixes are listed on the thing page, as after clicking its remixes tab
+    rng = _rng('remixes', thing_id)
+    body.append('<div class="RemixesList">{}</div>'.format(''.join(
+        _card(gconf.ThingSettings.BASE_URL.format(int(thing_id) * 100 + i), rng.randint(0, 300))
+        for i in range(thing['remixes']))))
+    return _page(thing['model_name'], ''.join(body))
+
+
+def render_thing_makes(thing_id):
+    rng = _rng('makes', thing_id)
+    cards = ''.join(_card(gconf.MakeSettings.BASE_URL.format(int(thing_id) * 10 + i), rng.randint(0, 50))
+                    for i in range(thing_model(thing_id)['makes']))
+    return _page('Makes', '<div class="MakesList">{}</div>'.format(cards))
+
+
+def render_make(make_id):
+    rng = _rng('make', make_id)
+    username = 'maker{}'.format(rng.randint(1, 400))
+    printer = rng.choice(PRINTERS)
+    interactions = ''.join('<a title="{}">{}</a>'.format(title, rng.randint(0, 40))
+                           for title in ('Like', 'Comments', 'Share'))
+    body = ['<a class="{}" href="{}">source</a>'.format(gconf.MakeSettings.SOURCE,
+                                                       gconf.ThingSettings.BASE_URL.format(int(make_id) // 10)),
+            '<div class="{}"><span>Made by <a href="{}">{}</a> <time datetime="{} UTC">ago</time></span></div>'.format(
+                gconf.MakeSettings.PAGE_INFO, gconf.UserSettings.BASE_URL.format(username), username,
+                _date(rng).strftime('%Y-%m-%d %H:%M:%S')),
+            '<div class="item-list-interactions" data-make-id="{}">{}</div>'.format(make_id, interactions),
+            '<div><h2 class="section-header">Make Info</h2><div class="{}">{} Views</div>'
+            '<div class="{}">Found in {}</div></div>'.format(gconf.MakeSettings.VIEWS, rng.randint(10, 5000),
+                                                             gconf.MakeSettings.CATEGORY, rng.choice(CATEGORIES)),
+            '<div class="{}"><div>Printer Brand:</div><div>{}</div><div>Printer:</div><div>{}</div>'
+            '<div>Rafts:</div><div>{}</div><div>Supports:</div><div>{}</div>'
+            '<div>Resolution:</div><div>0.2 mm</div><div>Infill:</div><div>20%</div>'
+            '<div>Filament: Generic PLA</div></div>'.format(gconf.MakeSettings.INFO_CONTENT, printer[0], printer[1],
+                                                        rng.choice(['Yes', 'No']), rng.choice(['Yes', 'No']))]
+    return _page('Make', ''.join(body))
+
+
+def render_user(username):
+    rng = _rng('user', username)
+    actions = ''.join('<div class="{}"><span class="{}">{}</span><span class="{}">{}</span></div>'.format(
+        gconf.UserSettings.PROFILE_ACTION_ITEM, gconf.UserSettings.PROFILE_ACTION_COUNT, rng.randint(0, 3000),
+        gconf.UserSettings.PROFILE_ACTION_LABEL, label.title())
+        for label in gconf.UserSettings.PROFILE_ACTION_POSSIBLE_LABELS)
+    tabs = ''.join('<div class="{}"><div class="{}">{}</div><div class="{}">{}</div></div>'.format(
+        gconf.UserSettings.TAB_BUTTON, gconf.UserSettings.TAB_TITLE, label.title(),
+        gconf.UserSettings.TAB_METRIC, rng.randint(0, 500)) for label in gconf.UserSettings.TAB_POSSIBLE_LABELS)
+    titles = ''.join('<div>{}</div>'.format(title) for title in rng.sample(TITLES, rng.randint(1, 3)))
+    body = [actions, tabs,
+            '<div class="{}">{}</div>'.format(gconf.UserSettings.ABOUT_WIDGET_TITLE, titles),
+            '<div class="{}">{}</div>'.format(gconf.UserSettings.ABOUT_WIDGET_SKILL, rng.choice(SKILLS))]
+    return _page(username, ''.join(body))
+
+
+def render(path):
+    """
+    Returns the synthetic page of given url path (and query), or None if no such page exists.
+    """
+    parts = urlsplit(path)
+    route = parts.path.strip('/')
+
+    if route == 'search':
+        query = dict(item.split('=', 1) for item in parts.query.split('&') if '=' in item)
+        return render_explore(int(query.get('page', 1)))
+    if route.startswith('thing:'):
+        thing_id, _, tab = route[len('thing:'):].partition('/')
+        if not thing_id.isdigit():
+            return None
+        return render_thing_makes(thing_id) if tab == 'makes' else render_thing(thing_id)
+    if route.startswith('make:') and route[len('make:'):].isdigit():
+        return render_make(route[len('make:'):])
+    if route.endswith('/designs') and route.count('/') == 1:
+        return render_user(route.split('/')[0])
+    return None
+
+
+def site_pages(base_url=None):
+    """
+    Returns a function giving the synthetic page of a full url of the site at base_url (None if there is no such
+    page), to serve pages in-process (see fake_browser.FakeDriver).
+    :param base_url: url of the site. Default: the scraper's url (gconf.MAIN_URL).
+    """
+    base_url = gconf.MAIN_URL if base_url is None else base_url
+
+    def pages(url):
+        return render('/' + url[len(base_url):].lstrip('/')) if url.startswith(base_url) else None
+    return pages
+
+
+class _SiteHandler(BaseHTTPRequestHandler):
+    pages_dir = None
+
+    def do_GET(self):
+        page = None
+        if self.pages_dir is not None:
+            file_path = os.path.join(self.pages_dir, page_file_name(self.path))
+            if os.path.exists(file_path):
+                with open(file_path, 'r', encoding='utf-8') as file:
+                    page = file.read()
+        if page is None:
+            page = render(self.path)
+
+        body = (page or _page('Not found', 'Page not found')).encode()
+        self.send_response(200 if page is not None else 404)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeThingiverse:
+    """
+    Serves the fake Thingiverse from a background thread on a local port.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, pages_dir=None):
+        """
+        :param port: port to listen on. Default: any free port.
+        :param pages_dir: directory of recorded pages (see recording.PageRecorder), served instead of synthetic pages.
+        """
+        handler = type('SiteHandler', (_SiteHandler,), {'pages_dir': pages_dir})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.url = 'http://{}:{}/'.format(host, self.server.server_port)
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, name='FakeThingiverse', daemon=True).start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def use_site(base_url):
+    """
+    Point the scraper's urls (general_config) at another site, e.g. FakeThingiverse.url.
+    """
+    old_url = gconf.MAIN_URL
+    for settings, names in ((gconf, ['MAIN_URL']),
+                            (gconf.ThingSettings, ['BASE_URL', 'MAKES_URL', 'REMIXES_URL']),
+                            (gconf.MakeSettings, ['BASE_URL']),
+                            (gconf.UserSettings, ['BASE_URL', 'MAKES_URL'])):
+        for name in names:
+            setattr(settings, name, getattr(settings, name).replace(old_url, base_url))
@@ -61,6 +61,9 @@ def set_parser_args(parser):
     parser.add_argument('-D', '--Driver', help='Driver path (for salenium)',
                         type=str, default=pconf.driver_path)
     parser.add_argument('-J', '--save-json', help='save a copy of results as a json file', action='store_true')
+    parser.add_argument('--delta-base', type=str, default=None,
+                        help='with --save-json, save only what changed relative to this base snapshot file '
+                             '(full or delta). Delta files can be given to --load-json like full ones.')
     parser.add_argument('-S', '--pre-search', type=int, default=0,
                         help='When scraping for a non-thing type object can first scrape for things, and then scrape '
                              'for data based on result. Please provide number of pages to scrape')
@@ -82,6 +85,50 @@ def set_parser_long_args(parser):
     parser.add_argument('--google-app-name', help='google developer code used to access google APIs',
                         type=str, default=pconf.google_ktree_API_key)
 
+    parser.add_argument('--background-api', action='store_true',
+                        help='enrich scraped things with APIs in the background while scraping, '
+                             'instead of in the API action')
+
+    parser.add_argument('--metrics-file', type=str, default=None,
+                        help='write timing and throughput metrics of the run to this file, in prometheus text format')
+
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help='serve timing and throughput metrics in prometheus text format on this local port '
+                             'while running')
+
+    parser.add_argument('--count-roundtrips', action='store_true',
+                        help='count WebDriver calls and their latency per scraping step and entity, '
+                             'and report the most expensive ones at the end of the run')
+
+    parser.add_argument('--profile', type=str, default=None, metavar='DIR',
+                        help='profile the run with cProfile: a profile file per action (and JSON save, database build) '
+                             'and main.prof for the whole run are written to DIR')
+
+    parser.add_argument('--profile-interval', type=float, default=None, metavar='SECONDS',
+                        help='with --profile, also sample the call stack every SECONDS (e.g. {}) into '
+                             'DIR/stacks.folded, for flame graphs of long runs'.format(gconf.Profiling.SAMPLE_INTERVAL))
+
+    parser.add_argument('--profile-memory', action='store_true',
+                        help='with --profile, trace memory allocations and report the top ones in DIR/memory.txt')
+
+    parser.add_argument('--record', type=str, default=None, metavar='DIR',
+                        help='record every page opened by the browser into DIR (one html file per url, as loaded '
+                             'after scrolls and clicks), to replay the crawl later with --replay')
+
+    parser.add_argument('--replay', type=str, default=None, metavar='DIR',
+                        help='replay pages recorded with --record in DIR instead of opening a browser: the same '
+                             'crawl runs offline, on identical input (pages that were not recorded are not found)')
+
+    parser.add_argument('--log-format', type=str, choices=['text', 'json'], default='text',
+                        help='format of the log file: text, or json (a JSON object per line, '
+                             'to be parsed by log tools)')
+
+    parser.add_argument('--recycle-after', type=int, default=gconf.Browser.RECYCLE_AFTER, metavar='PAGES',
+                        help='restart the browser after this number of page navigations, to release its memory '
+                             '(0: never)')
+    parser.add_argument('--max-browser-memory', type=int, default=gconf.Browser.MAX_MEMORY_MB, metavar='MB',
+                        help='restart the browser when its processes use more memory than this (0: no limit)')
+
     parser.add_argument('--headless', help='runs the scraper in headless mode (no visible browser)',
                         action='store_true')
 
@@ -93,8 +140,20 @@ def set_parser_long_args(parser):
                                                  "specified in Database/config.py or modified with tags",
                         action='store_true')
 
+    parser.add_argument('--db-backend', type=str, choices=gconf.DB_builder.BACKENDS, default='mysql',
+                        help="Database backend: a MySQL server (see MySQL arguments) or a local SQLite database file "
+                             "named after the database.")
+
     parser.add_argument('--reset-database', help="If indicated, previously created database will be dropped first.",
                         action='store_true')
+
+    parser.add_argument('--write-through', help="If indicated, scraped items are written to the database in batches "
+                                                "while scraping, by a background writer.",
+                        action='store_true')
+
+    parser.add_argument('--bulk-load', help="If indicated with --reset-database, tables are staged as files and "
+                                            "loaded with LOAD DATA LOCAL INFILE. Much faster for large snapshots.",
+                        action='store_true')
     # parser.add_argument('-S', '--save-to-db', action='store_true',
     #                     help='save results in mySQL database (not implemented yet)')
     return parser
@@ -135,4 +194,8 @@ def set_mysql_args(parser):
                         help='set the username of the mySQL server')
     parser.add_argument('--mysql-password', type=str, default=dbconf.MYSQL_PASSWORD,
                         help='set the password of the mySQL server')
+    parser.add_argument('--db-connections', type=int, default=gconf.DB_builder.CONNECTIONS,
+                        help='number of connections used to load the database in parallel')
+    parser.add_argument('--db-chunk-size', type=int, default=gconf.DB_builder.COMMIT_CHUNK_SIZE,
+                        help='number of items committed together in a single database transaction')
     return parser
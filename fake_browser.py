@@ -0,0 +1,283 @@
+import functools
+import logging
+from urllib.parse import urljoin
+
+from lxml import html
+from lxml import etree
+from lxml.etree import XPath, tostring
+from selenium.webdriver.common.by import By
+from selenium.webdriver.remote.webelement import WebElement
+from selenium.common.exceptions import NoSuchElementException, TimeoutException
+
+import general_config as gconf
+from ThingScraper import Browser
+from roundtrips import RoundTripStats
+
+# Define new logger
+logger = logging.getLogger(gconf.Logs.LOGGER_NAME)
+
+# Tags rendered on their own lines in an element's visible text
+BLOCK_TAGS = {'address', 'article', 'aside', 'blockquote', 'dd', 'div', 'dl', 'dt', 'fieldset', 'figcaption',
+              'figure', 'footer', 'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hr', 'li', 'main', 'nav',
+              'ol', 'p', 'pre', 'section', 'table', 'tr', 'ul'}
+HIDDEN_TAGS = {'script', 'style', 'template', 'head', 'title', 'meta'}
+
+NOT_FOUND_PAGE = '<html><head><title>Not found</title></head><body></body></html>'
+
+
+@functools.lru_cache(maxsize=1024)
+def _xpath(by, value):
+    """
+    Returns the compiled (relative) xpath of a selenium locator. Locators are compiled once, as scraping repeats them.
+    """
+    if by == By.XPATH:
+        return XPath(value)
+    if by == By.CLASS_NAME:
+        return XPath(".//*[contains(concat(' ', normalize-space(@class), ' '), ' {} ')]".format(value))
+    if by == By.TAG_NAME:
+        return XPath('.//{}'.format(value))
+    if by == By.ID:
+        return XPath(".//*[@id='{}']".format(value))
+    if by == By.NAME:
+        return XPath(".//*[@name='{}']".format(value))
+    if by == By.LINK_TEXT:
+        return XPath(".//a[normalize-space(.)='{}']".format(value))
+    raise NotImplementedError("Locating elements by {} is not supported by the fake driver".format(by))
+
+
+def visible_text(element):
+    """
+    Returns the text of an lxml element as a browser renders it: block elements on their own lines,
+    whitespace collapsed and empty lines dropped (as WebElement.text).
+    """
+    lines = ['']
+
+    def walk(node):
+        if not isinstance(node.tag, str) or node.tag in HIDDEN_TAGS:
+            return
+        block = node.tag in BLOCK_TAGS
+        if block:
+            lines.append('')
+        if node.text:
+            lines[-1] += node.text
+        for child in node:
+            walk(child)
+            if child.tag == 'br':
+                lines.append('')
+            if child.tail:
+                lines[-1] += child.tail
+        if block:
+            lines.append('')
+
+    walk(element)
+    return '\n'.join(text for text in (' '.join(line.split()) for line in lines) if text)
+
+
+class _Searchable:
+    """
+    find_element(s) methods of the fake driver and elements, over an lxml tree.
+    """
+
+    def _root(self):
+        raise NotImplementedError
+
+    def _driver(self):
+        raise NotImplementedError
+
+    def _nodes(self, by, value):
+        """
+        Returns the lxml elements found by a selenium locator, in document order.
+        """
+        root = self._root()
+        if root is None:
+            return []
+        if by == By.CLASS_NAME:
+            return [node for node in root.iterdescendants() if value in (node.get('class') or '').split()]
+        return [node for node in _xpath(by, value)(root) if isinstance(node, html.HtmlElement)]
+
+    def find_elements(self, by=By.ID, value=None):
+        return [FakeElement(node, self._driver()) for node in self._nodes(by, value)]
+
+    def find_element(self, by=By.ID, value=None):
+        elements = self.find_elements(by, value)
+        if not elements:
+            raise NoSuchElementException("Unable to locate element: {}={}".format(by, value))
+        return elements[0]
+
+    def find_element_by_xpath(self, xpath):
+        return self.find_element(By.XPATH, xpath)
+
+    def find_elements_by_xpath(self, xpath):
+        return self.find_elements(By.XPATH, xpath)
+
+    def find_element_by_class_name(self, name):
+        return self.find_element(By.CLASS_NAME, name)
+
+    def find_elements_by_class_name(self, name):
+        return self.find_elements(By.CLASS_NAME, name)
+
+    def find_element_by_tag_name(self, name):
+        return self.find_element(By.TAG_NAME, name)
+
+    def find_elements_by_tag_name(self, name):
+        return self.find_elements(By.TAG_NAME, name)
+
+    def find_element_by_id(self, id_):
+        return self.find_element(By.ID, id_)
+
+
+class FakeElement(_Searchable, WebElement):
+    """
+    A WebElement over an lxml element of the fake driver's current page.
+    """
+
+    def __init__(self, node, driver):
+        self._node = node
+        self._parent = driver
+        self._id = id(node)
+        self._w3c = True
+
+    def _root(self):
+        return self._node
+
+    def _driver(self):
+        return self._parent
+
+    @property
+    def tag_name(self):
+        return self._node.tag
+
+    @property
+    def text(self):
+        return visible_text(self._node)
+
+    def get_attribute(self, name):
+        """
+        Returns the element's property or attribute as WebElement.get_attribute does (urls are absolute).
+        """
+        if name == 'innerHTML':
+            return (self._node.text or '') + ''.join(tostring(child, encoding=str, method='html')
+                                                     for child in self._node)
+        if name == 'outerHTML':
+            return tostring(self._node, encoding=str, method='html', with_tail=False)
+        if name in ('text', 'textContent'):
+            return self._node.text_content()
+        value = self._node.get(name)
+        if value is not None and name in ('href', 'src'):
+            return urljoin(self.parent.current_url or '', value)
+        return value
+
+    def is_displayed(self):
+        return True
+
+    def click(self):
+        pass
+
+    def __eq__(self, other):
+        return isinstance(other, FakeElement) and self._node is other._node
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self._node)
+
+
+class FakeDriver(_Searchable):
+    """
+    An in-process WebDriver over static html pages, parsed with lxml. Scripts are not run.
+    """
+
+    def __init__(self, pages):
+        """
+        :param pages: dict of url -> html, or a function returning the html of a url (None if there is no such page)
+        """
+        self.pages = pages
+        self.current_url = None
+        self.page_source = None
+        self._document = None
+        self._classes = None
+        self.navigations = 0
+
+    def _root(self):
+        return self._document
+
+    def _driver(self):
+        return self
+
+    def _nodes(self, by, value):
+        if by != By.CLASS_NAME or self._document is None:
+            return super()._nodes(by, value)
+        # pages are static: searches by class name (most of the scraper's) are served from an index of the page
+        if self._classes is None:
+            self._classes = {}
+            for node in self._document.iter(tag=etree.Element):
+                for class_name in (node.get('class') or '').split():
+                    self._classes.setdefault(class_name, []).append(node)
+        return self._classes.get(value, [])
+
+    def get(self, url):
+        page = self.pages.get(url) if isinstance(self.pages, dict) else self.pages(url)
+        self.current_url = url
+        self.page_source = NOT_FOUND_PAGE if page is None else page
+        self._document = html.document_fromstring(self.page_source)
+        self._classes = None
+        self.navigations += 1
+
+    @property
+    def title(self):
+        return self._document.findtext('.//title') if self._document is not None else ''
+
+    def execute_script(self, script, *args):
+        return None
+
+    def close(self):
+        self._document = None
+        self._classes = None
+
+    def quit(self):
+        self.close()
+
+
+class FakeBrowser(Browser):
+    """
+    A Browser over the fake driver: the page is static, so waiting for an element is a single lookup.
+
+    Usage:
+        browser = FakeBrowser({thing.url: page_html})
+        thing.fetch_all(browser)
+        thing.parse_all()
+
+        # replay of recorded pages (see recording.PageRecorder)
+        browser = FakeBrowser(RecordedPages('recordings'))
+    """
+
+    def __init__(self, pages, count_roundtrips=False, recycle_after=0):
+        """
+        :param pages: dict of url -> html, or a function returning the html of a url (see FakeDriver)
+        :param count_roundtrips: if true, driver calls are counted in FakeBrowser.roundtrips
+        :param recycle_after: number of page navigations after which the fake driver is restarted, 0 to never
+        """
+        self.name = 'fake'
+        self.driver_path = None
+        self.pages = pages
+        self.roundtrips = RoundTripStats() if count_roundtrips else None
+        self.recorder = None
+        self.recycle_after = recycle_after
+        self.max_memory = 0
+        self.restarts = 0
+        self.driver = None
+        self.start()
+
+    def _new_driver(self):
+        """
+        Returns a new fake driver over the pages (see Browser.start).
+        """
+        return FakeDriver(self.pages)
+
+    def wait(self, by, name, timeout=None, regex=False, find_all=False):
+        """
+        Raise TimeoutException at once if the element is not in the page (see Browser.wait).
+        """
+        if not self.driver.find_elements(by, name):
+            raise TimeoutException("Element {}={} is not in the page".format(by, name))
@@ -34,6 +34,7 @@ class UserSettings:
         LIKES = 'likes'
         TITLES = 'titles'
         SKILL_LEVEL = 'skill_level'
+        SCRAPED_AT = 'scraped_at'
 
 
     # Urls
@@ -80,6 +81,7 @@ class MakeSettings:
         VIEWS = 'views'
         CATEGORY = 'category'
         PRINT_SETTINGS = 'print_settings'
+        SCRAPED_AT = 'scraped_at'
 
     BASE_URL = "https://www.thingiverse.com/make:{}"
     ID_REGEX = r"make:(\d*)"
@@ -137,6 +139,7 @@ class ThingSettings:
         CATEGORY = 'category'
         LIKES = 'likes'
         PRINT_SETTINGS = 'print_settings'
+        SCRAPED_AT = 'scraped_at'
 
     BASE_URL = r"https://www.thingiverse.com/thing:{}"
     MAKES_URL = BASE_URL + r'/makes'
@@ -192,6 +195,8 @@ class Logs:
     LEVEL_GENERAL = 'DEBUG'
     LEVEL_LOG = 'INFO'
     NAME_LOG = 'thingscraper'
+    EXTENSION = '.log'
+    EXTENSION_JSON = '.jsonl'  # Extension of log files in JSON format (a JSON object per line)
     LOG_DIR = 'Logs'
     LOGGER_NAME = 'thingscraper'
 
@@ -205,6 +210,63 @@ class DB_builder:
     DB_NAME = 'thingiverse'
     DB_DIR = 'Database'
     SQL_CONSTRUCTION = "thingiverse.sql"
+    SQLITE_CONSTRUCTION = "thingiverse_sqlite.sql"
+    SQLITE_EXTENSION = '.db'  # Added to the database name to get the SQLite database file path
+    SQLITE_TIMEOUT = 60  # Seconds a SQLite connection waits for the database to be unlocked
+    BACKENDS = ('mysql', 'sqlite')
+    BATCH_SIZE = 1000  # Maximum number of rows sent in a single bulk statement
+    COMMIT_CHUNK_SIZE = 5000  # Number of items committed together in a single transaction by build_database
+    CONNECTIONS = 4  # Number of connections used by build_database to load independent chunks in parallel
+    CHUNK_RETRIES = 3  # Number of attempts to load a chunk before build_database fails (deadlocks, lost connections)
+    SINK_BATCH_SIZE = 200  # Number of scraped items written together by the write-through database sink
+    SINK_FLUSH_INTERVAL = 30  # Maximum seconds a scraped item waits in the database sink before being written
+    SINK_MAX_ORPHANS = 10000  # Maximum number of makes waiting in the database sink for their thing to be written
+
+
+class Snapshots:
+    DATA_TYPES = ('things', 'users', 'makes')
+    DELTA_KEY = 'delta'  # Marks a delta snapshot, holds the path of its base snapshot (relative to the delta file)
+    BASE_KEY = 'base'
+    ADDED = 'added'  # Entities that are new in the snapshot, with all their properties
+    REMOVED = 'removed'  # Keys of entities that are not in the snapshot anymore
+    CHANGED = 'changed'  # Entities with changed properties: only the changed ('set') and dropped ('unset') properties
+    SET = 'set'
+    UNSET = 'unset'
+    # Snapshot file formats by file extension. jsonl and binary files hold one (data type, key, properties) record
+    # per line / pickled entry, so they can be read and written as a stream
+    FORMATS = {'.json': 'json', '.jsonl': 'jsonl', '.snap': 'binary'}
+    BINARY_HEADER = b'THINGSNAP1\n'
+    MERGE_RUN_SIZE = 50000  # Number of records sorted in memory at once when merging snapshots
+    MERGE_FAN_IN = 64  # Maximum number of sorted run files merged at once
+
+
+class Metrics:
+    PREFIX = 'thingscraper_'  # Prefix of exported metric names
+    # Upper bounds (seconds) of latency histogram buckets, an infinite bucket is always added
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+    HTTP_HOST = '127.0.0.1'  # Interface the metrics endpoint listens on
+
+
+class Browser:
+    RECYCLE_AFTER = 500  # Number of page navigations after which the browser is restarted (0: never)
+    MAX_MEMORY_MB = 2048  # Memory of the browser processes (MB) above which the browser is restarted (0: no limit)
+    MEMORY_CHECK_INTERVAL = 20  # Number of page navigations between checks of the browser's memory
+
+
+class RoundTrips:
+    REPORT_TOP = 15  # Number of scraping steps and entities listed in the WebDriver round trips report
+
+
+class Progress:
+    REFRESH_INTERVAL = 0.5  # Minimum seconds between updates of the status line on a terminal
+    LOG_INTERVAL = 30  # Minimum seconds between progress log lines, when not on a terminal
+    RATE_WINDOW = 50  # Number of last entities the rolling entities/sec is computed over
+
+
+class Profiling:
+    SAMPLE_INTERVAL = 0.05  # Default number of seconds between stack samples
+    MEMORY_FRAMES = 10  # Number of frames kept for every traced memory allocation
+    REPORT_TOP = 25  # Number of functions and allocations listed in profiling reports
 
 
 class google_ktree:
@@ -212,6 +274,15 @@ class google_ktree:
     main_list_identifier = 'itemListElement'
     res_identifier = 'EntitySearchResult'
     final_id = 'ktree_data'
+    WORKERS = 8  # Maximum number of concurrent knowledge graph queries
+    TIMEOUT = 10  # Seconds to wait for a knowledge graph response
+    CACHE_DIR = 'Cache'  # Directory of on-disk caches, created next to the Logs directory when first saved
+    CACHE_PATH = CACHE_DIR + '/ktree_cache.json'  # On-disk cache of knowledge graph responses, by query
+    CACHE_TTL = 30 * 24 * 60 * 60  # Seconds a cached response is used before its query is sent again
+    fetched_id = 'ktree_fetched_at'  # Time a thing was last enriched, ISO8601
+    STALE_AFTER = 90 * 24 * 60 * 60  # Seconds after which an enriched thing is enriched again
+    BATCH_SIZE = 50  # Number of things the background enricher queries together
+    FLUSH_INTERVAL = 10  # Maximum number of seconds a thing waits in the background enricher
 
     class Tags:
         scheme_type = "@type"
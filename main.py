@@ -1,15 +1,24 @@
+import sys
 import json
-
-from selenium.webdriver.common.by import By
+import queue
+import datetime
+import contextlib
+import logging.handlers
 
 import cli
 import APIs
+import metrics
+import profiling
+import progress
+import snapshots
+import recording
 import general_config as gconf
 import personal_config
-from ThingScraper import Browser, Thing, User, Make
+from ThingScraper import Browser, By, Thing, User, Make
 import os
 import logging
 from Database.build_db import build_database
+from Database.db_sink import DatabaseSink
 
 # Define new logger
 logger = logging.getLogger(gconf.Logs.LOGGER_NAME)
@@ -61,19 +70,23 @@ def parse_explore_url(sort_='p', page=1):
     return base_url
 
 
-def save_json(file_path, things_dict):
+def save_json(file_path, things_dict, base_path=None):
     """
     Saves the file
     :param file_path: where to save the file (includes name)
     :param things_dict: A dictionary where the key is the id, and the value is a Thing object
+    :param base_path: if given, only the changes relative to this (full or delta) snapshot file are saved
     :return: (bool) True if saved successfully
     """
     state = False
     try:
-        with open(file_path, 'w') as file:
-            logger.debug("beginning save: opened save file")
-            data = parse_json_from_data(things_dict)
-            json.dump(data, file)
+        if base_path is not None:
+            snapshots.write_delta(file_path, parse_json_from_data(things_dict), base_path)
+        else:
+            with open(file_path, 'w') as file:
+                logger.debug("beginning save: opened save file")
+                data = parse_json_from_data(things_dict)
+                json.dump(data, file)
     except Exception as E:
         logger.exception(f"Could not save the file:\n{type(E)}: {E}")
     else:
@@ -91,14 +104,13 @@ def parse_json_from_data(data):
 
 def load_json(file_path):
     """
-    Opens saved file
+    Opens saved file. Delta snapshots are rebuilt on top of their base snapshots.
     :param file_path: where to save the file (includes name)
     :return: A dict where the key is a thing id, and the value is a Thing object
     """
     res = data_format.copy()
     try:
-        with open(file_path, 'r') as file:
-            data = json.load(file)
+        data = snapshots.read_snapshot(file_path)
     except FileNotFoundError as E:
         logger.exception(f"File {file_path} not found:\n{E}")
     except Exception as E:
@@ -111,6 +123,53 @@ def load_json(file_path):
         return res
 
 
+def push_scraped(settings, data_type, key, item):
+    """
+    Hand a scraped item to the background stages used in this run: the database sink and the API enricher
+    :param settings: A dict containing settings
+    :param data_type: things, users or makes
+    :param key: the item id in data
+    :param item: scraped Thing, User or Make object
+    :return: None
+    """
+    if settings.get('db_sink') is not None:
+        settings['db_sink'].push(data_type, key, item.properties)
+    if data_type == 'things' and settings.get('enricher') is not None:
+        settings['enricher'].submit(key, item)
+
+
+def log_scraped(settings, item):
+    """
+    In verbose mode (volume 40), log the full information of a scraped item (see ScrapedData.info).
+    The information is only built if the log is emitted.
+    """
+    if settings['volume'] >= 40 and logger.isEnabledFor(logging.DEBUG):
+        logger.debug("%s", item.info())
+
+
+def progress_of(settings, action, total):
+    """
+    Returns the progress report of a scraping loop (see progress.Progress): a status line updated in place on a
+    terminal, unless debug messages are printed (volume 30 and up), otherwise periodic log lines.
+    :param settings: A dict containing settings
+    :param action: name of the loop
+    :param total: number of entities the loop goes over
+    """
+    return progress.Progress(action, total, tty=sys.stderr.isatty() and settings.get('volume', 0) < 30)
+
+
+def profiled(settings, phase):
+    """
+    Profile a phase of the run into its own profile file, if profiling is enabled (see --profile)
+    :param settings: A dict containing settings
+    :param phase: name of the phase, used in the profile file name
+    :return: context manager
+    """
+    if settings.get('profiler') is None:
+        return contextlib.nullcontext()
+    return settings['profiler'].phase(phase)
+
+
 def scraper_search(browser, pages_to_scan=personal_config.PAGES_TO_SCAN, **kwargs):
     """
     Scans the top pages of the last month, and returns a dictionary of the projects
@@ -126,7 +185,7 @@ def scraper_search(browser, pages_to_scan=personal_config.PAGES_TO_SCAN, **kwarg
         projects = []
         while len(projects) < gconf.THINGS_PER_PAGE:
             projects = browser.wait_and_find(By.CLASS_NAME, gconf.ExploreList.THING_CARD, find_all=True)
-        logger.debug(f"Found {len(projects)} projects on page {i + 1}")
+        logger.debug("Found %d projects on page %d", len(projects), i + 1)
         for item in projects:
             item_id = item.find_element_by_class_name(gconf.ExploreList.CARD_BODY).get_attribute("href")
             item_id = item_id.rsplit(':', 1)[1]
@@ -137,6 +196,32 @@ def scraper_search(browser, pages_to_scan=personal_config.PAGES_TO_SCAN, **kwarg
     return dict(data)
 
 
+def fetch_and_parse(item, browser):
+    """
+    Fetch and parse a single scraped item (Thing, User or Make) with browser.
+    """
+    item.set_browser(browser)
+    item.fetch_all()
+    item.parse_all()
+
+
+def retry_on_dead_browser(settings, function, *args, **kwargs):
+    """
+    Call function, scraping a single entity with the browser of the run. If it fails because the browser session
+    died (crashed browser or driver), the browser is restarted and function is called again, so only the in-flight
+    entity is scraped again instead of every later one failing.
+    :param settings: A dict containing settings
+    :return: the result of function
+    """
+    try:
+        return function(*args, **kwargs)
+    except Exception as E:
+        if not settings['browser_obj'].recover():
+            raise
+        logger.warning("Browser session died (%s), scraping the entity again with a new session", type(E).__name__)
+        return function(*args, **kwargs)
+
+
 def scrape_main_page(settings, data=None):
     """
     Scrape main page for
@@ -151,19 +236,23 @@ def scrape_main_page(settings, data=None):
     data_to_scrape = scraper_search(browser, num_runs, sort_=settings['sort'])
     failed = []
     i = 0
-    for key in data_to_scrape:
-        i += 1
-        try:
-            data_to_scrape[key].fetch_all(browser)
-            data_to_scrape[key].parse_all()
-            data['things'][key] = data_to_scrape[key]
-        except Exception as E:
-            failed.append((key, E))
-            logger.debug(f"{i} - (Thing) Failed to retrieve for item id = {key}\n")
-        else:
-            logger.debug(f"{i} - (Thing) Success: {key}")
-            if settings['volume'] >= 40:
-                data_to_scrape[key].print_info()
+    with progress_of(settings, 'thing', len(data_to_scrape)) as report:
+        for key in data_to_scrape:
+            i += 1
+            try:
+                retry_on_dead_browser(settings, fetch_and_parse, data_to_scrape[key], browser)
+                data['things'][key] = data_to_scrape[key]
+            except Exception as E:
+                failed.append((key, E))
+                logger.debug("%d - (Thing) Failed to retrieve for item id = %s\n", i, key)
+                metrics.inc('entities_total', entity='thing', status='failed')
+                report.update(failed=True)
+            else:
+                logger.debug("%d - (Thing) Success: %s", i, key)
+                metrics.inc('entities_total', entity='thing', status='success')
+                push_scraped(settings, 'things', key, data_to_scrape[key])
+                log_scraped(settings, data_to_scrape[key])
+                report.update()
     return data, failed
 
 
@@ -197,24 +286,29 @@ def scrape_users_in_db(settings, db):
     names_to_scrape = get_users(db, settings)
     failed = []
     runs_counter = 0
-    for k in names_to_scrape:
-        if settings['not_all_users']:
-            if runs_counter >= settings['num_items']:
-                # scan up to num_items items.
-                break
-        runs_counter += 1
-        try:
-            user = User(username=k, browser=settings['browser_obj'])
-            user.fetch_all()
-            user.parse_all()
-            db['users'][k] = user
-        except Exception as E:
-            failed.append((k, E))
-            logger.debug(f"{runs_counter} - (User) Failed to retrieve for item id = {k}\n")
-        else:
-            logger.debug(f"{runs_counter} - (User) Success: {k}")
-            if settings['volume'] >= 40:
-                user.print_info()
+    total = min(settings['num_items'], len(names_to_scrape)) if settings['not_all_users'] else len(names_to_scrape)
+    with progress_of(settings, 'user', total) as report:
+        for k in names_to_scrape:
+            if settings['not_all_users']:
+                if runs_counter >= settings['num_items']:
+                    # scan up to num_items items.
+                    break
+            runs_counter += 1
+            try:
+                user = User(username=k)
+                retry_on_dead_browser(settings, fetch_and_parse, user, settings['browser_obj'])
+                db['users'][k] = user
+            except Exception as E:
+                failed.append((k, E))
+                logger.debug("%d - (User) Failed to retrieve for item id = %s\n", runs_counter, k)
+                metrics.inc('entities_total', entity='user', status='failed')
+                report.update(failed=True)
+            else:
+                logger.debug("%d - (User) Success: %s", runs_counter, k)
+                metrics.inc('entities_total', entity='user', status='success')
+                push_scraped(settings, 'users', k, user)
+                log_scraped(settings, user)
+                report.update()
     return db, failed
 
 
@@ -228,22 +322,25 @@ def get_makes(data, settings):
     res = set()
     items = data['things']
     i = 0
-    for k in items:
-        i += 1
-        try:
-            makes = items[k].get_makes(max_makes=settings['num_items'])
-        except Exception as E:
-            logger.exception(f'{i} - (Makes) Failed to get makes from Thing id {k}')
-            # print(f"Error of type {type(E)}:\n{E}")
-            makes = [None]
-        else:
-            logger.debug(f'{i} - (Thing > Makes) Success {k}: {makes}')
-        for make in makes:
-            if make is not None:
-                if type(make) == tuple:
-                    res.add(make[0])
-                else:
-                    res.add(make)
+    with progress_of(settings, 'thing > makes', len(items)) as report:
+        for k in items:
+            i += 1
+            try:
+                makes = retry_on_dead_browser(settings, items[k].get_makes, max_makes=settings['num_items'])
+            except Exception as E:
+                logger.exception('%d - (Makes) Failed to get makes from Thing id %s', i, k)
+                # print(f"Error of type {type(E)}:\n{E}")
+                makes = [None]
+                report.update(failed=True)
+            else:
+                logger.debug('%d - (Thing > Makes) Success %s: %s', i, k, makes)
+                report.update()
+            for make in makes:
+                if make is not None:
+                    if type(make) == tuple:
+                        res.add(make[0])
+                    else:
+                        res.add(make)
     return res
 
 
@@ -257,23 +354,27 @@ def scrape_make_in_db(settings, db):
     makes_to_scrape = get_makes(db, settings)
     failed = []
     runs_counter = 0
-    for k in makes_to_scrape:
-        if runs_counter >= settings['num_items']:
-            # scan up to num_items items.
-            break
-        runs_counter += 1
-        try:
-            make = Make(make_id=k, browser=settings['browser_obj'])
-            make.fetch_all()
-            make.parse_all()
-            db['makes'][k] = make
-        except Exception as E:
-            failed.append((k, E))
-            logger.debug(f"{runs_counter} - (Make) Failed to retrieve for item id = {k}\n")
-        else:
-            logger.debug(f"{runs_counter} - (Make) Success: {k}")
-            if settings['volume'] >= 40:
-                make.print_info()
+    with progress_of(settings, 'make', min(settings['num_items'], len(makes_to_scrape))) as report:
+        for k in makes_to_scrape:
+            if runs_counter >= settings['num_items']:
+                # scan up to num_items items.
+                break
+            runs_counter += 1
+            try:
+                make = Make(make_id=k)
+                retry_on_dead_browser(settings, fetch_and_parse, make, settings['browser_obj'])
+                db['makes'][k] = make
+            except Exception as E:
+                failed.append((k, E))
+                logger.debug("%d - (Make) Failed to retrieve for item id = %s\n", runs_counter, k)
+                metrics.inc('entities_total', entity='make', status='failed')
+                report.update(failed=True)
+            else:
+                logger.debug("%d - (Make) Success: %s", runs_counter, k)
+                metrics.inc('entities_total', entity='make', status='success')
+                push_scraped(settings, 'makes', k, make)
+                log_scraped(settings, make)
+                report.update()
     return db, failed
 
 
@@ -287,18 +388,21 @@ def get_remixes(data, settings):
     res = dict()
     items = data['things']
     i = 0
-    for k in items:
-        i += 1
-        try:
-            remixes = items[k].get_remixes(max_remixes=settings['num_items'])
-        except Exception as E:
-            logger.exception(f'{i} - (Remixes) Failed to get remixes from Thing id {k}')
-            remixes = [None]
-        else:
-            logger.debug(f'{i} - (Thing > Remixes) Success {k}: {remixes}')
-        for remix in remixes:
-            if remix is not None:
-                res[remix[0]] = remix
+    with progress_of(settings, 'thing > remixes', len(items)) as report:
+        for k in items:
+            i += 1
+            try:
+                remixes = retry_on_dead_browser(settings, items[k].get_remixes, max_remixes=settings['num_items'])
+            except Exception as E:
+                logger.exception('%d - (Remixes) Failed to get remixes from Thing id %s', i, k)
+                remixes = [None]
+                report.update(failed=True)
+            else:
+                logger.debug('%d - (Thing > Remixes) Success %s: %s', i, k, remixes)
+                report.update()
+            for remix in remixes:
+                if remix is not None:
+                    res[remix[0]] = remix
     return res
 
 
@@ -312,24 +416,28 @@ def scrape_remixes_in_db(settings, db):
     remixes_to_scrape = get_remixes(db, settings)
     failed = []
     runs_counter = 0
-    for k in remixes_to_scrape:
-        if runs_counter >= settings['num_items']:
-            # scan up to num_items items.
-            break
-        runs_counter += 1
-        try:
-            remix = Thing(thing_id=k, browser=settings['browser_obj'])
-            remix.fetch_all(settings['browser_obj'])
-            remix.parse_all()
-            remix['likes'] = remixes_to_scrape[k][1]
-            db['things'][k] = remix
-        except Exception as E:
-            failed.append((k, E))
-            logger.debug(f"{runs_counter} - (Remix) Failed to retrieve for item id = {k}\n")
-        else:
-            logger.debug(f"{runs_counter} - (Remix) Success: {k}")
-            if settings['volume'] >= 40:
-                remix.print_info()
+    with progress_of(settings, 'remix', min(settings['num_items'], len(remixes_to_scrape))) as report:
+        for k in remixes_to_scrape:
+            if runs_counter >= settings['num_items']:
+                # scan up to num_items items.
+                break
+            runs_counter += 1
+            try:
+                remix = Thing(thing_id=k)
+                retry_on_dead_browser(settings, fetch_and_parse, remix, settings['browser_obj'])
+                remix['likes'] = remixes_to_scrape[k][1]
+                db['things'][k] = remix
+            except Exception as E:
+                failed.append((k, E))
+                logger.debug("%d - (Remix) Failed to retrieve for item id = %s\n", runs_counter, k)
+                metrics.inc('entities_total', entity='remix', status='failed')
+                report.update(failed=True)
+            else:
+                logger.debug("%d - (Remix) Success: %s", runs_counter, k)
+                metrics.inc('entities_total', entity='remix', status='success')
+                push_scraped(settings, 'things', k, remix)
+                log_scraped(settings, remix)
+                report.update()
     return db, failed
 
 
@@ -352,7 +460,18 @@ def choose_action(inp, data, action):
     :return: results of scraping for the chosen action
     """
     logger.info(f"Performing {action} search for {inp['num_items']} items")
+    with metrics.timed('action_seconds', 'Duration of CLI actions', action=action), profiled(inp, action):
+        return _perform_action(inp, data, action)
+
+
+def _perform_action(inp, data, action):
+    """
+    Perform a single action of choose_action
+    :return: results of scraping for the chosen action
+    """
     fail = []
+    if action in ('thing', 'remix', 'make', 'user'):
+        use_browser(inp)
 
     if action == 'thing' or action == 'all':
         data, fail = scrape_main_page(settings=inp, data=data)
@@ -364,7 +483,10 @@ def choose_action(inp, data, action):
         data, fail = scrape_make_in_db(inp, data)
 
     elif action == 'api' or action == 'all':
-        enrich_with_apis(inp, data)
+        if inp.get('enricher') is not None:
+            logger.info("Things are enriched with APIs in the background while scraping")
+        else:
+            enrich_with_apis(inp, data)
 
     elif action == 'user' or action == 'all':
         data, fail = scrape_users_in_db(inp, data)
@@ -376,6 +498,15 @@ def choose_action(inp, data, action):
     return data, fail
 
 
+def mysql_settings(inp):
+    """
+    Get mysql server settings from user arguments
+    :param inp: arguments passed by the user
+    :return: dict of host, user and password
+    """
+    return {'host': inp['mysql_host'], 'user': inp['mysql_user'], 'password': inp['mysql_password']}
+
+
 def follow_cli(inp, data=None):
     """
     Follow instructions from CLI
@@ -392,40 +523,69 @@ def follow_cli(inp, data=None):
         json_path = os.path.abspath(inp['load_json'])
 
         if os.path.exists(json_path):
-            data = load_json(json_path)
+            with profiled(inp, 'load_json'):
+                data = load_json(json_path)
         else:
             logger.error("Given JSON path was not found: `{}`".format(json_path))
     else:
+        # Write scraped items to the database while scraping
+        if inp['write_through']:
+            inp['db_sink'] = DatabaseSink(drop_existing=inp['reset_database'], backend=inp['db_backend'],
+                                          **mysql_settings(inp))
+            inp['db_sink'].start()
+
+        # Enrich scraped things with APIs while scraping
+        if inp['background_api']:
+            inp['enricher'] = APIs.BackgroundEnricher(app_id=inp['google_app_name'])
+            inp['enricher'].start()
+
         n_list = inp['num_items'] if len(inp['num_items']) > 0 else [personal_config.PAGES_TO_SCAN]
         type_list = inp['type']
         n_max = len(n_list) - 1
-        for i, action in enumerate(type_list):
-            i_n = min(i, n_max)
-            inp['type'] = action
-            inp['num_items'] = n_list[i_n]
-            data, fail = choose_action(inp, data, action)
+        try:
+            for i, action in enumerate(type_list):
+                i_n = min(i, n_max)
+                inp['type'] = action
+                inp['num_items'] = n_list[i_n]
+                data, fail = choose_action(inp, data, action)
+        finally:
+            if inp.get('enricher') is not None:
+                inp['enricher'].close()
+            if inp.get('db_sink') is not None:
+                inp['db_sink'].close()
         inp['num_items'] = n_list
         inp['type'] = type_list
 
         # Only save JSON if a new scrapping was done
         if inp['save_json']:
             json_path = os.path.abspath(inp['Name'] + '.json')
-            save_json(json_path, data)
-
-    if inp['database']:
-        if 'json_path' in locals():
-            logger.info("Building database from `{}`".format(json_path))
-            build_database(json_path, drop_existing=inp['reset_database'])
-        else:
-            logger.info("Building database from scrapped data")
-            build_database(parse_json_from_data(data), drop_existing=inp['reset_database'])
+            with profiled(inp, 'save_json'):
+                save_json(json_path, data, base_path=inp['delta_base'])
+
+    if inp['database'] and inp.get('db_sink') is not None and inp['db_sink'].ok:
+        logger.info("Scraped data was already written to the database while scraping")
+    elif inp['database']:
+        if inp.get('db_sink') is not None:
+            logger.warning("Scraped data was not fully written to the database while scraping, building it again")
+        with profiled(inp, 'database'):
+            if 'json_path' in locals():
+                logger.info("Building database from `{}`".format(json_path))
+                build_database(json_path, drop_existing=inp['reset_database'], bulk=inp['bulk_load'],
+                               connections=inp['db_connections'], chunk_size=inp['db_chunk_size'],
+                               backend=inp['db_backend'], **mysql_settings(inp))
+            else:
+                logger.info("Building database from scrapped data")
+                build_database(parse_json_from_data(data), drop_existing=inp['reset_database'],
+                               bulk=inp['bulk_load'], connections=inp['db_connections'],
+                               chunk_size=inp['db_chunk_size'], backend=inp['db_backend'], **mysql_settings(inp))
 
     return data
 
 
-def log_file_gen():
+def log_file_gen(extension=gconf.Logs.EXTENSION):
     """
     handles file location for logs storage
+    :param extension: extension of the log file
     :return: path to main log file
     """
     from datetime import datetime
@@ -436,21 +596,44 @@ def log_file_gen():
     if not os.path.exists(gconf.Logs.LOG_DIR):
         os.mkdir(gconf.Logs.LOG_DIR)
     # generate saving path for log file
-    saving_path = os.path.join(gconf.Logs.LOG_DIR, file_name + '.log')
+    saving_path = os.path.join(gconf.Logs.LOG_DIR, file_name + extension)
     return os.path.abspath(saving_path)
 
 
+class JsonFormatter(logging.Formatter):
+    """
+    Formats log records as single line JSON objects (JSON lines), to be parsed by log tools:
+    time, level, file, function, line and message (including the traceback of exceptions).
+    """
+
+    def format(self, record):
+        entry = {'time': datetime.datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+                 'level': record.levelname,
+                 'file': record.filename,
+                 'func': record.funcName,
+                 'line': record.lineno,
+                 'message': record.getMessage()}
+        if record.exc_info:
+            entry['message'] += '\n' + self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
 def setup_log(log, inp):
     """
-    setup the log based on the config file settings
+    setup the log based on the config file settings.
+    Records are queued and written to the log file and the terminal by a background listener, so the scraping
+    thread does not wait for disk or terminal I/O. The logger level is the lowest level of its handlers,
+    so disabled debug calls return at once.
     :param log: logger obj we're setting up
     :param inp: user arguments
-    :return: None
+    :return: the started QueueListener, to be stopped (flushing the queued records) at the end of the run
     """
-    log.setLevel(eval(f"logging.{gconf.Logs.LEVEL_GENERAL}"))
-
-    formatter_log = logging.Formatter(gconf.Logs.FORMAT_LOG)
-    log_path = log_file_gen()
+    if inp.log_format == 'json':
+        formatter_log = JsonFormatter()
+        log_path = log_file_gen(gconf.Logs.EXTENSION_JSON)
+    else:
+        formatter_log = logging.Formatter(gconf.Logs.FORMAT_LOG)
+        log_path = log_file_gen()
 
     file_handler = logging.FileHandler(log_path)
     file_handler.setFormatter(formatter_log)
@@ -480,9 +663,16 @@ def setup_log(log, inp):
         file_handler.setLevel(cli_log_level)
 
     stream_handler.setFormatter(formatter_stream)
-    log.addHandler(file_handler)
-    log.addHandler(stream_handler)
+
+    # records below every handler's level are dropped by the logger itself, before being created
+    log.setLevel(max(eval(f"logging.{gconf.Logs.LEVEL_GENERAL}"), min(file_handler.level, stream_handler.level)))
+
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, file_handler, stream_handler, respect_handler_level=True)
+    listener.start()
+    log.addHandler(logging.handlers.QueueHandler(log_queue))
     log.info("logger has been setup successfully")
+    return listener
 
 
 def adjust_args_dict(a_dict):
@@ -509,24 +699,86 @@ def adjust_args_dict(a_dict):
     return a_dict
 
 
-def main():
-    parser = cli.cli_set_arguments()
-    args = parser.parse_args()
-    setup_log(logger, args)
+def open_browser(inp):
+    """
+    Returns the browser of the run: the browser given in the arguments, recording the opened pages with --record,
+    or a fake browser replaying recorded pages with --replay (offline, see recording.RecordedPages).
+    :param inp: Instructions from CLI
+    """
+    if inp['replay']:
+        # the fake browser (and lxml) is only needed to replay
+        from fake_browser import FakeBrowser
+        # recorded pages are static, there is no javascript to wait for
+        personal_config.IMPLICITLY_WAIT = 0
+        logger.info(f"Replaying pages recorded in `{inp['replay']}`")
+        return FakeBrowser(recording.RecordedPages(inp['replay']), count_roundtrips=inp['count_roundtrips'])
+    return Browser(inp['Browser'], inp['Driver'], headless=inp['headless'], count_roundtrips=inp['count_roundtrips'],
+                   record_dir=inp['record'], recycle_after=inp['recycle_after'], max_memory=inp['max_browser_memory'])
+
+
+def use_browser(inp):
+    """
+    Returns the browser of the run, opened by the first action that needs it (see open_browser):
+    runs that only load snapshots, build databases or enrich with APIs never start a browser.
+    :param inp: Instructions from CLI, with the exit stack the browser is closed by at the end of the run
+    """
+    if inp['browser_obj'] is None:
+        inp['browser_obj'] = inp['browsers'].enter_context(open_browser(inp))
+        logger.info('Opened browser obj')
+    return inp['browser_obj']
+
+
+def run(args):
+    """
+    Run the scraper with the parsed arguments.
+    :param args: the parsed arguments
+    """
+    if args.metrics_port is not None:
+        metrics.serve(args.metrics_port)
+    profiler = None
+    if args.profile:
+        profiler = profiling.Profiler(args.profile, args.profile_interval, args.profile_memory)
+        profiler.start()
     data = data_format.copy()
     logger.debug('Created base data template')
-    with Browser(args.Browser, args.Driver, headless=args.headless) as browser:
-        logger.info('Opened browser obj')
-        args_dict = vars(args)
-        args_dict = adjust_args_dict(args_dict)
-        args_dict['browser_obj'] = browser
-        data = follow_cli(args_dict, data)
-        for k in data:
-            logger.debug(f"{k}:\n{data[k]}")
-    logger.info('Browser object closed')
+    try:
+        with contextlib.ExitStack() as browsers:
+            args_dict = vars(args)
+            args_dict = adjust_args_dict(args_dict)
+            # opened on first use (see use_browser)
+            args_dict['browser_obj'] = None
+            args_dict['browsers'] = browsers
+            args_dict['profiler'] = profiler
+            data = follow_cli(args_dict, data)
+            for k in data:
+                logger.debug("%s:\n%s", k, data[k])
+            browser = args_dict['browser_obj']
+            if browser is not None and browser.roundtrips is not None:
+                logger.info(browser.roundtrips.report())
+        if browser is not None:
+            logger.info(f'Browser object closed, it was restarted {browser.restarts} times')
+            if browser.recorder is not None:
+                logger.info(f"Recorded {browser.recorder.pages} pages into `{args.record}`")
+    finally:
+        if profiler is not None:
+            profiler.stop()
 
+    logger.info(metrics.summary())
+    if args.metrics_file:
+        metrics.write_prometheus(args.metrics_file)
     logger.info('Quiting data miner')
 
 
+def main():
+    parser = cli.cli_set_arguments()
+    args = parser.parse_args()
+    log_listener = setup_log(logger, args)
+    try:
+        run(args)
+    finally:
+        # write the queued records
+        log_listener.stop()
+
+
 if __name__ == '__main__':
     main()
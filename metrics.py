@@ -0,0 +1,286 @@
+import bisect
+import functools
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import general_config as gconf
+
+# Define new logger
+logger = logging.getLogger(gconf.Logs.LOGGER_NAME)
+
+
+def _label_key(labels):
+    """
+    Returns a hashable, ordered key of given labels dictionary (label values are str, as exported).
+    """
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key, extra=()):
+    """
+    Returns the prometheus text format of labels key (see _label_key), with extra (name, value) labels appended.
+    """
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(name, str(value).replace('"', '\\"')) for name, value in pairs) + '}'
+
+
+class Counter:
+    """
+    A monotonically increasing count, per label values.
+    """
+    kind = 'counter'
+
+    def __init__(self, name, description):
+        self.name = name
+        self.description = description
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        """
+        Increase the count of given label values by amount.
+        """
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(labels), 0)
+
+    def items(self):
+        """
+        Returns a list of (label key, count).
+        """
+        with self._lock:
+            return list(self._values.items())
+
+    def samples(self):
+        """
+        Returns the prometheus text format lines of the counter values.
+        """
+        with self._lock:
+            return ['{}{} {}'.format(self.name, _format_labels(key), value) for key, value in self._values.items()]
+
+
+class Histogram:
+    """
+    Distribution of observed values (durations in seconds) in cumulative buckets, per label values.
+    """
+    kind = 'histogram'
+
+    def __init__(self, name, description, buckets=gconf.Metrics.BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        # label key -> [count per bucket (last one is +Inf), sum of observed values]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        """
+        Record a single observed value for given label values.
+        """
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, _ = entry = self._values.setdefault(key, [[0] * (len(self.buckets) + 1), 0.0])
+            counts[index] += 1
+            entry[1] += value
+
+    def stats(self):
+        """
+        Returns {label key: (count, sum, p50, p95)}, percentiles are estimated as their bucket upper bound.
+        """
+        result = {}
+        with self._lock:
+            for key, (counts, total) in self._values.items():
+                count = sum(counts)
+                result[key] = (count, total,
+                               self._percentile(counts, count, 0.5), self._percentile(counts, count, 0.95))
+        return result
+
+    def _percentile(self, counts, count, fraction):
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += bucket_count
+            if cumulative >= fraction * count:
+                return bound
+        return float('inf')
+
+    def samples(self):
+        """
+        Returns the prometheus text format lines of the histogram buckets, sum and count.
+        """
+        lines = []
+        with self._lock:
+            for key, (counts, total) in self._values.items():
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += bucket_count
+                    le = '+Inf' if bound == float('inf') else repr(float(bound))
+                    lines.append('{}_bucket{} {}'.format(self.name, _format_labels(key, [('le', le)]), cumulative))
+                lines.append('{}_sum{} {}'.format(self.name, _format_labels(key), total))
+                lines.append('{}_count{} {}'.format(self.name, _format_labels(key), cumulative))
+        return lines
+
+
+class Registry:
+    """
+    Holds all metrics of the process by name. Metrics are created on first use.
+    """
+
+    def __init__(self, prefix=gconf.Metrics.PREFIX):
+        self.prefix = prefix
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self.started = time.monotonic()
+
+    def _get(self, metric_class, name, description):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = metric_class(self.prefix + name, description)
+            return metric
+
+    def counter(self, name, description=''):
+        return self._get(Counter, name, description)
+
+    def histogram(self, name, description=''):
+        return self._get(Histogram, name, description)
+
+    def metrics(self):
+        with self._lock:
+            return list(self._metrics.values())
+
+    def reset(self):
+        """
+        Drop all metrics (a new run starts from zero).
+        """
+        with self._lock:
+            self._metrics.clear()
+            self.started = time.monotonic()
+
+    def render(self):
+        """
+        Returns all metrics in prometheus text exposition format.
+        """
+        lines = []
+        for metric in self.metrics():
+            if metric.description:
+                lines.append('# HELP {} {}'.format(metric.name, metric.description))
+            lines.append('# TYPE {} {}'.format(metric.name, metric.kind))
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+# Metrics of this process
+REGISTRY = Registry()
+
+
+def inc(name, amount=1, description='', **labels):
+    """
+    Increase counter `name` of given label values by amount.
+    """
+    REGISTRY.counter(name, description).inc(amount, **labels)
+
+
+def observe(name, value, description='', **labels):
+    """
+    Record value in histogram `name` for given label values.
+    """
+    REGISTRY.histogram(name, description).observe(value, **labels)
+
+
+class timed:
+    """
+    Measure the duration of a block (as a context manager) or of every call (as a decorator) into a histogram.
+
+    Usage:
+        with metrics.timed('browser_get_seconds'):
+            driver.get(url)
+
+        @metrics.timed('fetch_seconds', entity='thing')
+        def fetch_all(self):
+            ...
+    """
+
+    def __init__(self, name, description='', **labels):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        observe(self.name, time.perf_counter() - self._start, self.description, **self.labels)
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            # a new timer per call, so recursive and concurrent calls are measured separately
+            with timed(self.name, self.description, **self.labels):
+                return func(*args, **kwargs)
+        return wrapper
+
+
+def write_prometheus(file_path, registry=REGISTRY):
+    """
+    Write all metrics to file_path in prometheus text format (e.g. for the node exporter textfile collector).
+    """
+    with open(file_path, 'w') as file:
+        file.write(registry.render())
+    logger.info("Metrics written to `{}`".format(file_path))
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """Serves the metrics of REGISTRY on any path."""
+    registry = REGISTRY
+
+    def do_GET(self):
+        body = self.registry.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(port, host=gconf.Metrics.HTTP_HOST):
+    """
+    Serve the metrics in prometheus text format over HTTP from a background thread, while the process runs.
+    :param port: port to listen on (0 for any free port)
+    :param host: interface to listen on
+    :return: the HTTP server (server.shutdown() stops it)
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='MetricsServer', daemon=True).start()
+    logger.info("Serving metrics at http://{}:{}/metrics".format(host, server.server_port))
+    return server
+
+
+def summary(registry=REGISTRY):
+    """
+    Returns a human readable summary of all metrics: counts, rates, total and mean durations and percentiles.
+    """
+    elapsed = time.monotonic() - registry.started
+    lines = ["Metrics summary ({:.1f}s):".format(elapsed)]
+    for metric in sorted(registry.metrics(), key=lambda m: m.name):
+        if isinstance(metric, Histogram):
+            for key, (count, total, p50, p95) in sorted(metric.stats().items()):
+                lines.append("\t{}{}: {} calls, {:.2f}s total, {:.1f}ms mean, p50 <= {}s, p95 <= {}s".format(
+                    metric.name, _format_labels(key), count, total, 1000 * total / count, p50, p95))
+        else:
+            for key, value in sorted(metric.items()):
+                lines.append("\t{}{}: {} ({:.2f}/s)".format(metric.name, _format_labels(key), value,
+                                                            value / elapsed if elapsed else 0))
+    return '\n'.join(lines)
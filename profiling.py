@@ -0,0 +1,160 @@
+import cProfile
+import collections
+import contextlib
+import io
+import os
+import pstats
+import sys
+import threading
+import tracemalloc
+import logging
+
+import general_config as gconf
+
+# Define new logger
+logger = logging.getLogger(gconf.Logs.LOGGER_NAME)
+
+
+class StackSampler:
+    """
+    Samples the call stack of a thread periodically from a background thread, with a low overhead
+    (nothing is traced between samples). Samples are counted by stack, in collapsed format:
+    `file:function;file:function... count`, as read by flame graph tools (flamegraph.pl, speedscope).
+    """
+
+    def __init__(self, interval=gconf.Profiling.SAMPLE_INTERVAL, thread_id=None):
+        """
+        Construction of a new stack sampler.
+          :param interval: number of seconds between samples
+          :param thread_id: identifier of the sampled thread. Default: the thread constructing the sampler.
+        """
+        self.interval = interval
+        self.thread_id = threading.get_ident() if thread_id is None else thread_id
+        self.samples = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='StackSampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append('{}:{}'.format(os.path.basename(frame.f_code.co_filename), frame.f_code.co_name))
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def write(self, file_path):
+        """
+        Write the samples to file_path in collapsed stacks format.
+        """
+        with open(file_path, 'w') as file:
+            for stack, count in self.samples.most_common():
+                file.write('{} {}\n'.format(stack, count))
+
+
+class Profiler:
+    """
+    Profiles a run: every phase (CLI action, JSON save, database build...) is profiled with cProfile into its own
+    file, and the whole run (phases included) is written to main.prof. Optionally, stacks are sampled periodically
+    (see StackSampler) and the top memory allocations are reported using tracemalloc.
+    Profile files can be read with pstats or visualisation tools such as snakeviz.
+
+    Usage:
+        with Profiler('profiles') as profiler:
+            with profiler.phase('thing'):
+                ...
+    """
+
+    def __init__(self, directory, sample_interval=None, trace_memory=False):
+        """
+        Construction of a new profiler.
+          :param directory: directory the profile files are written to (created if missing)
+          :param sample_interval: if given, the run's stacks are sampled every sample_interval seconds.
+          :param trace_memory: if true, memory allocations are traced and the top ones are reported.
+        """
+        self.directory = directory
+        self.trace_memory = trace_memory
+        self.sampler = None if sample_interval is None else StackSampler(sample_interval)
+
+        self._files = []
+        # profiles the run outside of phases, a single cProfile profiler may be active at a time
+        self._outside = cProfile.Profile()
+
+    def __enter__(self):
+        """
+        Allows to start profiling using 'with' statement
+        """
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """
+        Allows to stop profiling and write reports using 'with' statement
+        """
+        self.stop()
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        if self.trace_memory:
+            tracemalloc.start(gconf.Profiling.MEMORY_FRAMES)
+        if self.sampler is not None:
+            self.sampler.start()
+        self._outside.enable()
+        logger.info("Profiling the run into `{}`".format(self.directory))
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """
+        Profile a phase of the run into its own file, named after the phase and its position in the run.
+        """
+        self._outside.disable()
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield profile
+        finally:
+            profile.disable()
+            file_path = os.path.join(self.directory, '{:02d}_{}.prof'.format(len(self._files) + 1, name))
+            profile.dump_stats(file_path)
+            self._files.append(file_path)
+            logger.debug("Profile of {} written to `{}`".format(name, file_path))
+            self._outside.enable()
+
+    def stop(self):
+        """
+        Stop profiling and write main.prof, the sampled stacks (stacks.folded) and the memory report (memory.txt).
+        """
+        self._outside.disable()
+        stats = pstats.Stats(self._outside)
+        for file_path in self._files:
+            stats.add(file_path)
+        stats.dump_stats(os.path.join(self.directory, 'main.prof'))
+
+        output = io.StringIO()
+        stats.stream = output
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(gconf.Profiling.REPORT_TOP)
+        logger.info("Profile of the run (main.prof):\n{}".format(output.getvalue()))
+
+        if self.sampler is not None:
+            self.sampler.stop()
+            self.sampler.write(os.path.join(self.directory, 'stacks.folded'))
+
+        if self.trace_memory:
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            with open(os.path.join(self.directory, 'memory.txt'), 'w') as file:
+                for statistic in snapshot.statistics('traceback')[:gconf.Profiling.REPORT_TOP]:
+                    file.write('{}\n'.format(statistic))
+                    file.writelines('\t{}\n'.format(line) for line in statistic.traceback.format())
+            top = snapshot.statistics('lineno')[:gconf.Profiling.REPORT_TOP]
+            logger.info("Top memory allocations (memory.txt):\n{}".format('\n'.join(str(line) for line in top)))
+
+        logger.info("Profiles written to `{}`".format(self.directory))
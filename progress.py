@@ -0,0 +1,135 @@
+import sys
+import time
+import collections
+import logging
+
+import general_config as gconf
+
+# Define new logger
+logger = logging.getLogger(gconf.Logs.LOGGER_NAME)
+
+
+def format_duration(seconds):
+    """
+    Returns a number of seconds as h:mm:ss (or m:ss under an hour), '?' if unknown.
+    """
+    if seconds is None:
+        return '?'
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return '{}:{:02d}:{:02d}'.format(hours, minutes, seconds) if hours else '{}:{:02d}'.format(minutes, seconds)
+
+
+class Progress:
+    """
+    Reports the progress of a scraping loop: done/total, rolling entities/sec (over the last entities),
+    failure rate and ETA. On a terminal, a single status line is updated in place, otherwise a log line is written
+    periodically. Reports are throttled, so an update costs a clock read when nothing is reported.
+
+    Usage:
+        with Progress('thing', len(things)) as progress:
+            for thing in things:
+                ...
+                progress.update(failed=False)
+    """
+
+    def __init__(self, action, total, stream=None, tty=None, refresh=gconf.Progress.REFRESH_INTERVAL,
+                 log_interval=gconf.Progress.LOG_INTERVAL, window=gconf.Progress.RATE_WINDOW):
+        """
+        Construction of a new progress report.
+          :param action: name of the reported loop (e.g. thing, user)
+          :param total: number of entities the loop will go over, None if unknown
+          :param stream: stream the status line is written to. Default: sys.stderr
+          :param tty: if true, show a status line on stream, else write log lines. Default: if stream is a terminal
+          :param refresh: minimum number of seconds between status line updates
+          :param log_interval: minimum number of seconds between log lines
+          :param window: number of last entities the rolling rate is computed over
+        """
+        self.action = action
+        self.total = total
+        self.stream = sys.stderr if stream is None else stream
+        self.tty = self.stream.isatty() if tty is None else tty
+        self.interval = refresh if self.tty else log_interval
+
+        self.done = 0
+        self.failed = 0
+        self.started = time.monotonic()
+        self._times = collections.deque([self.started], maxlen=window + 1)
+        self._reported = self.started
+
+    def __enter__(self):
+        """
+        Allows to report progress using 'with' statement
+        """
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """
+        Allows to write the final report using 'with' statement
+        """
+        self.close()
+
+    def update(self, failed=False):
+        """
+        Count an entity as done (and failed, if given), and report the progress if it is due.
+        """
+        self.done += 1
+        if failed:
+            self.failed += 1
+        now = time.monotonic()
+        self._times.append(now)
+        if now - self._reported >= self.interval:
+            self._reported = now
+            self.report()
+
+    def rate(self):
+        """
+        Returns the number of entities per second over the last entities (see window), None before the first one.
+        """
+        if len(self._times) < 2 or self._times[-1] == self._times[0]:
+            return None
+        return (len(self._times) - 1) / (self._times[-1] - self._times[0])
+
+    def eta(self):
+        """
+        Returns the estimated number of seconds left, None if unknown.
+        """
+        rate = self.rate()
+        if self.total is None or not rate:
+            return None
+        return max(self.total - self.done, 0) / rate
+
+    def status(self):
+        """
+        Returns the progress as a single line of text.
+        """
+        done = '{}/{}'.format(self.done, self.total) if self.total is not None else str(self.done)
+        if self.total:
+            done += ' ({:.0%})'.format(self.done / self.total)
+        rate = self.rate()
+        return '{}: {} | {} | failed {} ({:.1%}) | elapsed {} | ETA {}'.format(
+            self.action, done, '?/s' if rate is None else '{:.2f}/s'.format(rate), self.failed,
+            self.failed / self.done if self.done else 0, format_duration(time.monotonic() - self.started),
+            format_duration(self.eta()))
+
+    def report(self):
+        """
+        Report the progress now: update the status line, or write a log line.
+        """
+        if self.tty:
+            # carriage return and erase the line, to redraw the status in place
+            self.stream.write('\r' + self.status() + '\x1b[K')
+            self.stream.flush()
+        else:
+            logger.info(self.status())
+
+    def close(self):
+        """
+        Write the final report of the loop.
+        """
+        if self.tty:
+            self.report()
+            self.stream.write('\n')
+            self.stream.flush()
+        else:
+            logger.info(self.status())
@@ -0,0 +1,75 @@
+import os
+import logging
+from urllib.parse import urlsplit, quote
+
+import general_config as gconf
+
+# Define new logger
+logger = logging.getLogger(gconf.Logs.LOGGER_NAME)
+
+
+def page_file_name(url):
+    """
+    Returns the file name of the recorded page of given url, or url path (and query), in a recordings directory.
+    Pages are recorded by path, so recordings can be replayed (or served by benchmarks.fake_site) on any host.
+    """
+    parts = urlsplit(url)
+    path = parts.path + ('?' + parts.query if parts.query else '')
+    return quote(path.lstrip('/'), safe='') + '.html'
+
+
+class PageRecorder:
+    """
+    Saves the pages opened by a Browser into a directory, one html file per url (see page_file_name).
+    A page is saved as the DOM is when the browser leaves it, so content loaded by scrolls and clicks is recorded.
+
+    Usage:
+        with Browser(name, path, record_dir='recordings') as browser:
+            ...
+    """
+
+    def __init__(self, directory):
+        """
+        :param directory: directory the pages are written to (created if missing)
+        """
+        self.directory = directory
+        self.pages = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def save(self, url, page_source):
+        """
+        Save the page source of url, replacing a previous recording of it. Pages that are not web pages are skipped.
+        """
+        if not url or urlsplit(url).scheme not in ('http', 'https') or page_source is None:
+            return
+        with open(os.path.join(self.directory, page_file_name(url)), 'w', encoding='utf-8') as file:
+            file.write(page_source)
+        self.pages += 1
+        logger.debug("Recorded `%s`", url)
+
+
+class RecordedPages:
+    """
+    Reads the pages of a recordings directory (see PageRecorder), to be replayed with fake_browser.FakeBrowser.
+    """
+
+    def __init__(self, directory):
+        """
+        :param directory: recordings directory
+        """
+        if not os.path.isdir(directory):
+            raise FileNotFoundError("No recordings directory `{}`".format(directory))
+        self.directory = directory
+        self.missing = set()
+
+    def __call__(self, url):
+        """
+        Returns the recorded page of url, or None if it was not recorded.
+        """
+        file_path = os.path.join(self.directory, page_file_name(url))
+        if not os.path.exists(file_path):
+            self.missing.add(url)
+            logger.warning("No recording of `{}`".format(url))
+            return None
+        with open(file_path, 'r', encoding='utf-8') as file:
+            return file.read()
@@ -0,0 +1,178 @@
+import os
+import sys
+import threading
+import time
+import logging
+
+from selenium.webdriver.remote.webelement import WebElement
+
+import general_config as gconf
+import metrics
+
+# Define new logger
+logger = logging.getLogger(gconf.Logs.LOGGER_NAME)
+
+# Kind of WebDriver round trip by method name (methods starting with find_element are finds)
+CALL_KINDS = {'get': 'navigation', 'back': 'navigation', 'forward': 'navigation', 'refresh': 'navigation',
+              'execute_script': 'script', 'execute_async_script': 'script',
+              'get_attribute': 'attribute', 'get_property': 'attribute', 'value_of_css_property': 'attribute',
+              'is_displayed': 'attribute', 'is_enabled': 'attribute', 'is_selected': 'attribute'}
+# Properties that are read from the browser (every access is a round trip) and their kind
+PROPERTY_KINDS = {'text': 'text', 'tag_name': 'attribute', 'size': 'attribute', 'location': 'attribute',
+                  'rect': 'attribute', 'current_url': 'navigation', 'title': 'navigation', 'page_source': 'text'}
+KINDS = ('find', 'text', 'attribute', 'script', 'navigation', 'other')
+
+# Scraped object methods round trips are attributed to (the innermost one on the call stack)
+STEP_PREFIXES = ('_fetch_', '_parse_', 'fetch_all', 'parse_all', 'get_makes', 'get_remixes', 'open_url')
+# Files whose frames are skipped when attributing a round trip to its caller
+_SKIPPED_FILES = (os.path.normcase(__file__), os.sep + 'selenium' + os.sep)
+
+
+def _kind(name):
+    """
+    Returns the kind of round trip (one of KINDS) of a WebDriver or WebElement method.
+    """
+    if name.startswith('find_element'):
+        return 'find'
+    return CALL_KINDS.get(name, 'other')
+
+
+class RoundTripStats:
+    """
+    Counts WebDriver round trips and their latency by kind, and attributes them to the scraping step
+    (the innermost `_fetch_*`/`_parse_*`... method of a Thing, User or Make on the call stack, see STEP_PREFIXES)
+    and to the entity being scraped. Round trips made outside scraped objects are attributed to their caller.
+    """
+
+    def __init__(self):
+        # step -> kind -> [calls, seconds]
+        self.steps = {}
+        # entity url -> [calls, seconds]
+        self.entities = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _caller():
+        """
+        Returns (step, entity) of the current round trip, by walking up the call stack.
+        """
+        frame = sys._getframe(2)
+        caller = None
+        while frame is not None:
+            code = frame.f_code
+            if caller is None and not any(skipped in os.path.normcase(code.co_filename) for skipped in _SKIPPED_FILES):
+                caller = code.co_name
+            if code.co_name.startswith(STEP_PREFIXES) and 'self' in frame.f_locals:
+                scraped = frame.f_locals['self']
+                return '{}.{}'.format(type(scraped).__name__, code.co_name), getattr(scraped, 'url', None)
+            frame = frame.f_back
+        return caller or '<unknown>', None
+
+    def record(self, kind, seconds):
+        """
+        Record a single round trip of given kind that took `seconds`, attributed to the current step and entity.
+        """
+        step, entity = self._caller()
+        with self._lock:
+            entry = self.steps.setdefault(step, {}).setdefault(kind, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+            if entity is not None:
+                entry = self.entities.setdefault(entity, [0, 0.0])
+                entry[0] += 1
+                entry[1] += seconds
+        metrics.inc('webdriver_calls_total', description='Number of WebDriver round trips', kind=kind)
+        metrics.observe('webdriver_call_seconds', seconds, 'Duration of WebDriver round trips', kind=kind)
+
+    def totals(self):
+        """
+        Returns {step: (calls, seconds, {kind: calls})}.
+        """
+        with self._lock:
+            return {step: (sum(calls for calls, _ in kinds.values()), sum(seconds for _, seconds in kinds.values()),
+                           {kind: calls for kind, (calls, _) in kinds.items()})
+                    for step, kinds in self.steps.items()}
+
+    def report(self, top=gconf.RoundTrips.REPORT_TOP):
+        """
+        Returns a text report of the most expensive steps (by time) and entities.
+        :param top: number of steps and entities listed
+        """
+        totals = self.totals()
+        calls = sum(step_calls for step_calls, _, _ in totals.values())
+        seconds = sum(step_seconds for _, step_seconds, _ in totals.values())
+        lines = ["WebDriver round trips: {} calls, {:.2f}s, over {} entities".format(calls, seconds,
+                                                                               len(self.entities)),
+                 "\t{:<34}{:>8}{:>10}{:>10}  {}".format('step', 'calls', 'time (s)', 'mean (ms)',
+                                                      ' '.join(kind for kind in KINDS))]
+
+        for step, (step_calls, step_seconds, kinds) in sorted(totals.items(), key=lambda item: -item[1][1])[:top]:
+            lines.append("\t{:<34}{:>8}{:>10.2f}{:>10.1f}  {}".format(
+                step, step_calls, step_seconds, 1000 * step_seconds / step_calls,
+                ' '.join(str(kinds.get(kind, 0)).rjust(len(kind)) for kind in KINDS)))
+
+        with self._lock:
+            entities = sorted(self.entities.items(), key=lambda item: -item[1][1])[:top]
+        if entities:
+            lines.append("\tMost expensive entities:")
+            for entity, (entity_calls, entity_seconds) in entities:
+                lines.append("\t\t{}: {} calls, {:.2f}s".format(entity, entity_calls, entity_seconds))
+        return '\n'.join(lines)
+
+
+class _Counting:
+    """
+    Proxy of a WebDriver or WebElement object that records every round trip in stats.
+    Returned WebElements (single or in lists) are wrapped as well, other attributes are passed through.
+    """
+
+    def __init__(self, target, stats):
+        self._target = target
+        self._stats = stats
+
+    def _wrap(self, result):
+        if isinstance(result, WebElement):
+            return CountingElement(result, self._stats)
+        if isinstance(result, list) and result and isinstance(result[0], WebElement):
+            return [CountingElement(element, self._stats) for element in result]
+        return result
+
+    def __getattr__(self, name):
+        if name in PROPERTY_KINDS:
+            start = time.perf_counter()
+            try:
+                return self._wrap(getattr(self._target, name))
+            finally:
+                self._stats.record(PROPERTY_KINDS[name], time.perf_counter() - start)
+
+        attribute = getattr(self._target, name)
+        if not callable(attribute) or name.startswith('_'):
+            return attribute
+
+        kind = _kind(name)
+
+        def counted(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return self._wrap(attribute(*args, **kwargs))
+            finally:
+                self._stats.record(kind, time.perf_counter() - start)
+        return counted
+
+    def __eq__(self, other):
+        return self._target == getattr(other, '_target', other)
+
+    def __hash__(self):
+        return hash(self._target)
+
+
+class CountingDriver(_Counting):
+    """
+    WebDriver proxy counting its round trips (see RoundTripStats). Used as Browser.driver.
+    """
+
+
+class CountingElement(_Counting):
+    """
+    WebElement proxy counting its round trips (see RoundTripStats).
+    """
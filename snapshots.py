@@ -0,0 +1,407 @@
+import os
+import json
+import copy
+import heapq
+import pickle
+import logging
+import argparse
+import tempfile
+from itertools import groupby
+
+import general_config as gconf
+
+# Define file logger
+logger = logging.getLogger(gconf.Logs.LOGGER_NAME)
+
+SNAP = gconf.Snapshots
+SCRAPED_AT = gconf.ThingSettings.Properties.SCRAPED_AT
+
+
+class SnapshotWriter:
+    """
+    Stream (data type, key, properties) records into a snapshot file of any format (json, jsonl or binary).
+    Records of each data type must be written together, as produced by merge_snapshots.
+
+    Usage:
+        with SnapshotWriter('scraped_data.jsonl') as writer:
+            writer.write('things', thing_id, properties)
+    """
+
+    def __init__(self, file_path, file_format=None):
+        """
+        Construction of a new snapshot writer.
+          :param file_path: where to save the snapshot (includes name)
+          :param file_format: json, jsonl or binary. Default: by file extension (see gconf.Snapshots.FORMATS)
+        """
+        self.file_path = file_path
+        self.file_format = file_format or snapshot_format(file_path)
+        self.written = 0
+
+        self._file = None
+        self._types_done = []
+        self._current_type = None
+
+    def __enter__(self):
+        """
+        Allows to open the snapshot file using 'with' statement
+        """
+        if self.file_format == 'binary':
+            self._file = open(self.file_path, 'wb')
+            self._file.write(SNAP.BINARY_HEADER)
+        else:
+            self._file = open(self.file_path, 'w')
+            if self.file_format == 'json':
+                self._file.write('{')
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """
+        Allows to complete and close the snapshot file using 'with' statement
+        """
+        if self.file_format == 'json':
+            for data_type in SNAP.DATA_TYPES:
+                if data_type not in self._types_done and data_type != self._current_type:
+                    self._start_type(data_type)
+            self._file.write('}}')
+        self._file.close()
+
+    def _start_type(self, data_type):
+        """
+        Close the JSON object of the current data type and open a new one.
+        """
+        if data_type in self._types_done:
+            raise ValueError("Records of `{}` must be written together".format(data_type))
+
+        if self._current_type is not None:
+            self._types_done.append(self._current_type)
+            self._file.write('}, ')
+        self._current_type = data_type
+        self._file.write('{}: {{'.format(json.dumps(data_type)))
+
+    def write(self, data_type, key, properties):
+        """
+        Write a single entity record.
+        """
+        if self.file_format == 'binary':
+            pickle.dump((data_type, key, properties), self._file, protocol=pickle.HIGHEST_PROTOCOL)
+        elif self.file_format == 'jsonl':
+            self._file.write(json.dumps([data_type, key, properties]) + '\n')
+        else:
+            if data_type != self._current_type:
+                self._start_type(data_type)
+                first = True
+            else:
+                first = False
+            self._file.write('{}{}: {}'.format('' if first else ', ', json.dumps(key), json.dumps(properties)))
+        self.written += 1
+
+
+def snapshot_format(file_path):
+    """
+    Find the format of a snapshot file by its extension
+    :param file_path: path of a snapshot file
+    :return: json, jsonl or binary. Unknown extensions are read as json.
+    """
+    return SNAP.FORMATS.get(os.path.splitext(file_path)[1].lower(), 'json')
+
+
+def iter_records(file_path):
+    """
+    Iterate over the entities of a snapshot file of any format, as (data type, key, properties) records.
+    jsonl and binary files are streamed, json files (and delta chains) are loaded as a whole.
+    Binary snapshots are pickled, only read binary files you created.
+    :param file_path: path of a snapshot file
+    """
+    file_format = snapshot_format(file_path)
+
+    if file_format == 'json':
+        data = read_snapshot(file_path)
+        for data_type in SNAP.DATA_TYPES:
+            for key, properties in data.get(data_type, {}).items():
+                yield data_type, key, properties
+
+    elif file_format == 'jsonl':
+        with open(file_path, 'r') as file:
+            for line in file:
+                if line.strip():
+                    data_type, key, properties = json.loads(line)
+                    yield data_type, key, properties
+
+    else:
+        with open(file_path, 'rb') as file:
+            if file.read(len(SNAP.BINARY_HEADER)) != SNAP.BINARY_HEADER:
+                raise ValueError("`{}` is not a binary snapshot file".format(file_path))
+            while True:
+                try:
+                    data_type, key, properties = pickle.load(file)
+                except EOFError:
+                    return
+                yield data_type, key, properties
+
+
+def write_snapshot(file_path, data, file_format=None):
+    """
+    Save JSON data as a full snapshot file of any format
+    :param file_path: where to save the snapshot (includes name)
+    :param data: JSON data to save
+    :param file_format: json, jsonl or binary. Default: by file extension
+    """
+    with SnapshotWriter(file_path, file_format) as writer:
+        for data_type in SNAP.DATA_TYPES:
+            for key, properties in data.get(data_type, {}).items():
+                writer.write(data_type, key, properties)
+
+
+def is_delta(snapshot):
+    """
+    Check if a loaded snapshot is a delta snapshot
+    :param snapshot: JSON data of a snapshot file
+    :return: True if snapshot is a delta of another snapshot
+    """
+    return SNAP.DELTA_KEY in snapshot
+
+
+def diff_snapshots(base, new):
+    """
+    Find what changed between two full snapshots (JSON data), per entity type
+    :param base: JSON data of the base snapshot
+    :param new: JSON data of the newer snapshot
+    :return: delta dictionary: added, removed and changed entities of every data type
+    """
+    delta = {}
+    for data_type in SNAP.DATA_TYPES:
+        base_items = base.get(data_type, {})
+        new_items = new.get(data_type, {})
+
+        changed = {}
+        for key in base_items.keys() & new_items.keys():
+            before, after = base_items[key], new_items[key]
+            if before == after:
+                continue
+
+            changes = {SNAP.SET: {prop: value for prop, value in after.items()
+                                  if prop not in before or before[prop] != value},
+                       SNAP.UNSET: [prop for prop in before if prop not in after]}
+            changed[key] = changes
+
+        delta[data_type] = {SNAP.ADDED: {key: new_items[key] for key in new_items.keys() - base_items.keys()},
+                            SNAP.REMOVED: sorted(base_items.keys() - new_items.keys()),
+                            SNAP.CHANGED: changed}
+
+    return delta
+
+
+def apply_delta(base, delta):
+    """
+    Rebuild a full snapshot by applying a delta on top of its base. Base is not modified.
+    :param base: JSON data of the (full) base snapshot
+    :param delta: delta dictionary, as created by diff_snapshots
+    :return: JSON data of the rebuilt snapshot
+    """
+    data = {data_type: copy.deepcopy(base.get(data_type, {})) for data_type in SNAP.DATA_TYPES}
+
+    for data_type in SNAP.DATA_TYPES:
+        changes = delta.get(data_type, {})
+        items = data[data_type]
+
+        for key in changes.get(SNAP.REMOVED, []):
+            items.pop(key, None)
+
+        for key, item_changes in changes.get(SNAP.CHANGED, {}).items():
+            if key not in items:
+                logger.warning("Changed {} `{}` is missing from the base snapshot".format(data_type, key))
+                items[key] = {}
+            items[key].update(item_changes.get(SNAP.SET, {}))
+            for prop in item_changes.get(SNAP.UNSET, []):
+                items[key].pop(prop, None)
+
+        items.update(copy.deepcopy(changes.get(SNAP.ADDED, {})))
+
+    return data
+
+
+def read_snapshot(file_path, _chain=None):
+    """
+    Load a snapshot file of any format. A delta snapshot is resolved by loading its base chain and applying
+    the deltas in order.
+    :param file_path: path of a full or delta snapshot file
+    :return: JSON data of the full snapshot
+    """
+    file_path = os.path.abspath(file_path)
+    if snapshot_format(file_path) != 'json':
+        data = {data_type: {} for data_type in SNAP.DATA_TYPES}
+        for data_type, key, properties in iter_records(file_path):
+            data[data_type][key] = properties
+        return data
+
+    chain = _chain or []
+    if file_path in chain:
+        raise ValueError("Snapshot `{}` is its own base".format(file_path))
+
+    with open(file_path, 'r') as file:
+        snapshot = json.load(file)
+
+    if not is_delta(snapshot):
+        return snapshot
+
+    base_path = os.path.join(os.path.dirname(file_path), snapshot[SNAP.DELTA_KEY][SNAP.BASE_KEY])
+    logger.debug("Applying delta `{}` on top of `{}`".format(file_path, base_path))
+    return apply_delta(read_snapshot(base_path, chain + [file_path]), snapshot)
+
+
+def write_delta(file_path, data, base_path):
+    """
+    Save data as a delta of a base snapshot file, only added, removed and changed entities are written.
+    :param file_path: where to save the delta snapshot (includes name)
+    :param data: JSON data to save
+    :param base_path: path of the base snapshot file (full or delta)
+    :return: the delta dictionary that was saved
+    """
+    file_path = os.path.abspath(file_path)
+    base_path = os.path.abspath(base_path)
+
+    delta = diff_snapshots(read_snapshot(base_path), data)
+    delta[SNAP.DELTA_KEY] = {SNAP.BASE_KEY: os.path.relpath(base_path, os.path.dirname(file_path))}
+
+    with open(file_path, 'w') as file:
+        json.dump(delta, file)
+
+    logger.info("Saved delta of `{}`: {}".format(os.path.basename(base_path), ", ".join(
+        "{} {} added, {} removed, {} changed".format(data_type, len(delta[data_type][SNAP.ADDED]),
+                                                     len(delta[data_type][SNAP.REMOVED]),
+                                                     len(delta[data_type][SNAP.CHANGED]))
+        for data_type in SNAP.DATA_TYPES)))
+    return delta
+
+
+def _record_order(record):
+    """Sort order of merged records: entity type, entity key, scrape time, then input order."""
+    return record[:4]
+
+
+def _write_run(records, tmp_dir):
+    """
+    Sort records in memory and write them as a run file of JSON lines
+    :return: path of the run file
+    """
+    records.sort(key=_record_order)
+    file_descriptor, path = tempfile.mkstemp(suffix='.jsonl', dir=tmp_dir)
+    with os.fdopen(file_descriptor, 'w') as file:
+        for record in records:
+            file.write(json.dumps(record) + '\n')
+    return path
+
+
+def _read_run(path):
+    """Stream the sorted records of a run file."""
+    with open(path, 'r') as file:
+        for line in file:
+            yield json.loads(line)
+
+
+def _merge_runs(paths, tmp_dir):
+    """
+    Merge sorted run files into a single sorted run file, merged files are removed
+    :return: path of the merged run file
+    """
+    file_descriptor, path = tempfile.mkstemp(suffix='.jsonl', dir=tmp_dir)
+    with os.fdopen(file_descriptor, 'w') as file:
+        for record in heapq.merge(*(_read_run(run) for run in paths), key=_record_order):
+            file.write(json.dumps(record) + '\n')
+
+    for run in paths:
+        os.remove(run)
+    return path
+
+
+def merge_snapshots(input_paths, output_path, output_format=None, run_size=SNAP.MERGE_RUN_SIZE,
+                    fan_in=SNAP.MERGE_FAN_IN, tmp_dir=None):
+    """
+    Merge snapshot files into a single snapshot with an external sort, so memory use does not grow with the input.
+    Records are sorted into run files of run_size records, which are then merged (fan_in at a time).
+    When an entity appears in several snapshots, the one scraped last (scraped_at) wins,
+    entities with equal (or without) scrape times are taken from the later input file.
+    :param input_paths: list of snapshot files (any format, full or delta), older first
+    :param output_path: where to save the merged snapshot (includes name)
+    :param output_format: json, jsonl or binary. Default: by file extension of output_path
+    :param tmp_dir: directory in which run files are temporarily created. Default: system temp dir.
+    :return: number of entities in the merged snapshot
+    """
+    type_index = {data_type: index for index, data_type in enumerate(SNAP.DATA_TYPES)}
+
+    with tempfile.TemporaryDirectory(prefix='thingscraper_merge_', dir=tmp_dir) as run_dir:
+        runs = []
+        records = []
+        order = 0
+
+        for path in input_paths:
+            logger.info("Sorting `{}`".format(path))
+            for data_type, key, properties in iter_records(path):
+                records.append([type_index[data_type], str(key), properties.get(SCRAPED_AT) or '', order, properties])
+                order += 1
+
+                if len(records) >= run_size:
+                    runs.append(_write_run(records, run_dir))
+                    records = []
+
+        if records:
+            runs.append(_write_run(records, run_dir))
+        logger.debug("{} records sorted into {} runs".format(order, len(runs)))
+
+        while len(runs) > fan_in:
+            runs = [_merge_runs(runs[i:i + fan_in], run_dir) for i in range(0, len(runs), fan_in)]
+
+        merged = heapq.merge(*(_read_run(run) for run in runs), key=_record_order)
+        with SnapshotWriter(output_path, output_format) as writer:
+            for (entity_type, key), versions in groupby(merged, key=lambda record: (record[0], record[1])):
+                for latest in versions:
+                    pass
+                writer.write(SNAP.DATA_TYPES[entity_type], key, latest[4])
+
+    logger.info("Merged {} records of {} snapshots into {} entities at `{}`".format(
+        order, len(input_paths), writer.written, output_path))
+    return writer.written
+
+
+def cli_set_arguments():
+    """
+    Adds arguments of the snapshots tool to parser obj
+    :return: The parser with the new arguments
+    """
+    parser = argparse.ArgumentParser(description="Create delta snapshots and rebuild full snapshots from them")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    diff_parser = commands.add_parser('diff', help='save a snapshot as a delta of a base snapshot')
+    diff_parser.add_argument('base', type=str, help='path of the base snapshot (full or delta)')
+    diff_parser.add_argument('snapshot', type=str, help='path of the newer snapshot (full or delta)')
+    diff_parser.add_argument('-o', '--output', type=str, required=True, help='path of the delta snapshot to save')
+
+    rebuild_parser = commands.add_parser('rebuild', help='rebuild the full snapshot of a base and delta chain')
+    rebuild_parser.add_argument('snapshot', type=str, help='path of the delta snapshot')
+    rebuild_parser.add_argument('-o', '--output', type=str, required=True, help='path of the full snapshot to save')
+
+    merge_parser = commands.add_parser('merge', help='merge snapshots, the latest scraped version of an entity wins')
+    merge_parser.add_argument('snapshots', type=str, nargs='+', help='paths of the snapshots to merge, older first')
+    merge_parser.add_argument('-o', '--output', type=str, required=True, help='path of the merged snapshot to save')
+    merge_parser.add_argument('-f', '--format', type=str, choices=sorted(set(SNAP.FORMATS.values())), default=None,
+                              help='format of the merged snapshot. Default: by the output file extension')
+    merge_parser.add_argument('--run-size', type=int, default=SNAP.MERGE_RUN_SIZE,
+                              help='number of records sorted in memory at once')
+    return parser
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format=gconf.Logs.FORMAT_STREAM)
+    args = cli_set_arguments().parse_args()
+
+    if args.command == 'diff':
+        write_delta(args.output, read_snapshot(args.snapshot), args.base)
+    elif args.command == 'rebuild':
+        write_snapshot(args.output, read_snapshot(args.snapshot))
+        logger.info("Saved rebuilt snapshot `{}`".format(args.output))
+    else:
+        merge_snapshots(args.snapshots, args.output, output_format=args.format, run_size=args.run_size)
+
+
+if __name__ == '__main__':
+    main()
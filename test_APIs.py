@@ -1,5 +1,10 @@
 import APIs
+import json
 import logging
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
 import general_config as gconf
 
 
@@ -25,10 +30,10 @@ def test_enrich_things_with_google_ktree_sample_run():
     print(len(data))
 
 
-def test_enrich_things_with_google_ktree_len_conservation():
+def test_enrich_things_with_google_ktree_len_conservation(tmp_path):
     data = sample_data["things"].copy()
     L = len(data)
-    APIs.enrich_things_with_google_ktree(data)
+    APIs.enrich_things_with_google_ktree(data, cache_path=str(tmp_path / "ktree_cache.json"))
     L_new = len(data)
     assert L == L_new
 
@@ -51,3 +56,79 @@ def test_query_google_ktree_has_dicts():
 
 def test_parse_data_from_ktree_list():
     pass
+
+
+class MockKtreeHandler(BaseHTTPRequestHandler):
+    """Answers knowledge tree searches with a single result named after the query, and counts them."""
+    queries = []
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)['query'][0]
+        MockKtreeHandler.queries.append(query)
+        body = {"itemListElement": [{"@type": "EntitySearchResult",
+                                     "result": {"@id": "kg:/m/" + query, "name": query, "@type": ["Thing"],
+                                                "detailedDescription": {"articleBody": "About " + query}},
+                                     "resultScore": 10}]}
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(json.dumps(body).encode())
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def mock_ktree(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockKtreeHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(gconf.google_ktree, "api_address", f"http://127.0.0.1:{server.server_port}/search?")
+    MockKtreeHandler.queries = []
+    yield MockKtreeHandler.queries
+    server.shutdown()
+
+
+def test_enrich_things_with_google_ktree_one_query_per_name(mock_ktree, tmp_path):
+    data = {"1": {"model_name": "brick"}, "2": {"model_name": "brick"}, "3": {"model_name": "maya"}}
+    APIs.enrich_things_with_google_ktree(data, cache_path=str(tmp_path / "ktree_cache.json"))
+    assert sorted(mock_ktree) == ["brick", "maya"]
+    assert data["2"]["ktree_data"][0]["name"] == "brick"
+    assert data["3"]["ktree_data"][0]["id"] == "kg:/m/maya"
+
+
+def test_enrich_things_with_google_ktree_cached(mock_ktree, tmp_path):
+    cache_path = str(tmp_path / "ktree_cache.json")
+    APIs.enrich_things_with_google_ktree({"1": {"model_name": "brick"}}, cache_path=cache_path)
+
+    data = {"1": {"model_name": "brick"}, "2": {"model_name": "Uno Box Holder"}}
+    APIs.enrich_things_with_google_ktree(data, cache_path=cache_path)
+    assert mock_ktree == ["brick", "Uno Box Holder"]
+    assert data["1"]["ktree_data"][0]["name"] == "brick"
+
+
+def test_enrich_things_with_google_ktree_incremental(mock_ktree, tmp_path):
+    data = {"1": {"model_name": "brick", "ktree_data": [{"name": "brick"}]},
+            "2": {"model_name": "maya", "ktree_data": [], "ktree_fetched_at": "2000-01-01T00:00:00"},
+            "3": {"model_name": "jig"}}
+    APIs.enrich_things_with_google_ktree(data, cache_path=str(tmp_path / "ktree_cache.json"))
+    assert sorted(mock_ktree) == ["jig", "maya"]
+    assert data["1"]["ktree_data"] == [{"name": "brick"}]
+    assert not APIs.needs_enrichment(data["2"]) and not APIs.needs_enrichment(data["3"])
+
+
+def test_background_enricher(mock_ktree, tmp_path):
+    things = {"1": {"model_name": "brick"}, "2": {"model_name": "maya"}}
+    with APIs.BackgroundEnricher(batch_size=1, cache_path=str(tmp_path / "ktree_cache.json")) as enricher:
+        for thing_id, thing in things.items():
+            enricher.submit(thing_id, thing)
+    assert sorted(mock_ktree) == ["brick", "maya"]
+    assert things["2"]["ktree_data"][0]["name"] == "maya"
+
+
+def test_response_cache_creates_its_directory(tmp_path):
+    path = str(tmp_path / "Cache" / "ktree_cache.json")
+    with APIs.ResponseCache(path) as cache:
+        cache.store("brick", [{"name": "brick"}])
+
+    with APIs.ResponseCache(path) as cache:
+        assert cache.lookup("brick") == (True, [{"name": "brick"}])
@@ -0,0 +1,61 @@
+import os
+
+import pytest
+from selenium.common.exceptions import WebDriverException
+
+import main
+from ThingScraper import Thing, process_tree_memory
+from fake_browser import FakeBrowser
+from benchmarks.fake_site import site_pages, thing_model, FIRST_THING_ID
+
+
+class DeadDriver:
+    """
+    A driver whose session died: every call fails.
+    """
+
+    def __getattr__(self, name):
+        raise WebDriverException("chrome not reachable")
+
+
+def test_recycle_after_navigations():
+    browser = FakeBrowser(site_pages(), recycle_after=2)
+    drivers = []
+    for thing_id in range(FIRST_THING_ID, FIRST_THING_ID + 5):
+        thing = Thing(thing_id=thing_id, browser=browser)
+        thing.fetch_all()
+        thing.parse_all()
+        assert thing['model_name'] == thing_model(thing_id)['model_name']
+        drivers.append(browser.driver)
+
+    assert browser.restarts == 2
+    assert len(set(map(id, drivers))) == 3
+
+
+def test_dead_session_is_restarted_and_entity_scraped_again():
+    browser = FakeBrowser(site_pages())
+    settings = {'browser_obj': browser}
+    browser.driver = DeadDriver()
+
+    thing = Thing(thing_id=FIRST_THING_ID)
+    main.retry_on_dead_browser(settings, main.fetch_and_parse, thing, browser)
+    assert browser.restarts == 1 and browser.is_alive()
+    assert thing['model_name'] == thing_model(FIRST_THING_ID)['model_name']
+
+
+def test_failure_of_live_session_is_not_retried():
+    browser = FakeBrowser(site_pages())
+    calls = []
+
+    def failing():
+        calls.append(1)
+        raise ValueError("unexpected page")
+
+    with pytest.raises(ValueError):
+        main.retry_on_dead_browser({'browser_obj': browser}, failing)
+    assert calls == [1] and browser.restarts == 0
+
+
+@pytest.mark.skipif(not os.path.isdir('/proc'), reason="process memory is read from /proc")
+def test_process_tree_memory():
+    assert process_tree_memory(os.getpid()) > 1
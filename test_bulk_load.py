@@ -0,0 +1,82 @@
+import pytest
+
+from Database import bulk_load
+from Database.bulk_load import TABLE_COLUMNS, _stage_rows, _write_tsv
+from ThingScraper import Thing, Make
+from benchmarks.corpus import generate_corpus
+
+
+class LoadDataCursor:
+    """
+    Cursor of a mysql server running LOAD DATA: counts the rows of staged files, skipping the `skipped` first ones
+    with a warning for each.
+    """
+
+    def __init__(self, skipped=0):
+        self.skipped = skipped
+        self.warnings = []
+
+    def execute(self, query, args=None):
+        if query.startswith("SHOW WARNINGS"):
+            self.rows, self.warnings = self.warnings, []
+            return len(self.rows)
+        if "LOAD DATA" not in query:
+            return 0
+        with open(args[0], encoding="utf-8") as file:
+            lines = file.read().splitlines()
+        skipped = min(self.skipped, len(lines))
+        self.warnings = [{"Level": "Warning", "Code": 1062, "Message": "Duplicate entry"}] * skipped
+        return len(lines) - skipped
+
+    def fetchall(self):
+        return self.rows
+
+
+def test_staged_rows_match_columns():
+    rows = _stage_rows(generate_corpus(300))
+    ids = {table: {row[0] for row in rows[table]} for table, _ in TABLE_COLUMNS}
+
+    for table, columns in TABLE_COLUMNS:
+        assert rows[table] and all(len(row) == len(columns) for row in rows[table]), table
+
+    def column(table, name):
+        index = dict(TABLE_COLUMNS)[table].index(name)
+        return {row[index] for row in rows[table]} - {None}
+
+    # every staged foreign key references a staged row
+    assert column("things", "user_id") <= ids["users"]
+    assert column("things", "remix_id") <= ids["things"]
+    assert column("things", "setting_id") | column("makes", "setting_id") <= ids["print_settings"]
+    assert column("makes", "thing_id") <= ids["things"]
+    assert column("thing_tag", "tag_id") <= ids["tags"] and column("thing_tag", "thing_id") <= ids["things"]
+    assert column("user_title", "title_id") <= ids["titles"] and column("user_title", "user_id") <= ids["users"]
+
+
+def test_tsv_escapes_values(tmp_path):
+    path = tmp_path / "things.tsv"
+    _write_tsv(path, [(1, "tab\there", None), (2, "new\nline \\ back", 0.2)])
+
+    lines = path.read_text(encoding="utf-8").split("\n")
+    assert lines == ["1\ttab\\there\t\\N", "2\tnew\\nline \\\\ back\t0.2", ""]
+
+
+def test_bulk_load_checks_loaded_rows():
+    data = generate_corpus(50)
+    bulk_load.bulk_load(LoadDataCursor(), data)
+
+    with pytest.raises(RuntimeError, match="loaded .* staged rows with 1 warnings: Duplicate entry"):
+        bulk_load.bulk_load(LoadDataCursor(skipped=1), data)
+
+
+def test_malformed_entities_are_skipped():
+    data = generate_corpus(50)
+    thing_key, thing = next(iter(data['things'].items()))
+    make = next(iter(data['makes'].values()))
+    del thing[Thing.PROPERTIES.THING_ID], make[Make.PROPERTIES.THING_ID]
+
+    # the malformed thing and make are skipped (with the makes of the skipped thing), the rest is staged
+    rows = _stage_rows(data)
+    assert len(rows['things']) == len(data['things']) - 1
+    assert {row[1] for row in rows['makes']} == {
+        other[Make.PROPERTIES.MAKE_ID] for other in data['makes'].values()
+        if other is not make and str(other[Make.PROPERTIES.THING_ID]) != thing_key}
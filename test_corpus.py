@@ -0,0 +1,35 @@
+import sqlite3
+
+from Database.build_db import build_database
+from snapshots import iter_records
+from benchmarks.corpus import generate_corpus, write_corpus
+
+
+def test_corpus_is_deterministic_and_consistent(tmp_path):
+    data = generate_corpus(500, seed=3)
+    assert data == generate_corpus(500, seed=3)
+    assert len(data["things"]) == 500 and data["users"] and data["makes"]
+
+    # every reference points to an entity of the corpus
+    for thing in data["things"].values():
+        assert thing["username"] in data["users"]
+        assert thing["remix"] is None or thing["remix"] in data["things"]
+    for make in data["makes"].values():
+        assert make["thingiverse_id"] in data["things"] and make["username"] in data["users"]
+
+    file_path = str(tmp_path / "corpus.jsonl")
+    assert write_corpus(file_path, 500, seed=3) == sum(len(entities) for entities in data.values())
+    assert {(data_type, key) for data_type, key, _ in iter_records(file_path)} == \
+        {(data_type, key) for data_type in data for key in data[data_type]}
+
+
+def test_corpus_builds_database(tmp_path):
+    data = generate_corpus(300)
+    db_name = str(tmp_path / "corpus")
+    build_database(data, db_name, backend="sqlite")
+
+    connection = sqlite3.connect(db_name + ".db")
+    assert connection.execute("SELECT COUNT(*) FROM things").fetchone() == (300,)
+    assert connection.execute("SELECT COUNT(*) FROM makes").fetchone() == (len(data["makes"]),)
+    assert connection.execute("SELECT COUNT(*) FROM things WHERE remix_id IS NOT NULL").fetchone()[0] > 0
+    connection.close()
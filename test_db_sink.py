@@ -0,0 +1,51 @@
+import sqlite3
+
+from Database.db_sink import DatabaseSink
+from test_sqlite_backend import sample_data
+
+
+def test_entities_arriving_out_of_order(tmp_path):
+    data = sample_data(likes=10)
+    thing = data["things"]["4760325"]
+    remix = dict(thing, thing_id="4760326", remix="4760325", tags=None)
+    make = {"make_id": "9000001", "thingiverse_id": "4760325", "username": "maya", "uploaded": "2021-04-01",
+            "like": 1, "comments": 0, "share": 0, "views": 10, "category": "games", "print_settings": None}
+    db_name = str(tmp_path / "thingiverse")
+
+    # every entity is written on its own: the make before its thing, the remix before the thing it remixes,
+    # and the user last, as in the 'all' action
+    with DatabaseSink(db_name, batch_size=1, backend="sqlite") as sink:
+        sink.push("makes", "9000001", make)
+        sink.push("things", "4760326", remix)
+        sink.push("things", "4760325", thing)
+        sink.push("users", "maya", data["users"]["maya"])
+    assert sink.written == 4 and sink.failed == 0
+
+    connection = sqlite3.connect(db_name + ".db")
+    assert connection.execute("SELECT COUNT(*), COUNT(user_id), COUNT(remix_id) FROM things").fetchone() == (2, 2, 1)
+    assert connection.execute("SELECT t.thigiverse_id, m.user_id IS NOT NULL FROM makes AS m "
+                              "JOIN things AS t ON t.thing_id = m.thing_id").fetchall() == [(4760325, 1)]
+    assert connection.execute("SELECT remixes FROM remix_stats").fetchall() == [(1,)]
+    connection.close()
+
+
+def test_makes_waiting_for_their_thing_are_capped(tmp_path):
+    data = sample_data(likes=10)
+    make = {"make_id": "9000001", "thingiverse_id": "4760399", "username": "maya", "uploaded": "2021-04-01",
+            "like": 1, "comments": 0, "share": 0, "views": 10, "category": "games", "print_settings": None}
+
+    with DatabaseSink(str(tmp_path / "thingiverse"), batch_size=1, max_orphans=1, backend="sqlite") as sink:
+        sink.push("makes", "9000001", make)
+        sink.push("makes", "9000002", dict(make, make_id="9000002"))
+        sink.push("users", "maya", data["users"]["maya"])
+    assert not sink.ok and sink.failed == 1
+
+
+def test_sink_that_cannot_connect_stops_queueing(tmp_path):
+    data = sample_data(likes=10)
+
+    with DatabaseSink(str(tmp_path / "missing" / "thingiverse"), backend="sqlite") as sink:
+        sink._thread.join()
+        sink.push("users", "maya", data["users"]["maya"])
+        assert sink._queue.empty()
+    assert not sink.ok and sink.written == 0
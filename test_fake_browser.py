@@ -0,0 +1,68 @@
+import pytest
+from selenium.common.exceptions import NoSuchElementException
+from selenium.webdriver.common.by import By
+
+from ThingScraper import Thing, Make, User
+from fake_browser import FakeBrowser, FakeDriver
+from benchmarks.fake_site import site_pages, thing_model, FIRST_THING_ID
+
+
+@pytest.fixture
+def browser():
+    return FakeBrowser(site_pages())
+
+
+@pytest.mark.parametrize("thing_id", range(FIRST_THING_ID, FIRST_THING_ID + 10))
+def test_parse_thing(browser, thing_id):
+    thing = Thing(thing_id=thing_id, browser=browser)
+    thing.fetch_all()
+    thing.parse_all()
+
+    model = thing_model(thing_id)
+    for name in ('model_name', 'username', 'thing_files', 'comments', 'makes', 'remixes', 'license', 'remix',
+                 'category'):
+        assert thing[name] == model[name]
+    assert thing['tags'] == (model['tags'] or None)
+    assert thing['uploaded'] == model['uploaded'].strftime('%Y-%m-%dT00:00:00')
+    if model['print_settings'] is None:
+        assert thing['print_settings'] is None
+    else:
+        assert thing['print_settings']['printer_model'] == model['print_settings']['Printer Model'].lower()
+        assert thing['print_settings']['infill'] == model['print_settings']['Infill']
+
+
+def test_parse_make_and_user(browser):
+    make = Make(make_id=FIRST_THING_ID * 10 + 1, browser=browser)
+    make.fetch_all()
+    make.parse_all()
+    assert make['thingiverse_id'] == str(FIRST_THING_ID)
+    assert make['username'].startswith('maker')
+    assert isinstance(make['views'], int) and make['print_settings']['infill'] == '20%'
+
+    user = User(username=make['username'], browser=browser)
+    user.fetch_all()
+    user.parse_all()
+    assert isinstance(user['followers'], int) and user['skill_level'] in ('novice', 'intermediate', 'expert')
+    assert user['titles']
+
+
+def test_get_makes(browser):
+    thing = Thing(thing_id=FIRST_THING_ID, browser=browser)
+    thing.fetch_all()
+    thing.parse_all()
+    assert thing.get_makes() == {str(FIRST_THING_ID * 10 + i) for i in range(thing['makes'])}
+
+
+def test_fake_driver_elements():
+    url = "https://www.thingiverse.com/thing:1"
+    driver = FakeDriver({url: '<html><body><div class="a b"><p>one <b>two</b><br>three</p>'
+                              '<a href="/make:2">link</a></div></body></html>'})
+    driver.get(url)
+    element = driver.find_element(By.CLASS_NAME, 'b')
+    assert element.text == "one two\nthree\nlink"
+    assert element.find_element_by_tag_name('p').get_attribute('innerHTML') == "one <b>two</b><br>three"
+    assert element.find_element_by_tag_name('a').get_attribute('href') == "https://www.thingiverse.com/make:2"
+    assert element.find_element_by_xpath('..').tag_name == 'body'
+    assert driver.find_elements_by_class_name('c') == []
+    with pytest.raises(NoSuchElementException):
+        element.find_element_by_class_name('a')
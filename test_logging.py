@@ -0,0 +1,30 @@
+import argparse
+import json
+import logging
+
+import general_config as gconf
+import main
+
+
+def test_queued_json_log(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    log = logging.getLogger("thingscraper.test")
+    listener = main.setup_log(log, argparse.Namespace(volume=0, log_format="json"))
+    try:
+        # debug calls are dropped by the logger itself at normal volume
+        assert not log.isEnabledFor(logging.DEBUG)
+        log.debug("not written %s", 1)
+        log.info("%d things scraped", 20)
+        try:
+            raise ValueError("no page")
+        except ValueError:
+            log.exception("Failed to scrape %s", "4760325")
+    finally:
+        listener.stop()
+        log.handlers.clear()
+
+    log_files = list((tmp_path / gconf.Logs.LOG_DIR).glob("*" + gconf.Logs.EXTENSION_JSON))
+    entries = [json.loads(line) for line in log_files[0].read_text().splitlines()]
+    assert [entry["message"].split("\n")[0] for entry in entries] == ["logger has been setup successfully",
+                                                                      "20 things scraped", "Failed to scrape 4760325"]
+    assert entries[2]["level"] == "ERROR" and "ValueError: no page" in entries[2]["message"]
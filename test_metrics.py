@@ -0,0 +1,29 @@
+import metrics
+
+
+def test_prometheus_text_format():
+    registry = metrics.Registry(prefix="test_")
+    registry.counter("entities_total", "Scraped entities").inc(entity="thing", status="success")
+    registry.counter("entities_total").inc(2, entity="thing", status="success")
+    histogram = registry.histogram("fetch_seconds")
+    histogram.observe(0.2, entity="thing")
+    histogram.observe(3, entity="thing")
+
+    lines = registry.render().splitlines()
+    assert "# HELP test_entities_total Scraped entities" in lines
+    assert 'test_entities_total{entity="thing",status="success"} 3' in lines
+    assert 'test_fetch_seconds_bucket{entity="thing",le="0.25"} 1' in lines
+    assert 'test_fetch_seconds_bucket{entity="thing",le="+Inf"} 2' in lines
+    assert 'test_fetch_seconds_count{entity="thing"} 2' in lines
+    assert histogram.stats()[(("entity", "thing"),)][:2] == (2, 3.2)
+
+
+def test_timed_decorator():
+    @metrics.timed("test_decorated_seconds", phase="test")
+    def work():
+        return 1
+
+    assert work() == 1 and work() == 1
+    stats = metrics.REGISTRY.histogram("test_decorated_seconds").stats()
+    assert stats[(("phase", "test"),)][0] == 2
+    assert "test_decorated_seconds" in metrics.summary()
@@ -0,0 +1,24 @@
+import os
+import pstats
+import time
+
+import profiling
+
+
+def work():
+    return sorted(str(i) for i in range(20000))
+
+
+def test_profiler_writes_phase_and_run_profiles(tmp_path):
+    directory = str(tmp_path / "profiles")
+    with profiling.Profiler(directory, sample_interval=0.001, trace_memory=True) as profiler:
+        with profiler.phase("thing"):
+            work()
+        with profiler.phase("save_json"):
+            time.sleep(0.02)
+
+    assert sorted(os.listdir(directory)) == ["01_thing.prof", "02_save_json.prof", "main.prof", "memory.txt",
+                                             "stacks.folded"]
+    functions = {function for _, _, function in pstats.Stats(os.path.join(directory, "main.prof")).stats}
+    assert "work" in functions
+    assert os.path.getsize(os.path.join(directory, "stacks.folded")) > 0
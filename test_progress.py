@@ -0,0 +1,41 @@
+import io
+import logging
+
+import general_config as gconf
+import progress
+
+
+def test_format_duration():
+    assert progress.format_duration(None) == "?"
+    assert progress.format_duration(75.6) == "1:15"
+    assert progress.format_duration(3725) == "1:02:05"
+
+
+def test_status_line_on_tty(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(progress.time, "monotonic", lambda: now[0])
+    stream = io.StringIO()
+    report = progress.Progress("thing", 10, stream=stream, tty=True, refresh=0, window=2)
+    for failed in (False, True, False):
+        now[0] += 1
+        report.update(failed=failed)
+    now[0] += 1
+
+    # rate over the last 2 entities: 2 entities in 2 seconds, 7 entities left
+    assert report.rate() == 1
+    assert report.eta() == 7
+    assert stream.getvalue().count("\r") == 3
+    assert stream.getvalue().endswith("thing: 3/10 (30%) | 1.00/s | failed 1 (33.3%) | elapsed 0:03 | ETA 0:07\x1b[K")
+
+
+def test_log_lines_when_not_tty(caplog):
+    stream = io.StringIO()
+    with caplog.at_level(logging.INFO, logger=gconf.Logs.LOGGER_NAME):
+        with progress.Progress("user", None, stream=stream, tty=False, log_interval=3600) as report:
+            for _ in range(5):
+                report.update()
+
+    # throttled to the final report, nothing on the stream
+    assert stream.getvalue() == ""
+    assert [record.getMessage().split(" | ")[0] for record in caplog.records] == ["user: 5"]
+    assert report.eta() is None
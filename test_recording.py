@@ -0,0 +1,37 @@
+import os
+
+from ThingScraper import Thing, Make
+from fake_browser import FakeBrowser
+from recording import PageRecorder, RecordedPages, page_file_name
+from benchmarks.fake_site import site_pages, FIRST_THING_ID
+
+
+def scrape(browser):
+    results = []
+    for scraped in (Thing(thing_id=FIRST_THING_ID, browser=browser), Make(make_id=FIRST_THING_ID * 10, browser=browser),
+                    Thing(thing_id=FIRST_THING_ID + 1, browser=browser)):
+        scraped.fetch_all()
+        scraped.parse_all()
+        del scraped.properties['scraped_at']
+        results.append(scraped.properties)
+    return results
+
+
+def test_page_file_name():
+    assert page_file_name("https://www.thingiverse.com/thing:1/makes") == page_file_name("/thing:1/makes")
+    assert page_file_name("https://www.thingiverse.com/search?page=2&sort=p") == "search%3Fpage%3D2%26sort%3Dp.html"
+
+
+def test_record_and_replay(tmp_path):
+    with FakeBrowser(site_pages()) as browser:
+        browser.recorder = PageRecorder(str(tmp_path))
+        recorded = scrape(browser)
+    assert browser.recorder.pages == 3
+    urls = [Thing(thing_id=FIRST_THING_ID).url, Thing(thing_id=FIRST_THING_ID + 1).url,
+            Make(make_id=FIRST_THING_ID * 10).url]
+    assert sorted(os.listdir(tmp_path)) == sorted(page_file_name(url) for url in urls)
+
+    pages = RecordedPages(str(tmp_path))
+    with FakeBrowser(pages) as browser:
+        assert scrape(browser) == recorded
+    assert not pages.missing
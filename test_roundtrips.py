@@ -0,0 +1,44 @@
+from selenium.webdriver.remote.webelement import WebElement
+
+from roundtrips import RoundTripStats, CountingDriver
+
+
+class FakeElement(WebElement):
+    @property
+    def text(self):
+        return "Uno Box Holder"
+
+    def get_attribute(self, name):
+        return "https://www.thingiverse.com/thing:4760325"
+
+
+class FakeDriver:
+    def get(self, url):
+        pass
+
+    def find_elements(self, by, name):
+        return [FakeElement(self, "1"), FakeElement(self, "2")]
+
+
+class FakeThing:
+    url = "https://www.thingiverse.com/thing:4760325"
+
+    def __init__(self, driver):
+        self.driver = driver
+
+    def _fetch_model_name(self):
+        return [element.text for element in self.driver.find_elements("class name", "card")]
+
+
+def test_roundtrips_attributed_to_steps():
+    stats = RoundTripStats()
+    driver = CountingDriver(FakeDriver(), stats)
+    driver.get(FakeThing.url)
+    assert FakeThing(driver)._fetch_model_name() == ["Uno Box Holder"] * 2
+
+    totals = stats.totals()
+    assert totals["test_roundtrips_attributed_to_steps"][2] == {"navigation": 1}
+    assert totals["FakeThing._fetch_model_name"][0] == 3
+    assert totals["FakeThing._fetch_model_name"][2] == {"find": 1, "text": 2}
+    assert stats.entities[FakeThing.url][0] == 3
+    assert "FakeThing._fetch_model_name" in stats.report()
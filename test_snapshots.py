@@ -0,0 +1,60 @@
+import json
+import snapshots
+
+
+base_data = {"things": {"1": {"model_name": "Uno Box Holder", "likes": 10},
+                        "2": {"model_name": "Pocket hole jig", "likes": 3}},
+             "users": {"maya": {"username": "maya", "followers": 5}},
+             "makes": dict()}
+
+new_data = {"things": {"1": {"model_name": "Uno Box Holder", "likes": 12, "remixes": 1},
+                       "3": {"model_name": "brick", "likes": 0}},
+            "users": {"maya": {"username": "maya", "followers": 5}},
+            "makes": {"7": {"make_id": "7", "likes": 1}}}
+
+
+def test_diff_snapshots_only_changes():
+    delta = snapshots.diff_snapshots(base_data, new_data)
+    assert delta["things"]["added"] == {"3": new_data["things"]["3"]}
+    assert delta["things"]["removed"] == ["2"]
+    assert delta["things"]["changed"] == {"1": {"set": {"likes": 12, "remixes": 1}, "unset": []}}
+    assert delta["users"] == {"added": {}, "removed": [], "changed": {}}
+
+
+def test_apply_delta_rebuilds_snapshot():
+    delta = snapshots.diff_snapshots(base_data, new_data)
+    assert snapshots.apply_delta(base_data, delta) == new_data
+    assert base_data["things"]["1"]["likes"] == 10
+
+
+def test_read_snapshot_delta_chain(tmp_path):
+    base_path = tmp_path / "base.json"
+    base_path.write_text(json.dumps(base_data))
+
+    newest_data = snapshots.apply_delta(new_data, {"users": {"removed": ["maya"]}})
+    snapshots.write_delta(str(tmp_path / "delta_1.json"), new_data, str(base_path))
+    snapshots.write_delta(str(tmp_path / "delta_2.json"), newest_data, str(tmp_path / "delta_1.json"))
+
+    assert snapshots.read_snapshot(str(tmp_path / "delta_1.json")) == new_data
+    assert snapshots.read_snapshot(str(tmp_path / "delta_2.json")) == newest_data
+
+
+def test_merge_snapshots_latest_scrape_wins(tmp_path):
+    older = {"things": {"1": {"likes": 1, "scraped_at": "2021-04-02T10:00:00"},
+                        "2": {"likes": 5, "scraped_at": "2021-04-02T10:00:00"}},
+             "users": dict(), "makes": dict()}
+    newer = {"things": {"1": {"likes": 2, "scraped_at": "2021-04-03T10:00:00"}},
+             "users": {"maya": {"followers": 5}},
+             "makes": dict()}
+    snapshots.write_snapshot(str(tmp_path / "newer.snap"), newer)
+    snapshots.write_snapshot(str(tmp_path / "older.jsonl"), older)
+
+    for output in ("merged.json", "merged.jsonl", "merged.snap"):
+        count = snapshots.merge_snapshots([str(tmp_path / "newer.snap"), str(tmp_path / "older.jsonl")],
+                                          str(tmp_path / output), run_size=1, fan_in=2)
+        merged = snapshots.read_snapshot(str(tmp_path / output))
+        assert count == 3
+        assert merged["things"]["1"]["likes"] == 2
+        assert merged["things"]["2"]["likes"] == 5
+        assert merged["users"] == newer["users"]
+        assert merged["makes"] == dict()
@@ -0,0 +1,172 @@
+import datetime
+import json
+import os
+import sqlite3
+
+import pytest
+
+import Database.db_queries as dbq
+from Database import build_db
+from Database.build_db import build_database
+
+
+print_settings = {"printer_brand": "creality", "printer_model": "ender 3", "rafts": "no", "supports": "yes",
+                  "resolution": "0.2", "infill": "20", "filament_brand": None, "filament_color": None,
+                  "filament_material": "pla"}
+
+
+def sample_data(likes):
+    return {"users": {"maya": {"username": "maya", "followers": 1, "following": 2, "designs": 3, "collections": 0,
+                               "makes": 1, "likes": likes, "skill_level": None, "titles": ["designer"]}},
+            "things": {"4760325": {"thing_id": "4760325", "model_name": "Uno Box Holder", "username": "maya",
+                                   "uploaded": "2021-03-30", "thing_files": 1, "comments": 0, "makes": 1,
+                                   "remixes": 0, "likes": likes, "tags": ["box", "uno"],
+                                   "print_settings": print_settings, "license": "CC", "remix": None,
+                                   "category": "Games"}},
+            "makes": dict()}
+
+
+def test_build_sqlite_database_upserts(tmp_path):
+    db_name = str(tmp_path / "thingiverse")
+    build_database(sample_data(likes=10), db_name, backend="sqlite")
+    build_database(sample_data(likes=12), db_name, drop_existing=False, backend="sqlite")
+
+    connection = sqlite3.connect(db_name + ".db")
+    assert connection.execute("SELECT likes FROM things").fetchall() == [(12,)]
+    assert connection.execute("SELECT COUNT(*) FROM thing_tag").fetchone() == (2,)
+    assert connection.execute("SELECT COUNT(*) FROM print_settings").fetchone() == (1,)
+    assert connection.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+    connection.close()
+
+
+def test_aggregates_refreshed_incrementally(tmp_path):
+    db_name = str(tmp_path / "thingiverse")
+    build_database(sample_data(likes=10), db_name, backend="sqlite")
+
+    data = sample_data(likes=15)
+    data["things"]["4760325"]["category"] = "Toys"
+    data["things"]["4760325"]["tags"] = ["box"]
+    build_database(data, db_name, drop_existing=False, backend="sqlite")
+
+    connection = sqlite3.connect(db_name + ".db")
+    assert connection.execute("SELECT * FROM category_stats").fetchall() == [("Toys", 1, 15, 1)]
+    assert connection.execute("SELECT t.tag, s.things, s.likes FROM tag_stats AS s "
+                              "JOIN tags AS t ON t.tag_id = s.tag_id").fetchall() == [("box", 1, 15)]
+    connection.close()
+
+
+def test_remix_chain_in_one_batch(tmp_path):
+    data = sample_data(likes=10)
+    original = data["things"]["4760325"]
+    # remixes of remixes, listed before the thing they remix
+    for thing_id, remix in [("4760328", "4760327"), ("4760327", "4760326"), ("4760326", "4760325")]:
+        data["things"][thing_id] = dict(original, thing_id=thing_id, remix=remix, tags=None)
+    db_name = str(tmp_path / "thingiverse")
+    build_database(data, db_name, backend="sqlite")
+
+    connection = sqlite3.connect(db_name + ".db")
+    remixes = connection.execute("SELECT t.thigiverse_id, s.thigiverse_id FROM things AS t "
+                                 "JOIN things AS s ON s.thing_id = t.remix_id ORDER BY t.thigiverse_id").fetchall()
+    assert remixes == [(4760326, 4760325), (4760327, 4760326), (4760328, 4760327)]
+    assert connection.execute("SELECT SUM(remixes), COUNT(*) FROM remix_stats").fetchone() == (3, 3)
+    connection.close()
+
+
+def test_failed_chunk_is_retried(tmp_path, monkeypatch):
+    insert_users = build_db._insert_users
+    calls = []
+
+    def fail_once(users, cur, id_maps):
+        # the ids read back by the rolled back attempt must not be used by later stages
+        insert_users(users, cur, id_maps)
+        calls.append(dict(id_maps["users"]))
+        if len(calls) == 1:
+            raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(build_db, "_insert_users", fail_once)
+    db_name = str(tmp_path / "thingiverse")
+    build_database(sample_data(likes=10), db_name, backend="sqlite")
+
+    connection = sqlite3.connect(db_name + ".db")
+    assert len(calls) == 2
+    assert connection.execute("SELECT u.username FROM things AS t "
+                              "JOIN users AS u ON u.user_id = t.user_id").fetchall() == [("maya",)]
+    connection.close()
+
+
+def test_chunk_that_keeps_failing_fails_the_build(tmp_path, monkeypatch):
+    def failing(users, cur, id_maps):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(build_db, "_insert_users", failing)
+    with pytest.raises(RuntimeError, match="Users: 1 of 1 chunks"):
+        build_database(sample_data(likes=10), str(tmp_path / "thingiverse"), backend="sqlite")
+
+
+def test_deterministic_chunk_failure_is_not_retried(tmp_path, monkeypatch):
+    calls = []
+
+    def failing(users, cur, id_maps):
+        calls.append(users)
+        raise KeyError("followers")
+
+    monkeypatch.setattr(build_db, "_insert_users", failing)
+    with pytest.raises(KeyError, match="followers"):
+        build_database(sample_data(likes=10), str(tmp_path / "thingiverse"), backend="sqlite")
+    assert len(calls) == 1
+
+
+def test_chunk_maps_keep_new_ids_apart():
+    id_maps = {"users": {"maya": 1}, build_db.TOUCHED: {"category_stats": {"Games"}}}
+    chunk_maps = build_db._chunk_maps(id_maps)
+    chunk_maps["users"]["noa"] = 2
+    chunk_maps[build_db.TOUCHED]["category_stats"].add("Toys")
+    assert chunk_maps["users"]["maya"] == 1
+    assert id_maps == {"users": {"maya": 1}, build_db.TOUCHED: {"category_stats": {"Games"}}}
+
+    build_db._merge_chunk_maps(id_maps, chunk_maps)
+    assert id_maps == {"users": {"maya": 1, "noa": 2}, build_db.TOUCHED: {"category_stats": {"Games", "Toys"}}}
+
+
+def test_likes_velocity_is_last_minus_first_likes(tmp_path):
+    db_name = str(tmp_path / "thingiverse")
+    now = datetime.datetime.utcnow().replace(microsecond=0)
+    # likes peak early then fall: growth over the window is 20 - 10 over 2 days
+    for days_ago, likes in ((3, 10), (2, 50), (1, 20)):
+        data = sample_data(likes)
+        data["things"]["4760325"]["scraped_at"] = (now - datetime.timedelta(days=days_ago)).isoformat()
+        build_database(data, db_name, drop_existing=False, backend="sqlite")
+
+    connection, _, _ = build_db._open_database(db_name, False, backend="sqlite")
+    cur = connection.cursor()
+    cur.execute(dbq.LIKES_VELOCITY, [7, 10])
+    assert [(row["thigiverse_id"], row["likes_per_day"]) for row in cur.fetchall()] == [(4760325, 5.0)]
+    connection.close()
+
+
+def test_metrics_history_needs_a_scrape_time(tmp_path):
+    db_name = str(tmp_path / "thingiverse")
+    build_database(sample_data(likes=10), db_name, backend="sqlite")
+
+    # a snapshot file older than the history tables is stamped with its modification time
+    snapshot = tmp_path / "snapshot.json"
+    snapshot.write_text(json.dumps(sample_data(likes=12)))
+    os.utime(snapshot, (0, 1600000000))
+    build_database(str(snapshot), db_name, drop_existing=False, backend="sqlite")
+
+    connection = sqlite3.connect(db_name + ".db")
+    stamped = datetime.datetime.fromtimestamp(1600000000).isoformat()
+    assert connection.execute("SELECT scraped_at, likes FROM thing_metrics").fetchall() == [(stamped, 12)]
+    connection.close()
+
+
+def test_missing_columns_are_added(tmp_path):
+    db_name = str(tmp_path / "thingiverse")
+    build_database(sample_data(likes=10), db_name, backend="sqlite")
+    connection = sqlite3.connect(db_name + ".db")
+    connection.execute("ALTER TABLE things DROP COLUMN username")
+    connection.commit()
+
+    build_database(sample_data(likes=12), db_name, drop_existing=False, backend="sqlite")
+    assert connection.execute("SELECT username, likes FROM things").fetchall() == [("maya", 12)]
+    connection.close()
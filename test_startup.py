@@ -0,0 +1,18 @@
+import subprocess
+import sys
+
+from ThingScraper import By
+
+
+def test_main_imports_no_heavy_dependencies():
+    # selenium.webdriver, requests and pymysql are only imported by the actions that use them
+    code = ("import sys, main; print([m for m in ('selenium.webdriver', 'requests', 'pymysql', 'lxml') "
+            "if m in sys.modules])")
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    assert output.strip() == "[]"
+
+
+def test_locators_match_selenium():
+    from selenium.webdriver.common.by import By as SeleniumBy
+    names = [name for name in vars(SeleniumBy) if name.isupper()]
+    assert names and all(getattr(By, name) == getattr(SeleniumBy, name) for name in names)